@@ -2,7 +2,7 @@ import { useEffect, useRef, useState } from 'react';
 import msgpack from 'msgpack-lite';
 import dayjs from 'dayjs';
 import { getWsUrl } from '../utils/connectionHelper';
-import { processAndDownsampleArrayData, processJSONPlot, flip2DArray, updateCumulativePlot, process1DArray, normalizeArray } from '../utils/plotHelper';
+import { processAndDownsampleArrayData, processJSONPlot, flip2DArray, updateCumulativePlot, process1DArray, normalizeArray, decodeTypedArray, decodePreviewImage, withPreviewLevel } from '../utils/plotHelper';
 
 const defaultWsUrl = getWsUrl();
 const defaultHeatmapSettings = {
@@ -41,6 +41,12 @@ const defaultHeatmapSettings = {
         type: 'boolean',
         value: false,
         description: 'Adjusts the data to increase contrast'
+    },
+    previewLevel: {
+        label: 'Preview Level',
+        type: 'integer',
+        value: '0',
+        description: 'Asks the server for frames downsampled by 2^level in both directions, 0 is full size. Applied when the websocket connects.'
     }
 };
 
@@ -68,6 +74,7 @@ export const useGISAXS = ({}) => {
     const isUserClosed = useRef(false);
     const reconnectionAttempts = useRef(0);
     const websocketMessageCount = useRef(0);
+    const qAxis = useRef(null);
 
 
 
@@ -125,6 +132,43 @@ export const useGISAXS = ({}) => {
                 newMessage = JSON.parse(event.data);
                 console.log(newMessage);
             }
+            if (newMessage.msg_type === 'snapshot') {
+                await handleSnapshot(newMessage, timestamp);
+            } else {
+                await processMessage(newMessage, timestamp);
+            }
+        } catch (error) {
+            console.error('Error processing WebSocket message:', error);
+        }
+    };
+
+    const handleSnapshot = async (snapshot, timestamp) => {
+        //a client connecting mid-run receives the run so far as one message, replayed here oldest first
+        resetAllData();
+        if (snapshot.start) {
+            await processMessage(snapshot.start, timestamp);
+        }
+        if (snapshot.q) {
+            qAxis.current = decodeTypedArray(snapshot.q, 'float32');
+        }
+        const curves = snapshot.curves || [];
+        for (let i=0; i<curves.length; i++) {
+            await processMessage({
+                curve: curves[i],
+                curve_dtype: snapshot.curve_dtypes[i],
+                curve_tiled_url: snapshot.curve_tiled_urls[i]
+            }, timestamp);
+        }
+        if (snapshot.preview) {
+            //the preview bundle repeats the latest curve, which was already replayed above
+            const { curve, curve_dtype, ...preview } = snapshot.preview;
+            await processMessage(preview, timestamp);
+        }
+        setFrameNumber(curves.length);
+    };
+
+    const processMessage = async (newMessage, timestamp) => {
+        try {
             var keyList = '';
             for (const key in newMessage) {
                 keyList = keyList.concat(', ', key);
@@ -138,9 +182,15 @@ export const useGISAXS = ({}) => {
                 setFrameNumber((prev)=> prev+1);
             }
 
+            if ('q' in newMessage && newMessage.q) {
+                //the q axis is only sent when the geometry changes
+                qAxis.current = decodeTypedArray(newMessage.q, 'float32');
+            }
+
             if ('curve' in newMessage) {
                 //const newPlot = processJSONPlot(newMessage['curve'], newMessage?.frame_number);
-                const newPlot = process1DArray(newMessage['curve'], newMessage?.frame_number);
+                const curve = decodeTypedArray(newMessage['curve'], newMessage?.curve_dtype || 'uint8');
+                const newPlot = process1DArray(curve, newMessage?.frame_number, qAxis.current);
                 setCurrentScatterPlot(newPlot);
                 setCumulativeScatterPlots((prevState) => {
                     var newState = [...prevState];
@@ -151,6 +201,10 @@ export const useGISAXS = ({}) => {
             }
 
             if ('raw_frame' in newMessage) {
+                if (newMessage.image_format && newMessage.image_format !== 'raw') {
+                    //compressed previews are decoded back to the uint8 pixels of a raw preview
+                    newMessage.raw_frame = await decodePreviewImage(newMessage.raw_frame, newMessage.image_format);
+                }
                 const maxArrayElements = 90000000; //largest number of array elements we want to display in Plotly to avoid performance issues
                 var downsampleFactor = Math.max(Math.sqrt(newMessage.raw_frame.length / maxArrayElements), 1);
                 let newPlot = processAndDownsampleArrayData(newMessage.raw_frame,  newMessage.width, newMessage.height, downsampleFactor);
@@ -323,7 +377,7 @@ export const useGISAXS = ({}) => {
         setWarningMessage('');
         setSocketStatus('connecting');
 
-        ws.current = new WebSocket(wsUrl);
+        ws.current = new WebSocket(withPreviewLevel(wsUrl, heatmapSettings.previewLevel.value));
 
         ws.current.onopen = (event) => {
             let timestamp = dayjs().format('h:m:s a');
@@ -8,13 +8,67 @@ const sampleScatterData = [
     },
 ];
 
-export const process1DArray = (array=[], frameNumber='N/A') => {
+const float16ToNumber = (bits) => {
+    const sign = (bits & 0x8000) ? -1 : 1;
+    const exponent = (bits >> 10) & 0x1f;
+    const fraction = bits & 0x3ff;
+    if (exponent === 0) return sign * Math.pow(2, -14) * (fraction / 1024);
+    if (exponent === 0x1f) return fraction ? NaN : sign * Infinity;
+    return sign * Math.pow(2, exponent - 15) * (1 + fraction / 1024);
+}
+
+export const decodeTypedArray = (bytes, dtype='float32') => {
+    //msgpack bin fields may not be aligned for typed array views, so copy them first
+    const buffer = bytes.buffer.slice(bytes.byteOffset, bytes.byteOffset + bytes.byteLength);
+    if (dtype === 'float32') {
+        return new Float32Array(buffer);
+    }
+    if (dtype === 'float16') {
+        const halves = new Uint16Array(buffer);
+        const values = new Float32Array(halves.length);
+        for (let i=0; i<halves.length; i++) {
+            values[i] = float16ToNumber(halves[i]);
+        }
+        return values;
+    }
+    return new Uint8Array(buffer);
+}
+
+export const decodePreviewImage = async (bytes, imageFormat) => {
+    //png/webp previews are 8-bit grayscale, each decoded RGBA pixel holds the value in its red channel
+    const bitmap = await createImageBitmap(new Blob([bytes], { type: `image/${imageFormat}` }));
+    const { width, height } = bitmap;
+    const canvas = document.createElement('canvas');
+    canvas.width = width;
+    canvas.height = height;
+    const context = canvas.getContext('2d');
+    context.drawImage(bitmap, 0, 0);
+    bitmap.close();
+    const rgba = context.getImageData(0, 0, width, height).data;
+    const values = new Uint8Array(width * height);
+    for (let i=0; i<values.length; i++) {
+        values[i] = rgba[i * 4];
+    }
+    return values;
+}
+
+export const withPreviewLevel = (url, level) => {
+    //ask the server for a preview downsampled by 2^level, level 0 is full size
+    const parsedLevel = parseInt(level, 10);
+    if (!parsedLevel || parsedLevel < 0) {
+        return url;
+    }
+    return url + (url.includes('?') ? '&' : '?') + 'level=' + parsedLevel;
+}
+
+export const process1DArray = (array=[], frameNumber='N/A', qAxis=null) => {
     try{
         if (array.length > 0) {
+            const useQ = qAxis !== null && qAxis.length === array.length;
             var xValues = [];
             var yValues = [];
             for (let i=0; i<array.length; i++) {
-                xValues.push(i);
+                xValues.push(useQ ? qAxis[i] : i);
                 yValues.push(array[i]);
             }
             const newPlot = [
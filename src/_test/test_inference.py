@@ -0,0 +1,121 @@
+"""Tests for arroyosas.lse_reduction.inference (InferenceConfig, optimize_model)"""
+
+import os
+
+import numpy as np
+import pytest
+import torch
+
+from arroyosas.lse_reduction.inference import (
+    InferenceConfig,
+    find_torch_module,
+    optimize_model,
+    optimized_path,
+    relative_delta,
+)
+
+
+class FakePythonModel:
+    """Stands in for an mlflow PythonModel: preprocessing in predict, a torch module attribute."""
+
+    def __init__(self):
+        torch.manual_seed(0)
+        self.model = torch.nn.Sequential(
+            torch.nn.Flatten(), torch.nn.Linear(100, 64), torch.nn.ReLU(), torch.nn.Linear(64, 16)
+        )
+        self.scale = 2.0
+
+    def predict(self, image):
+        batch = torch.from_numpy(np.asarray(image, dtype=np.float32) * self.scale)
+        if batch.ndim == 2:
+            batch = batch.unsqueeze(0)
+        return {"latent_features": self.model(batch).detach().numpy()}
+
+
+class FakePyfuncModel:
+    def __init__(self):
+        self.python_model = FakePythonModel()
+
+    def unwrap_python_model(self):
+        return self.python_model
+
+    def predict(self, image):
+        return self.python_model.predict(image)
+
+
+@pytest.fixture
+def frame():
+    return np.random.default_rng(0).random((10, 10)).astype(np.float32)
+
+
+class TestInferenceConfig:
+    def test_defaults_do_not_optimize(self):
+        config = InferenceConfig()
+        assert config.inference_mode
+        assert not config.optimizes
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            InferenceConfig(backend="tensorrt")
+
+    def test_cache_path_needs_version(self, tmp_path):
+        args = (torch.zeros(1, 10, 10),)
+        config = InferenceConfig(backend="torchscript", quantize=True)
+        assert optimized_path(str(tmp_path), "ae", config, args) is None
+        path = optimized_path(str(tmp_path), "ae:3", config, args)
+        assert path.endswith("ae_v3_torchscript_int8_10x10.pt")
+
+
+class TestOptimizeModel:
+    def test_find_torch_module(self):
+        model = FakePyfuncModel()
+        owner, attribute, module = find_torch_module(model)
+        assert owner is model.python_model
+        assert attribute == "model"
+        assert module is model.python_model.model
+
+    def test_torchscript_keeps_predict_and_output(self, frame, tmp_path):
+        model = FakePyfuncModel()
+        expected = model.predict(frame)["latent_features"]
+        config = InferenceConfig(backend="torchscript")
+
+        assert optimize_model(model, frame, config, "ae:1", str(tmp_path))
+        assert isinstance(model.python_model.model, torch.jit.ScriptModule)
+        np.testing.assert_allclose(model.predict(frame)["latent_features"], expected, rtol=1e-5, atol=1e-6)
+        # Batches still work through the traced module
+        assert model.predict(np.stack([frame, frame]))["latent_features"].shape == (2, 16)
+        assert os.path.exists(optimized_path(str(tmp_path), "ae:1", config, (torch.zeros(1, 10, 10),)))
+
+    def test_cached_torchscript_reused(self, frame, tmp_path):
+        config = InferenceConfig(backend="torchscript")
+        optimize_model(FakePyfuncModel(), frame, config, "ae:1", str(tmp_path))
+        model = FakePyfuncModel()
+        assert optimize_model(model, frame, config, "ae:1", str(tmp_path))
+        assert isinstance(model.python_model.model, torch.jit.ScriptModule)
+
+    def test_quantized_within_tolerance(self, frame):
+        model = FakePyfuncModel()
+        expected = model.predict(frame)["latent_features"]
+        assert optimize_model(model, frame, InferenceConfig(quantize=True, max_relative_delta=0.1))
+        assert model.python_model.model is not None
+        np.testing.assert_allclose(model.predict(frame)["latent_features"], expected, atol=0.1 * np.abs(expected).max())
+
+    def test_quantized_rejected_above_tolerance(self, frame):
+        model = FakePyfuncModel()
+        original = model.python_model.model
+        assert not optimize_model(model, frame, InferenceConfig(quantize=True, max_relative_delta=0.0))
+        assert model.python_model.model is original
+
+    def test_onnx_backend(self, frame, tmp_path):
+        pytest.importorskip("onnxruntime")
+        pytest.importorskip("onnx")
+        model = FakePyfuncModel()
+        expected = model.predict(frame)["latent_features"]
+        assert optimize_model(model, frame, InferenceConfig(backend="onnx"), "ae:1", str(tmp_path))
+        np.testing.assert_allclose(model.predict(frame)["latent_features"], expected, rtol=1e-4, atol=1e-5)
+
+    def test_relative_delta(self):
+        reference = torch.tensor([1.0, -4.0])
+        assert relative_delta(reference, reference.clone()) == 0.0
+        assert relative_delta(reference, torch.tensor([1.0, -3.0])) == pytest.approx(0.25)
+        assert relative_delta(reference, torch.zeros(3)) == float("inf")
@@ -0,0 +1,69 @@
+"""Tests for arroyosas.lse_reduction.latent_cache (LatentCache, LatentStore)"""
+
+import numpy as np
+
+from arroyosas.lse_reduction.latent_cache import LatentCache, LatentStore
+
+
+def _keys(start, count):
+    return [(f"http://example.com/{i}", i) for i in range(start, start + count)]
+
+
+class TestLatentCache:
+    def test_get_returns_rows_in_insertion_order(self):
+        cache = LatentCache()
+        latents = np.random.rand(3, 16).astype(np.float32)
+        cache.add("ae:1", _keys(0, 3), latents)
+        keys, cached = cache.get("ae:1")
+        assert keys == _keys(0, 3)
+        np.testing.assert_array_equal(cached, latents)
+
+    def test_keyed_by_autoencoder(self):
+        cache = LatentCache()
+        cache.add("ae:1", _keys(0, 2), np.zeros((2, 4)))
+        cache.add("ae:2", _keys(0, 1), np.ones((1, 8)))
+        assert len(cache.get("ae:1")[0]) == 2
+        assert cache.get("ae:2")[1].shape == (1, 8)
+        assert cache.get("ae:3") == ([], None)
+
+    def test_same_url_different_frames_kept(self):
+        cache = LatentCache()
+        for url in ("", "http://example.com/run"):
+            cache.add("ae:" + url, [(url, i) for i in range(5)], np.random.rand(5, 8))
+            keys, cached = cache.get("ae:" + url)
+            assert keys == [(url, i) for i in range(5)]
+            assert cached.shape == (5, 8)
+
+    def test_same_key_replaces_row(self):
+        cache = LatentCache()
+        cache.add("ae:1", _keys(0, 1), np.zeros((1, 4)))
+        cache.add("ae:1", _keys(0, 1), np.ones((1, 4)))
+        keys, cached = cache.get("ae:1")
+        assert len(keys) == 1
+        assert cached[0, 0] == 1.0
+
+    def test_keeps_latent_shape(self):
+        cache = LatentCache()
+        cache.add("ae:1", _keys(0, 2), np.random.rand(2, 4, 3, 3))
+        assert cache.get("ae:1")[1].shape == (2, 4, 3, 3)
+
+    def test_clear(self):
+        cache = LatentCache()
+        cache.add("ae:1", _keys(0, 2), np.zeros((2, 4)))
+        cache.clear()
+        assert cache.get("ae:1") == ([], None)
+
+
+class TestLatentStore:
+    def test_spills_to_memmap_past_memory_limit(self, tmp_path):
+        # 64 rows of 16 float32 fit in 4 KiB, the next growth does not
+        store = LatentStore((16,), max_memory_bytes=4096, spill_dir=str(tmp_path))
+        latents = np.random.rand(100, 16).astype(np.float32)
+        for i, latent in enumerate(latents):
+            store.add(f"url{i}", i, latent)
+        assert store.spilled
+        assert isinstance(store.data, np.memmap)
+        assert len(list(tmp_path.iterdir())) == 1
+        np.testing.assert_array_equal(store.latents(), latents)
+        store.close()
+        assert list(tmp_path.iterdir()) == []
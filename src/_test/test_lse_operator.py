@@ -1,5 +1,7 @@
 """Tests for arroyosas.lse_reduction.operator (LatentSpaceOperator)"""
 
+import asyncio
+import time
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import numpy as np
@@ -14,6 +16,7 @@ from arroyosas.schemas import RawFrameEvent, SASStart, SASStop, SerializableNump
 @pytest.fixture
 def mock_reducer():
     reducer = MagicMock(spec=Reducer)
+    reducer.max_concurrency = 1
     reducer.reduce.return_value = (np.array([[1.0, 2.0]]), {"autoencoder_time": 0.1, "dimred_time": 0.05})
     reducer.is_loading_model = False
     reducer.loading_model_type = None
@@ -98,8 +101,7 @@ class TestLatentSpaceOperator:
                 await operator.process(frame)
 
     async def test_process_raw_frame_no_models_skips(self, operator, mock_redis_store):
-        mock_redis_store.get_autoencoder_model.return_value = None
-        mock_redis_store.get_dimred_model.return_value = None
+        operator.model_selection = (None, None)
 
         with patch.object(operator, "publish", new=AsyncMock()):
             frame = _make_raw_frame()
@@ -153,8 +155,7 @@ class TestLatentSpaceOperator:
         assert result is None
 
     async def test_dispatch_no_models_sends_flush_once(self, operator, mock_redis_store):
-        mock_redis_store.get_autoencoder_model.return_value = None
-        mock_redis_store.get_dimred_model.return_value = None
+        operator.model_selection = (None, None)
 
         with patch.object(operator, "publish", new=AsyncMock()) as mock_pub:
             frame = _make_raw_frame()
@@ -167,8 +168,7 @@ class TestLatentSpaceOperator:
             assert flush_calls[0][0][0].tiled_url == "FLUSH_SIGNAL"
 
     async def test_dispatch_no_models_sends_flush_only_once(self, operator, mock_redis_store):
-        mock_redis_store.get_autoencoder_model.return_value = None
-        mock_redis_store.get_dimred_model.return_value = None
+        operator.model_selection = (None, None)
 
         with patch.object(operator, "publish", new=AsyncMock()) as mock_pub:
             frame = _make_raw_frame()
@@ -200,3 +200,298 @@ class TestLatentSpaceOperator:
             result = await operator.dispatch(frame)
 
         assert result is None
+
+
+class TestModelSelection:
+    def test_selection_read_once_and_subscribed(self, operator, mock_redis_store):
+        assert operator.model_selection == ("ae_v1:1", "umap_v1:1")
+        mock_redis_store.subscribe_to_model_updates.assert_called_once_with(
+            operator._on_model_update, on_subscribe=operator._reload_model_selection
+        )
+
+    async def test_frames_do_not_query_redis(self, operator, mock_redis_store):
+        mock_redis_store.get_autoencoder_model.reset_mock()
+        mock_redis_store.get_dimred_model.reset_mock()
+        with patch.object(operator, "publish", new=AsyncMock()):
+            await operator.process(_make_raw_frame())
+            await operator.process(_make_raw_frame())
+        mock_redis_store.get_autoencoder_model.assert_not_called()
+        mock_redis_store.get_dimred_model.assert_not_called()
+
+    def test_model_update_changes_selection(self, operator):
+        operator._on_model_update({"model_type": "dimred", "model_name": "umap_v2:1"})
+        assert operator.model_selection == ("ae_v1:1", "umap_v2:1")
+        operator._on_model_update({"update_type": "experiment_name", "experiment_name": "exp"})
+        assert operator.model_selection == ("ae_v1:1", "umap_v2:1")
+
+    async def test_cleared_selection_goes_offline(self, operator):
+        operator._on_model_update({"model_type": "autoencoder", "model_name": ""})
+        with patch.object(operator, "publish", new=AsyncMock()) as mock_pub:
+            assert await operator.dispatch(_make_raw_frame()) is None
+        assert mock_pub.call_args[0][0].tiled_url == "FLUSH_SIGNAL"
+
+    def test_reload_after_reconnect(self, operator, mock_redis_store):
+        mock_redis_store.get_autoencoder_model.return_value = "ae_v3:1"
+        operator._reload_model_selection()
+        assert operator.model_selection == ("ae_v3:1", "umap_v1:1")
+
+
+class TestReprojection:
+    async def test_dimred_swap_republishes_run(self, operator, mock_reducer):
+        mock_reducer.reproject.return_value = (
+            [("http://example.com/0", 0), ("http://example.com/1", 1)],
+            np.array([[1.0, 2.0], [3.0, 4.0]]),
+            {"dimred_time": 0.2, "batch_size": 2, "autoencoder_model": "ae_v1:1", "dimred_model": "pca:1"},
+        )
+        operator._loop = asyncio.get_running_loop()
+        with patch.object(operator, "publish", new=AsyncMock()) as mock_pub:
+            # Reported from the reducer's listener thread
+            await asyncio.to_thread(operator._on_model_swap, "dimred", "pca:1")
+            for _ in range(20):
+                if mock_pub.call_count == 2:
+                    break
+                await asyncio.sleep(0.01)
+        events = _latent(mock_pub)
+        assert [e.index for e in events] == [0, 1]
+        assert events[1].feature_vector == [3.0, 4.0]
+        assert events[0].dimred_model == "pca:1"
+        assert events[0].dimred_time == pytest.approx(0.1)
+
+    async def test_reprojection_not_stored_again(self, operator, mock_reducer, tmp_path):
+        from arroyosas.lse_reduction.tiled_results_publisher import TiledResultsPublisher
+        from arroyosas.lse_reduction.vector_save import VectorSavePublisher
+
+        mock_reducer.reproject.return_value = (
+            [("", 0), ("", 1)],
+            np.array([[1.0, 2.0], [3.0, 4.0]]),
+            {"dimred_time": 0.2, "batch_size": 2, "autoencoder_model": "ae_v1:1", "dimred_model": "pca:1"},
+        )
+        vector_save = VectorSavePublisher(db_path=str(tmp_path / "vectors.db"))
+        await vector_save.start()
+        results = TiledResultsPublisher()
+        viewer = MagicMock()
+        viewer.publish = AsyncMock()
+        operator.publishers = [vector_save, results, viewer]
+        with patch.object(results, "_publish_sync") as publish_sync:
+            await operator.reproject()
+        await vector_save.flush()
+
+        publish_sync.assert_not_called()
+        async with vector_save.db.execute("SELECT COUNT(*) FROM vectors") as cursor:
+            assert (await cursor.fetchone())[0] == 0
+        await vector_save.db.close()
+        events = [c[0][0] for c in viewer.publish.call_args_list]
+        assert [(e.index, e.reprojected) for e in events] == [(0, True), (1, True)]
+
+    async def test_autoencoder_swap_not_reprojected(self, operator, mock_reducer):
+        operator._loop = asyncio.get_running_loop()
+        operator._on_model_swap("autoencoder", "ae_v2:1")
+        await asyncio.sleep(0.01)
+        mock_reducer.reproject.assert_not_called()
+
+    async def test_start_resets_reducer_run(self, operator, mock_reducer):
+        with patch.object(operator, "publish", new=AsyncMock()):
+            await operator.process(
+                SASStart(run_name="r", run_id="id", width=10, height=10, data_type="float32", tiled_url="http://x")
+            )
+        mock_reducer.start_run.assert_called_once()
+
+
+# ---------------------------------------------------------------------------
+# Micro-batching
+# ---------------------------------------------------------------------------
+
+
+def _frame(number: int):
+    image = SerializableNumpyArrayModel(array=np.full((10, 10), number, dtype=np.float32))
+    return RawFrameEvent(image=image, frame_number=number, tiled_url=f"http://example.com/run/uuid-abc/{number}")
+
+
+@pytest.fixture
+def batching_operator(mock_reducer, mock_redis_store):
+    def reduce_batch(messages):
+        vectors = [np.array([[float(m.frame_number), 0.0]]) for m in messages]
+        return vectors, {"autoencoder_time": 0.4, "dimred_time": 0.2, "batch_size": len(messages)}
+
+    mock_reducer.reduce_batch.side_effect = reduce_batch
+    op = LatentSpaceOperator(mock_reducer, mock_redis_store, batch_max_frames=4, batch_max_wait_ms=10)
+    op._publishers = []
+    return op
+
+
+def _latent(mock_pub):
+    return [c[0][0] for c in mock_pub.call_args_list if isinstance(c[0][0], LatentSpaceEvent)]
+
+
+class TestMicroBatching:
+    async def test_full_batch_reduced_once(self, batching_operator, mock_reducer):
+        with patch.object(batching_operator, "publish", new=AsyncMock()) as mock_pub:
+            for number in range(4):
+                await batching_operator.process(_frame(number))
+        mock_reducer.reduce_batch.assert_called_once()
+        mock_reducer.reduce.assert_not_called()
+        events = _latent(mock_pub)
+        assert [e.index for e in events] == [0, 1, 2, 3]
+        assert events[0].batch_size == 4
+        assert events[0].batch_autoencoder_time == pytest.approx(0.4)
+        assert events[0].autoencoder_time == pytest.approx(0.1)
+        assert events[0].dimred_time == pytest.approx(0.05)
+
+    async def test_partial_batch_flushed_after_wait(self, batching_operator, mock_reducer):
+        with patch.object(batching_operator, "publish", new=AsyncMock()) as mock_pub:
+            await batching_operator.process(_frame(0))
+            assert _latent(mock_pub) == []
+            await asyncio.sleep(0.05)
+        assert [e.index for e in _latent(mock_pub)] == [0]
+        assert batching_operator._batch_timer is None
+
+    async def test_stop_flushes_before_publishing(self, batching_operator):
+        with patch.object(batching_operator, "publish", new=AsyncMock()) as mock_pub:
+            await batching_operator.process(_frame(0))
+            await batching_operator.process(_frame(1))
+            stop = SASStop(num_frames=2)
+            await batching_operator.process(stop)
+        published = [c[0][0] for c in mock_pub.call_args_list]
+        assert published[-1] is stop
+        assert [e.index for e in _latent(mock_pub)] == [0, 1]
+
+    async def test_failed_frames_skipped(self, batching_operator, mock_reducer):
+        mock_reducer.reduce_batch.side_effect = lambda messages: (
+            [None, np.array([[1.0, 2.0]])],
+            {"autoencoder_time": 0.2, "dimred_time": 0.1, "batch_size": 2},
+        )
+        results = await batching_operator.dispatch_batch([_frame(0), _frame(1)])
+        assert [e.index for e in results] == [1]
+
+    async def test_event_names_models_that_produced_it(self, operator, mock_reducer):
+        # The reducer swapped models after this frame was reduced
+        mock_reducer.reduce.return_value = (
+            np.array([[1.0, 2.0]]),
+            {"autoencoder_time": 0.1, "dimred_time": 0.05, "autoencoder_model": "ae_v1:1", "dimred_model": "umap_v1:1"},
+        )
+        mock_reducer.dimred_model_name = "umap_v2:1"
+        with patch.object(operator, "publish", new=AsyncMock()):
+            result = await operator.dispatch(_make_raw_frame())
+        assert result.dimred_model == "umap_v1:1"
+
+
+class TestPipelinedDispatch:
+    @pytest.fixture
+    def pipelined_operator(self, mock_reducer, mock_redis_store):
+        def reduce(message):
+            # Later frames finish first
+            time.sleep(0.01 * (4 - message.frame_number))
+            return np.array([[float(message.frame_number), 0.0]]), {"autoencoder_time": 0.1, "dimred_time": 0.05}
+
+        mock_reducer.reduce.side_effect = reduce
+        mock_reducer.max_concurrency = 4
+        op = LatentSpaceOperator(mock_reducer, mock_redis_store, max_in_flight=4)
+        op._publishers = []
+        return op
+
+    async def test_results_published_in_frame_order(self, pipelined_operator):
+        with patch.object(pipelined_operator, "publish", new=AsyncMock()) as mock_pub:
+            for number in range(4):
+                await pipelined_operator.process(_frame(number))
+            await pipelined_operator.wait_in_flight()
+        assert [e.index for e in _latent(mock_pub)] == [0, 1, 2, 3]
+
+    async def test_frames_reduced_concurrently(self, pipelined_operator, mock_reducer):
+        start = time.perf_counter()
+        with patch.object(pipelined_operator, "publish", new=AsyncMock()):
+            for number in range(4):
+                await pipelined_operator.process(_frame(number))
+            await pipelined_operator.wait_in_flight()
+        # 0.04 + 0.03 + 0.02 + 0.01 if the frames were reduced one after the other
+        assert time.perf_counter() - start < 0.09
+        assert mock_reducer.reduce.call_count == 4
+
+    async def test_stop_waits_for_in_flight_frames(self, pipelined_operator):
+        with patch.object(pipelined_operator, "publish", new=AsyncMock()) as mock_pub:
+            await pipelined_operator.process(_frame(0))
+            await pipelined_operator.process(_frame(1))
+            stop = SASStop(num_frames=2)
+            await pipelined_operator.process(stop)
+        published = [c[0][0] for c in mock_pub.call_args_list]
+        assert published[-1] is stop
+        assert [e.index for e in _latent(mock_pub)] == [0, 1]
+
+
+class TestBuildOperator:
+    def test_workers_use_process_pool(self):
+        with (
+            patch("arroyosas.lse_reduction.operator.RedisModelStore"),
+            patch("arroyosas.lse_reduction.operator.WorkerPoolReducer") as pool_cls,
+        ):
+            pool_cls.return_value.max_concurrency = 3
+            from arroyosas.lse_reduction.operator import build_lse_operator
+
+            op = build_lse_operator("redis", 6379, workers=3, inference={"quantize": True})
+        assert op.reducer is pool_cls.return_value
+        assert op.max_in_flight == 6
+        workers, host, port, reducer_kwargs = pool_cls.call_args[0]
+        assert (workers, host, port) == (3, "redis", 6379)
+        assert reducer_kwargs["inference"] == {"quantize": True}
+
+
+class TestConcurrentPublish:
+    async def test_raw_frame_published_while_frame_is_reduced(self, operator, mock_reducer):
+        order = []
+
+        def reduce(message):
+            order.append("reduce start")
+            time.sleep(0.05)
+            order.append("reduce end")
+            return np.array([[1.0, 2.0]]), {"autoencoder_time": 0.1, "dimred_time": 0.05}
+
+        async def publish(message):
+            if isinstance(message, RawFrameEvent):
+                order.append("raw start")
+                await asyncio.sleep(0.02)
+                order.append("raw end")
+
+        mock_reducer.reduce.side_effect = reduce
+        with patch.object(operator, "publish", side_effect=publish):
+            await operator.process(_make_raw_frame())
+        assert order.index("raw end") < order.index("reduce end")
+
+    async def test_next_frame_published_while_previous_is_reduced(self, mock_reducer, mock_redis_store):
+        op = LatentSpaceOperator(mock_reducer, mock_redis_store, max_in_flight=2)
+        op._publishers = []
+        reducing = []
+
+        def reduce(message):
+            reducing.append(message.frame_number)
+            time.sleep(0.05)
+            reducing.remove(message.frame_number)
+            return np.array([[1.0, 2.0]]), {"autoencoder_time": 0.1, "dimred_time": 0.05}
+
+        raw_while_reducing = []
+
+        async def publish(message):
+            if isinstance(message, RawFrameEvent):
+                raw_while_reducing.append((message.frame_number, list(reducing)))
+
+        mock_reducer.reduce.side_effect = reduce
+        with patch.object(op, "publish", side_effect=publish):
+            await op.process(_frame(0))
+            await asyncio.sleep(0.01)
+            await op.process(_frame(1))
+            await op.wait_in_flight()
+        assert (1, [0]) in raw_while_reducing
+
+    async def test_publishers_never_called_concurrently(self, operator):
+        active = []
+        overlaps = []
+
+        class SlowPublisher:
+            async def publish(self, message):
+                active.append(message)
+                if len(active) > 1:
+                    overlaps.append(message)
+                await asyncio.sleep(0.01)
+                active.remove(message)
+
+        operator.publishers = [SlowPublisher()]
+        await asyncio.gather(operator.publish("a"), operator.publish("b"))
+        assert overlaps == []
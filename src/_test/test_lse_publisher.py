@@ -1,10 +1,18 @@
 """Tests for arroyosas.lse_reduction.publisher (LSEWSResultPublisher)"""
 
+import json
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import msgpack
+import numpy as np
 import pytest
+from dynaconf import Dynaconf
 
-from arroyosas.lse_reduction.publisher import LSEWSResultPublisher
+from arroyosas.lse_reduction.publisher import (
+    LatentNameDictionary,
+    LSEWSResultPublisher,
+    pack_latent_batch,
+)
 from arroyosas.lse_reduction.schemas import LatentSpaceEvent
 from arroyosas.schemas import SASStart, SASStop
 
@@ -36,12 +44,30 @@ class TestLSEWSResultPublisher:
         assert pub.path == "/test"
 
     def test_from_settings(self):
-        settings = MagicMock()
-        settings.host = "myhost"
-        settings.port = 5555
-        pub = LSEWSResultPublisher.from_settings(settings)
+        settings = Dynaconf()
+        settings.set("ws_publisher", {"host": "myhost", "port": 5555})
+        pub = LSEWSResultPublisher.from_settings(settings.ws_publisher)
         assert pub.host == "myhost"
         assert pub.port == 5555
+        assert pub.protocol == "json"
+        assert pub.recent_events.maxlen == 10000
+
+    def test_from_settings_reads_protocol_options(self):
+        settings = Dynaconf()
+        settings.set(
+            "ws_publisher",
+            {
+                "host": "h",
+                "port": 1,
+                "protocol": "binary",
+                "batch_max_events": 64,
+                "batch_interval_ms": 50,
+                "history_size": 10,
+            },
+        )
+        pub = LSEWSResultPublisher.from_settings(settings.ws_publisher)
+        assert (pub.protocol, pub.batch_max_events, pub.batch_interval_ms) == ("binary", 64, 50)
+        assert pub.recent_events.maxlen == 10
 
     async def test_publish_no_clients_does_nothing(self, publisher):
         event = LatentSpaceEvent(
@@ -136,3 +162,182 @@ class TestLSEWSResultPublisher:
                 publisher.host,
                 publisher.port,
             )
+
+
+# ---------------------------------------------------------------------------
+# Binary batched protocol
+# ---------------------------------------------------------------------------
+
+
+def _latent_event(index, vector=(1.0, 2.0), autoencoder="ae", dimred="umap", experiment="exp"):
+    return LatentSpaceEvent(
+        tiled_url=f"http://example.com?slice={index}",
+        feature_vector=list(vector),
+        index=index,
+        autoencoder_model=autoencoder,
+        dimred_model=dimred,
+        experiment_name=experiment,
+        timestamp=1700000000.5 + index,
+        autoencoder_time=0.01,
+    )
+
+
+@pytest.fixture
+def binary_publisher():
+    return LSEWSResultPublisher(protocol="binary", batch_max_events=3)
+
+
+class TestBinaryProtocol:
+    def test_unknown_protocol_raises(self):
+        with pytest.raises(ValueError):
+            LSEWSResultPublisher(protocol="xml")
+
+    def test_pack_latent_batch_round_trip(self):
+        events = [_latent_event(i, vector=(i, i + 0.5)) for i in range(4)]
+        names = LatentNameDictionary()
+        new_names = names.register(events)
+        unpacked = msgpack.unpackb(pack_latent_batch(events, names, new_names), raw=False)
+
+        assert unpacked["msg_type"] == "latent_batch"
+        assert unpacked["count"] == 4
+        coords = np.frombuffer(unpacked["coords"], dtype="<f4").reshape(unpacked["count"], unpacked["dim"])
+        np.testing.assert_array_equal(coords[:, 0], [0, 1, 2, 3])
+        np.testing.assert_array_equal(np.frombuffer(unpacked["index"], dtype="<i4"), [0, 1, 2, 3])
+        assert np.frombuffer(unpacked["timestamp"], dtype="<f8")[0] == 1700000000.5
+        assert np.isnan(np.frombuffer(unpacked["dimred_time"], dtype="<f4")).all()
+        ids = {v: k for k, v in unpacked["dictionary"].items()}
+        assert [ids[i] for i in np.frombuffer(unpacked["dimred_model"], dtype="<u2")] == ["umap"] * 4
+        assert unpacked["tiled_url"][2] == "http://example.com?slice=2"
+        np.testing.assert_array_equal(np.frombuffer(unpacked["reprojected"], dtype="u1"), [0, 0, 0, 0])
+
+    def test_pack_latent_batch_marks_reprojected_points(self):
+        events = [_latent_event(0), _latent_event(1).model_copy(update={"reprojected": True})]
+        names = LatentNameDictionary()
+        unpacked = msgpack.unpackb(pack_latent_batch(events, names, names.register(events)), raw=False)
+        np.testing.assert_array_equal(np.frombuffer(unpacked["reprojected"], dtype="u1"), [0, 1])
+
+    def test_dictionary_only_sends_new_names(self):
+        names = LatentNameDictionary()
+        assert names.register([_latent_event(0)]) == {"ae": 0, "umap": 1, "exp": 2}
+        assert names.register([_latent_event(1)]) == {}
+        assert names.register([_latent_event(2, dimred="pca")]) == {"pca": 3}
+
+    async def test_flushes_after_batch_max_events(self, binary_publisher):
+        client = AsyncMock()
+        LSEWSResultPublisher.connected_clients = {client}
+        for i in range(3):
+            await binary_publisher.publish(_latent_event(i))
+        client.send.assert_called_once()
+        assert binary_publisher.pending_events == []
+        unpacked = msgpack.unpackb(client.send.call_args[0][0], raw=False)
+        assert unpacked["count"] == 3
+
+    async def test_stop_flushes_partial_batch(self, binary_publisher):
+        client = AsyncMock()
+        LSEWSResultPublisher.connected_clients = {client}
+        await binary_publisher.publish(_latent_event(0))
+        client.send.assert_not_called()
+        await binary_publisher.publish(SASStop(num_frames=1))
+        client.send.assert_called_once()
+
+    async def test_dimension_change_starts_new_batch(self, binary_publisher):
+        client = AsyncMock()
+        LSEWSResultPublisher.connected_clients = {client}
+        await binary_publisher.publish(_latent_event(0))
+        await binary_publisher.publish(_latent_event(1, vector=(1.0, 2.0, 3.0)))
+        client.send.assert_called_once()
+        assert len(binary_publisher.pending_events) == 1
+
+    async def test_flush_signal_is_not_sent(self, binary_publisher):
+        flush = LatentSpaceEvent(tiled_url="FLUSH_SIGNAL", feature_vector=[], index=-1)
+        await binary_publisher.publish(flush)
+        assert binary_publisher.pending_events == []
+
+    async def test_new_client_receives_snapshot_with_dictionary(self, binary_publisher):
+        client = AsyncMock()
+        LSEWSResultPublisher.connected_clients = {client}
+        for i in range(4):
+            await binary_publisher.publish(_latent_event(i))
+        mock_ws = AsyncMock()
+        mock_ws.remote_address = ("127.0.0.1", 12345)
+        mock_ws.wait_closed = AsyncMock(return_value=None)
+
+        await binary_publisher.websocket_handler(mock_ws)
+
+        unpacked = msgpack.unpackb(mock_ws.send.call_args[0][0], raw=False)
+        assert unpacked["msg_type"] == "snapshot"
+        # Only the flushed batch is replayed, the pending event arrives with the next flush
+        assert unpacked["latent"]["count"] == 3
+        assert unpacked["latent"]["dictionary"] == {"ae": 0, "umap": 1, "exp": 2}
+
+
+# ---------------------------------------------------------------------------
+# Late-joiner snapshot
+# ---------------------------------------------------------------------------
+
+
+class TestSnapshot:
+    def _start(self):
+        return SASStart(
+            run_name="run1",
+            run_id="id1",
+            width=10,
+            height=10,
+            data_type="float32",
+            tiled_url="http://example.com",
+        )
+
+    async def test_no_snapshot_before_any_run(self, publisher):
+        mock_ws = AsyncMock()
+        mock_ws.remote_address = ("127.0.0.1", 12345)
+        mock_ws.wait_closed = AsyncMock(return_value=None)
+
+        await publisher.websocket_handler(mock_ws)
+        mock_ws.send.assert_not_called()
+
+    async def test_json_snapshot_contains_start_and_events(self, publisher):
+        await publisher.publish(self._start())
+        for i in range(3):
+            await publisher.publish(_latent_event(i))
+        mock_ws = AsyncMock()
+        mock_ws.remote_address = ("127.0.0.1", 12345)
+        mock_ws.wait_closed = AsyncMock(return_value=None)
+
+        await publisher.websocket_handler(mock_ws)
+
+        sent = json.loads(mock_ws.send.call_args[0][0])
+        assert sent["msg_type"] == "snapshot"
+        assert sent["start"]["run_id"] == "id1"
+        assert [e["index"] for e in sent["events"]] == [0, 1, 2]
+
+    async def test_history_is_bounded_and_reset_on_start(self):
+        publisher = LSEWSResultPublisher(history_size=2)
+        for i in range(5):
+            await publisher.publish(_latent_event(i))
+        assert [e.index for e in publisher.recent_events] == [3, 4]
+        await publisher.publish(self._start())
+        assert len(publisher.recent_events) == 0
+
+    async def test_reprojected_points_replace_history_entries(self, publisher):
+        for i in range(3):
+            await publisher.publish(_latent_event(i))
+        moved = _latent_event(1, vector=(9.0, 9.0)).model_copy(update={"reprojected": True})
+        await publisher.publish(moved)
+        assert [(e.index, e.feature_vector) for e in publisher.recent_events] == [
+            (0, [1.0, 2.0]),
+            (1, [9.0, 9.0]),
+            (2, [1.0, 2.0]),
+        ]
+
+    async def test_reprojected_points_replace_history_entries_binary(self, binary_publisher):
+        for i in range(2):
+            await binary_publisher.publish(_latent_event(i))
+        await binary_publisher.flush()
+        for i in range(2):
+            await binary_publisher.publish(_latent_event(i, vector=(5.0, 5.0)).model_copy(update={"reprojected": True}))
+        await binary_publisher.flush()
+        assert [(e.index, e.reprojected) for e in binary_publisher.recent_events] == [(0, True), (1, True)]
+
+    async def test_flush_signal_not_in_history(self, publisher):
+        await publisher.publish(LatentSpaceEvent(tiled_url="FLUSH_SIGNAL", feature_vector=[], index=-1))
+        assert len(publisher.recent_events) == 0
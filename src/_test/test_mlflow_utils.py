@@ -1,6 +1,9 @@
 """Tests for arroyosas.lse_reduction.mlflow_utils (MLflowClient)"""
 
+import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -12,8 +15,10 @@ def clear_mlflow_cache():
     from arroyosas.lse_reduction.mlflow_utils import MLflowClient
 
     MLflowClient._model_cache.clear()
+    MLflowClient.invalidate_metadata()
     yield
     MLflowClient._model_cache.clear()
+    MLflowClient.invalidate_metadata()
 
 
 @pytest.fixture
@@ -206,14 +211,176 @@ class TestLoadModel:
         mock_ml, _, inner = mock_mlflow
         mock_model = MagicMock()
         mock_ml.pyfunc.load_model.return_value = mock_model
+        mock_ml.artifacts.download_artifacts.side_effect = fake_download({"MLmodel": b"flavors"})
 
-        # Create a fake disk cache
+        # Create a verified disk cache entry
         cache_path = client._get_cache_path("disk_model", "4")
-        os.makedirs(cache_path, exist_ok=True)
+        client.ensure_cached("disk_model", "4")
+        mock_ml.artifacts.download_artifacts.reset_mock()
 
         result = client.load_model("disk_model", version="4")
         assert result is mock_model
         mock_ml.pyfunc.load_model.assert_called_once_with(cache_path)
+        mock_ml.artifacts.download_artifacts.assert_not_called()
+
+
+def fake_download(files: dict):
+    """download_artifacts side effect writing ``files`` into dst_path."""
+
+    def download(artifact_uri, dst_path):
+        for name, content in files.items():
+            with open(os.path.join(dst_path, name), "wb") as f:
+                f.write(content)
+        return dst_path
+
+    return download
+
+
+class TestDiskCache:
+    def test_download_writes_manifest(self, client, mock_mlflow):
+        mock_ml, _, _ = mock_mlflow
+        mock_ml.artifacts.download_artifacts.side_effect = fake_download({"MLmodel": b"flavors", "model.pt": b"\1" * 10})
+        path, size = client.ensure_cached("ae", "1")
+        assert path == client._get_cache_path("ae", "1")
+        assert size == len(b"flavors") + 10
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+        assert manifest["model"] == "ae"
+        assert manifest["version"] == "1"
+        assert manifest["files"] == 2
+
+    def test_interrupted_download_leaves_no_entry(self, client, mock_mlflow):
+        mock_ml, _, _ = mock_mlflow
+
+        def interrupted(artifact_uri, dst_path):
+            with open(os.path.join(dst_path, "model.pt"), "wb") as f:
+                f.write(b"partial")
+            raise OSError("connection reset")
+
+        mock_ml.artifacts.download_artifacts.side_effect = interrupted
+        with pytest.raises(OSError):
+            client.ensure_cached("ae", "1")
+        assert not os.path.exists(client._get_cache_path("ae", "1"))
+        assert not [name for name in os.listdir(client.cache_dir) if name.startswith(".download_")]
+
+    def test_corrupt_entry_is_downloaded_again(self, client, mock_mlflow):
+        mock_ml, _, _ = mock_mlflow
+        mock_ml.artifacts.download_artifacts.side_effect = fake_download({"model.pt": b"weights"})
+        path, _ = client.ensure_cached("ae", "1")
+        with open(os.path.join(path, "model.pt"), "wb") as f:
+            f.write(b"trunc")
+
+        client.ensure_cached("ae", "1")
+        assert mock_ml.artifacts.download_artifacts.call_count == 2
+        with open(os.path.join(path, "model.pt"), "rb") as f:
+            assert f.read() == b"weights"
+
+    def test_cached_load_does_not_hash_the_entry(self, client, mock_mlflow):
+        mock_ml, _, _ = mock_mlflow
+        mock_ml.artifacts.download_artifacts.side_effect = fake_download({"model.pt": b"weights"})
+        client.ensure_cached("ae", "1")
+        with patch("arroyosas.lse_reduction.mlflow_utils._artifact_digest") as digest:
+            path, size = client.ensure_cached("ae", "1")
+        digest.assert_not_called()
+        assert (path, size) == (client._get_cache_path("ae", "1"), len(b"weights"))
+
+    def test_verify_cached_detects_same_size_corruption(self, client, mock_mlflow):
+        mock_ml, _, _ = mock_mlflow
+        mock_ml.artifacts.download_artifacts.side_effect = fake_download({"model.pt": b"weights"})
+        path, _ = client.ensure_cached("ae", "1")
+        assert client.verify_cached("ae", "1")
+        with open(os.path.join(path, "model.pt"), "wb") as f:
+            f.write(b"truncat")
+        assert not client.verify_cached("ae", "1")
+        assert not os.path.exists(path)
+        client.ensure_cached("ae", "1")
+        assert mock_ml.artifacts.download_artifacts.call_count == 2
+
+    def test_entry_without_manifest_is_downloaded_again(self, client, mock_mlflow):
+        mock_ml, _, _ = mock_mlflow
+        mock_ml.artifacts.download_artifacts.side_effect = fake_download({"model.pt": b"weights"})
+        cache_path = client._get_cache_path("ae", "1")
+        os.makedirs(cache_path)
+        client.ensure_cached("ae", "1")
+        assert mock_ml.artifacts.download_artifacts.call_count == 1
+        assert os.path.exists(os.path.join(cache_path, "manifest.json"))
+
+    def test_concurrent_loads_download_once(self, client, mock_mlflow):
+        mock_ml, _, _ = mock_mlflow
+        write = fake_download({"model.pt": b"weights"})
+
+        def slow_download(artifact_uri, dst_path):
+            time.sleep(0.1)
+            return write(artifact_uri, dst_path)
+
+        mock_ml.artifacts.download_artifacts.side_effect = slow_download
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            paths = list(pool.map(lambda _: client.ensure_cached("ae", "1")[0], range(4)))
+        assert mock_ml.artifacts.download_artifacts.call_count == 1
+        assert len(set(paths)) == 1
+
+    def test_evicts_least_recently_used(self, client, mock_mlflow):
+        mock_ml, _, _ = mock_mlflow
+        mock_ml.artifacts.download_artifacts.side_effect = fake_download({"model.pt": b"\0" * 1000})
+        client.max_disk_cache_bytes = 2500
+        first, _ = client.ensure_cached("ae", "1")
+        second, _ = client.ensure_cached("ae", "2")
+        os.utime(os.path.join(first, "manifest.json"), (1, 1))
+        os.utime(os.path.join(second, "manifest.json"), (2, 2))
+        # Using the first entry again makes the second one the oldest
+        client.ensure_cached("ae", "1")
+        client.ensure_cached("ae", "3")
+        assert os.path.exists(first)
+        assert not os.path.exists(second)
+        assert os.path.exists(client._get_cache_path("ae", "3"))
+
+    def test_eviction_removes_lock_files_of_deleted_entries(self, client, mock_mlflow):
+        mock_ml, _, _ = mock_mlflow
+        mock_ml.artifacts.download_artifacts.side_effect = fake_download({"model.pt": b"\0" * 1000})
+        client.max_disk_cache_bytes = 1500
+        first, _ = client.ensure_cached("ae", "1")
+        os.utime(os.path.join(first, "manifest.json"), (1, 1))
+        second, _ = client.ensure_cached("ae", "2")
+        assert not os.path.exists(first)
+        assert not os.path.exists(first + ".lock")
+        assert os.path.exists(second + ".lock")
+
+        orphan = os.path.join(client.cache_dir, "gone_v1.lock")
+        open(orphan, "w").close()
+        client.evict_disk_cache()
+        assert not os.path.exists(orphan)
+        assert os.path.exists(second + ".lock")
+
+    def test_entry_used_during_eviction_is_kept(self, client, mock_mlflow):
+        from arroyosas.lse_reduction import mlflow_utils
+
+        mock_ml, _, _ = mock_mlflow
+        mock_ml.artifacts.download_artifacts.side_effect = fake_download({"model.pt": b"\0" * 1000})
+        first, _ = client.ensure_cached("ae", "1")
+        second, _ = client.ensure_cached("ae", "2")
+        os.utime(os.path.join(first, "manifest.json"), (1, 1))
+        os.utime(os.path.join(second, "manifest.json"), (2, 2))
+        client.max_disk_cache_bytes = 1500
+        lock = mlflow_utils._file_lock
+
+        def load_first_meanwhile(path, blocking=True):
+            # Another worker loads the first entry after the cache was listed
+            if path == first + ".lock" and not blocking:
+                os.utime(os.path.join(first, "manifest.json"))
+            return lock(path, blocking)
+
+        with patch("arroyosas.lse_reduction.mlflow_utils._file_lock", side_effect=load_first_meanwhile):
+            client.evict_disk_cache()
+        assert os.path.exists(first)
+        assert not os.path.exists(second)
+
+    def test_eviction_removes_stale_downloads(self, client, mock_mlflow):
+        os.makedirs(client.cache_dir, exist_ok=True)
+        stale = os.path.join(client.cache_dir, ".download_stale")
+        os.makedirs(stale)
+        os.utime(stale, (1, 1))
+        client.evict_disk_cache()
+        assert not os.path.exists(stale)
 
 
 class TestCacheManagement:
@@ -249,12 +416,14 @@ class TestCheckModelCompatibility:
         # Mock get_mlflow_params for autoencoder
         mv1 = MagicMock()
         mv1.run_id = "run1"
-        inner.get_model_version.side_effect = [mv1, mv1]
+        mv2 = MagicMock()
+        mv2.run_id = "run2"
+        inner.get_model_version.side_effect = lambda name, version: mv1 if name == "ae_model" else mv2
         run1 = MagicMock()
         run1.data.params = {"latent_dim": "32"}
         run2 = MagicMock()
         run2.data.params = {"input_dim": "32"}
-        inner.get_run.side_effect = [run1, run2]
+        inner.get_run.side_effect = {"run1": run1, "run2": run2}.get
 
         result = client.check_model_compatibility("ae_model:1", "umap_model:1")
         assert result is True
@@ -263,12 +432,14 @@ class TestCheckModelCompatibility:
         _, _, inner = mock_mlflow
         mv1 = MagicMock()
         mv1.run_id = "run1"
-        inner.get_model_version.side_effect = [mv1, mv1]
+        mv2 = MagicMock()
+        mv2.run_id = "run2"
+        inner.get_model_version.side_effect = lambda name, version: mv1 if name == "ae_model" else mv2
         run1 = MagicMock()
         run1.data.params = {"latent_dim": "32"}
         run2 = MagicMock()
         run2.data.params = {"input_dim": "64"}
-        inner.get_run.side_effect = [run1, run2]
+        inner.get_run.side_effect = {"run1": run1, "run2": run2}.get
 
         result = client.check_model_compatibility("ae_model:1", "umap_model:1")
         assert result is False
@@ -277,3 +448,209 @@ class TestCheckModelCompatibility:
         assert client.check_model_compatibility(None, "model") is False
         assert client.check_model_compatibility("model", None) is False
         assert client.check_model_compatibility(None, None) is False
+
+
+class TestModelCache:
+    def test_lru_eviction_by_count(self):
+        from arroyosas.lse_reduction.mlflow_utils import ModelCache
+
+        cache = ModelCache(max_models=2)
+        cache["a:1"] = "A"
+        cache["b:1"] = "B"
+        assert cache["a:1"] == "A"  # a is now the most recently used
+        cache["c:1"] = "C"
+        assert "b:1" not in cache
+        assert "a:1" in cache and "c:1" in cache
+
+    def test_pinned_models_not_evicted(self):
+        from arroyosas.lse_reduction.mlflow_utils import ModelCache
+
+        cache = ModelCache(max_models=1)
+        cache["active:1"] = "active"
+        cache.pin(["active:1", None])
+        cache["other:1"] = "other"
+        assert "active:1" in cache
+        assert "other:1" not in cache
+
+    def test_memory_budget(self):
+        from arroyosas.lse_reduction.mlflow_utils import ModelCache
+
+        cache = ModelCache(max_models=10, max_memory_mb=1)
+        cache.put("a:1", "A", size_bytes=600_000)
+        cache.put("b:1", "B", size_bytes=600_000)
+        assert "a:1" not in cache
+        assert cache.total_bytes == 600_000
+        assert not cache.has_room(500_000)
+
+    def test_prefetched_models_evicted_first(self):
+        from arroyosas.lse_reduction.mlflow_utils import ModelCache
+
+        cache = ModelCache(max_models=2)
+        cache.put("used:1", "used")
+        cache.put("prefetched:1", "prefetched", recent=False)
+        cache.put("new:1", "new")
+        assert "prefetched:1" not in cache
+        assert "used:1" in cache
+
+    def test_load_model_records_artifact_size(self, client, mock_mlflow):
+        mock_ml, _, _ = mock_mlflow
+        mock_ml.artifacts.download_artifacts.side_effect = fake_download({"weights.bin": b"\0" * 1000})
+        client.load_model("disk_model", version="4")
+        assert client._model_cache.total_bytes == 1000
+
+
+class TestPrefetch:
+    def test_prefetch_loads_latest_live_versions(self, client, mock_mlflow):
+        _, _, inner = mock_mlflow
+        version = MagicMock()
+        version.version = "3"
+        inner.search_model_versions.return_value = [version]
+        with (
+            patch.object(client, "get_mlflow_models", return_value=[{"label": "ae", "value": "ae"}]),
+            patch.object(client, "load_model") as load_model,
+        ):
+            client.prefetch_live_models().join(timeout=5)
+        load_model.assert_called_once_with("ae", prefetch=True)
+
+    def test_prefetched_model_is_used_by_latest_selection(self, client, mock_mlflow):
+        mock_ml, _, inner = mock_mlflow
+        version = MagicMock()
+        version.version = "3"
+        inner.search_model_versions.return_value = [version]
+        mock_ml.artifacts.download_artifacts.side_effect = fake_download({"model.pt": b"weights"})
+        with patch.object(client, "get_mlflow_models", return_value=[{"label": "ae", "value": "ae"}]):
+            client.prefetch_live_models().join(timeout=5)
+        assert mock_ml.pyfunc.load_model.call_count == 1
+
+        # The reducer selects live models by bare name
+        assert client.load_model("ae") is mock_ml.pyfunc.load_model.return_value
+        assert mock_ml.pyfunc.load_model.call_count == 1
+
+    def test_prefetch_skips_models_already_loaded(self, client, mock_mlflow):
+        from arroyosas.lse_reduction.mlflow_utils import MLflowClient
+
+        _, _, inner = mock_mlflow
+        version = MagicMock()
+        version.version = "3"
+        inner.search_model_versions.return_value = [version]
+        MLflowClient._model_cache.put("ae", MagicMock())
+        with (
+            patch.object(client, "get_mlflow_models", return_value=[{"label": "ae", "value": "ae"}]),
+            patch.object(client, "load_model") as load_model,
+        ):
+            client.prefetch_live_models().join(timeout=5)
+        load_model.assert_not_called()
+
+    def test_prefetch_stops_when_cache_full(self, client, mock_mlflow):
+        from arroyosas.lse_reduction.mlflow_utils import MLflowClient
+
+        MLflowClient._model_cache.configure(max_models=1)
+        MLflowClient._model_cache["busy:1"] = MagicMock()
+        _, _, inner = mock_mlflow
+        version = MagicMock()
+        version.version = "1"
+        inner.search_model_versions.return_value = [version]
+        try:
+            with (
+                patch.object(client, "get_mlflow_models", return_value=[{"label": "ae", "value": "ae"}]),
+                patch.object(client, "load_model") as load_model,
+            ):
+                client.prefetch_live_models().join(timeout=5)
+            load_model.assert_not_called()
+        finally:
+            MLflowClient._model_cache.configure(max_models=8)
+
+
+def _version(name, version, run_id):
+    v = MagicMock()
+    v.name = name
+    v.version = version
+    v.run_id = run_id
+    return v
+
+
+def _run(**tags):
+    run = MagicMock()
+    run.data.tags = tags
+    return run
+
+
+class TestMetadataCache:
+    def test_get_mlflow_models_fetches_each_run_once(self, client, mock_mlflow):
+        _, _, inner = mock_mlflow
+        inner.search_model_versions.return_value = [
+            _version("ae", "1", "r1"),
+            _version("ae", "2", "r2"),
+            _version("umap", "1", "r3"),
+        ]
+        runs = {"r1": _run(exp_type="live_mode"), "r2": _run(), "r3": _run(exp_type="live_mode")}
+        inner.get_run.side_effect = runs.get
+
+        options = client.get_mlflow_models(livemode=True)
+        assert options == [{"label": "ae", "value": "ae"}, {"label": "umap", "value": "umap"}]
+        assert inner.get_run.call_count == 3
+
+        # A second listing is served from the cache
+        client.get_mlflow_models(livemode=True)
+        assert inner.search_model_versions.call_count == 1
+        assert inner.get_run.call_count == 3
+
+    def test_failed_run_lookup_skips_version(self, client, mock_mlflow):
+        _, _, inner = mock_mlflow
+        inner.search_model_versions.return_value = [_version("ae", "1", "r1"), _version("ae", "2", "r2")]
+
+        def get_run(run_id):
+            if run_id == "r2":
+                raise Exception("run deleted")
+            return _run()
+
+        inner.get_run.side_effect = get_run
+        assert client.get_mlflow_models() == [{"label": "ae", "value": "ae"}]
+
+    def test_compatibility_checks_are_cached(self, client, mock_mlflow):
+        _, _, inner = mock_mlflow
+        versions = {"ae_model": _version("ae_model", "1", "run1"), "umap_model": _version("umap_model", "1", "run2")}
+        inner.get_model_version.side_effect = lambda name, version: versions[name]
+        run1 = MagicMock()
+        run1.data.params = {"latent_dim": "32"}
+        run2 = MagicMock()
+        run2.data.params = {"input_dim": "32"}
+        inner.get_run.side_effect = {"run1": run1, "run2": run2}.get
+
+        for _ in range(3):
+            assert client.check_model_compatibility("ae_model:1", "umap_model:1") is True
+        assert inner.get_model_version.call_count == 2
+        assert inner.get_run.call_count == 2
+
+    def test_invalidate_metadata(self, client, mock_mlflow):
+        _, _, inner = mock_mlflow
+        inner.search_model_versions.return_value = []
+        client.get_model_versions("ae")
+        client.invalidate_metadata()
+        client.get_model_versions("ae")
+        assert inner.search_model_versions.call_count == 2
+
+    def test_entries_expire(self, mock_mlflow):
+        from arroyosas.lse_reduction.mlflow_utils import MetadataCache
+
+        cache = MetadataCache(ttl_seconds=0)
+        loader = MagicMock(return_value="value")
+        cache.get("key", loader)
+        cache.get("key", loader)
+        assert loader.call_count == 2
+
+    def test_concurrent_misses_share_one_request(self, mock_mlflow):
+        from arroyosas.lse_reduction.mlflow_utils import MetadataCache
+
+        cache = MetadataCache()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.1)
+            return "value"
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda _: cache.get("key", loader), range(4)))
+        assert results == ["value"] * 4
+        assert len(calls) == 1
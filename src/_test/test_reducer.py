@@ -5,7 +5,7 @@ from unittest.mock import MagicMock, patch
 import numpy as np
 import pytest
 
-from arroyosas.lse_reduction.reducer import Reducer
+from arroyosas.lse_reduction.reducer import ModelCandidate, Reducer
 from arroyosas.schemas import RawFrameEvent, SerializableNumpyArrayModel
 
 
@@ -14,6 +14,10 @@ def _make_raw_frame():
     return RawFrameEvent(image=image, frame_number=0, tiled_url="http://example.com")
 
 
+def _raise(error):
+    raise error
+
+
 def _make_mock_redis_store():
     store = MagicMock()
     store.get_autoencoder_model.return_value = "ae_model:1"
@@ -173,6 +177,11 @@ class TestLatentSpaceReducer:
             # Should call with False to indicate no loading needed
             mock_update.assert_called_with(False)
 
+    def test_handle_model_update_invalidates_metadata(self, reducer_instance):
+        reducer, _, mlflow_client, _ = reducer_instance
+        reducer._handle_model_update({"model_type": "dimred", "model_name": "umap_model:1"})
+        mlflow_client.invalidate_metadata.assert_called_once()
+
     def test_handle_model_update_invalid(self, reducer_instance):
         reducer, _, _, _ = reducer_instance
         # Invalid update without model_type and model_name
@@ -194,3 +203,301 @@ class TestLatentSpaceReducer:
         # This was already called during init, so the thread was attempted
         # We just verify reducer is still in valid state
         assert reducer is not None
+
+
+class TestReduceBatch:
+    def test_models_run_once_on_stacked_frames(self, reducer_instance):
+        reducer, _, _, mock_dimred = reducer_instance
+        reducer.current_torch_model = MagicMock()
+        reducer.current_torch_model.predict.return_value = {"latent_features": np.random.rand(3, 16)}
+        mock_dimred.predict.return_value = {"coords": np.array([[0.0, 1.0], [2.0, 3.0], [4.0, 5.0]])}
+
+        f_vecs, timing = reducer.reduce_batch([_make_raw_frame() for _ in range(3)])
+
+        assert reducer.current_torch_model.predict.call_args[0][0].shape == (3, 10, 10)
+        mock_dimred.predict.assert_called_once()
+        assert [f.tolist() for f in f_vecs] == [[[0.0, 1.0]], [[2.0, 3.0]], [[4.0, 5.0]]]
+        assert timing["batch_size"] == 3
+        assert timing["autoencoder_time"] is not None
+
+    def test_falls_back_when_model_does_not_batch(self, reducer_instance):
+        reducer, _, _, mock_dimred = reducer_instance
+        reducer.current_torch_model = MagicMock()
+        reducer.current_torch_model.predict.return_value = {"latent_features": np.random.rand(1, 16)}
+        mock_dimred.predict.return_value = {"coords": np.array([[0.5, 0.3]])}
+
+        f_vecs, _ = reducer.reduce_batch([_make_raw_frame() for _ in range(2)])
+
+        # One stacked attempt, then one call per frame
+        assert reducer.current_torch_model.predict.call_count == 3
+        assert len(f_vecs) == 2 and all(f is not None for f in f_vecs)
+
+        # The mismatch is remembered, later batches go straight to frame by frame
+        reducer.reduce_batch([_make_raw_frame() for _ in range(2)])
+        assert reducer.current_torch_model.predict.call_count == 5
+
+    def test_falls_back_when_batched_autoencoder_fails(self, reducer_instance):
+        reducer, _, _, mock_dimred = reducer_instance
+        reducer.current_torch_model = MagicMock()
+        reducer.current_torch_model.predict.side_effect = lambda images: (
+            _raise(ValueError("bad batch")) if images.ndim == 3 else {"latent_features": np.random.rand(1, 16)}
+        )
+        mock_dimred.predict.return_value = {"coords": np.array([[0.5, 0.3]])}
+
+        f_vecs, _ = reducer.reduce_batch([_make_raw_frame() for _ in range(2)])
+
+        assert len(f_vecs) == 2 and all(f is not None for f in f_vecs)
+        assert reducer.current_torch_model not in reducer._unbatchable
+
+    def test_falls_back_when_batched_dimred_fails(self, reducer_instance):
+        reducer, _, _, mock_dimred = reducer_instance
+        reducer.current_torch_model = MagicMock()
+        reducer.current_torch_model.predict.side_effect = lambda images: {
+            "latent_features": np.random.rand(len(images) if images.ndim == 3 else 1, 16)
+        }
+        mock_dimred.predict.side_effect = lambda latents: (
+            _raise(ValueError("bad batch")) if len(latents) > 1 else {"coords": np.array([[0.5, 0.3]])}
+        )
+
+        f_vecs, _ = reducer.reduce_batch([_make_raw_frame() for _ in range(3)])
+
+        assert len(f_vecs) == 3 and all(f is not None for f in f_vecs)
+
+    def test_returns_none_per_frame_when_loading(self, reducer_instance):
+        reducer, _, _, _ = reducer_instance
+        reducer.is_loading_model = True
+        f_vecs, _ = reducer.reduce_batch([_make_raw_frame() for _ in range(2)])
+        assert f_vecs == [None, None]
+
+
+class TestHotSwap:
+    def test_frames_served_while_new_model_loads(self, reducer_instance):
+        reducer, _, _, _ = reducer_instance
+        served = []
+
+        def slow_load(name, version=None):
+            # A frame arriving mid-load is reduced by the current model
+            served.append(reducer.reduce(_make_raw_frame()))
+            return MagicMock()
+
+        reducer.mlflow_client = MagicMock()
+        reducer.mlflow_client.load_model.side_effect = slow_load
+        reducer._handle_model_update({"model_type": "dimred", "model_name": "new_umap:3"})
+
+        f_vec, timing = served[0]
+        assert f_vec is not None
+        assert timing["dimred_model"] == "umap_model:1"
+        assert reducer.dimred_model_name == "new_umap:3"
+        assert reducer.is_loading_model is False
+
+    def test_new_model_warmed_up_on_last_frame(self, reducer_instance):
+        reducer, _, _, _ = reducer_instance
+        reducer.reduce(_make_raw_frame())
+        new_model = MagicMock()
+        reducer.mlflow_client = MagicMock()
+        reducer.mlflow_client.load_model.return_value = new_model
+        reducer._handle_model_update({"model_type": "autoencoder", "model_name": "new_ae:2"})
+        assert new_model.predict.call_args[0][0].shape == (10, 10)
+
+    def test_dimred_warm_up_does_not_run_served_autoencoder(self, reducer_instance):
+        reducer, _, _, _ = reducer_instance
+        reducer.reduce(_make_raw_frame())
+        served = reducer.current_torch_model
+        served_calls = served.predict.call_count
+        new_model = MagicMock()
+        reducer.mlflow_client = MagicMock()
+        reducer.mlflow_client.load_model.return_value = new_model
+        reducer._handle_model_update({"model_type": "dimred", "model_name": "new_umap:3"})
+        assert served.predict.call_count == served_calls
+        assert new_model.predict.call_args[0][0].shape == (1, 16)
+
+    def test_model_in_use_not_warmed_up(self, reducer_instance):
+        reducer, _, _, _ = reducer_instance
+        reducer.reduce(_make_raw_frame())
+        reducer.dual_run_frames = 5
+        candidate = MagicMock()
+        candidate.predict.return_value = {"coords": np.array([[0.6, 0.3]])}
+        reducer._candidate = ModelCandidate("dimred", candidate, "new_umap:3", 5)
+        reducer._warm_up("dimred", candidate)
+        candidate.predict.assert_not_called()
+
+    def test_dual_run_swaps_after_frames(self, reducer_instance):
+        reducer, _, _, mock_dimred = reducer_instance
+        reducer.dual_run_frames = 2
+        candidate = MagicMock()
+        candidate.predict.return_value = {"coords": np.array([[0.6, 0.3]])}
+        reducer.mlflow_client = MagicMock()
+        reducer.mlflow_client.load_model.return_value = candidate
+        reducer._handle_model_update({"model_type": "dimred", "model_name": "new_umap:3"})
+
+        # The current model keeps serving until the candidate has seen two frames
+        assert reducer.current_dim_reduction_model is mock_dimred
+        _, timing = reducer.reduce(_make_raw_frame())
+        assert timing["dimred_model"] == "umap_model:1"
+        assert reducer.current_dim_reduction_model is mock_dimred
+        reducer.reduce(_make_raw_frame())
+        assert reducer.current_dim_reduction_model is candidate
+        assert reducer.dimred_model_name == "new_umap:3"
+        assert reducer._candidate is None
+
+    def test_failing_candidate_discarded(self, reducer_instance):
+        reducer, _, _, mock_dimred = reducer_instance
+        reducer.dual_run_frames = 5
+        candidate = MagicMock()
+        candidate.predict.side_effect = ValueError("wrong latent size")
+        reducer.mlflow_client = MagicMock()
+        reducer.mlflow_client.load_model.return_value = candidate
+        reducer._handle_model_update({"model_type": "dimred", "model_name": "new_umap:3"})
+
+        f_vec, _ = reducer.reduce(_make_raw_frame())
+        assert f_vec is not None
+        assert reducer._candidate is None
+        assert reducer.current_dim_reduction_model is mock_dimred
+        assert reducer.dimred_model_name == "umap_model:1"
+
+
+class TestReproject:
+    def test_reproject_cached_latents_in_one_call(self, reducer_instance):
+        reducer, _, _, mock_dimred = reducer_instance
+        for i in range(3):
+            frame = _make_raw_frame()
+            frame.frame_number = i
+            frame.tiled_url = f"http://example.com/{i}"
+            reducer.reduce(frame)
+
+        new_dimred = MagicMock()
+        new_dimred.predict.return_value = {"coords": np.arange(6.0).reshape(3, 2)}
+        reducer._swap_model("dimred", new_dimred, "pca:1")
+        keys, coords, timing = reducer.reproject()
+
+        new_dimred.predict.assert_called_once()
+        assert new_dimred.predict.call_args[0][0].shape == (3, 16)
+        assert [index for _, index in keys] == [0, 1, 2]
+        assert coords.shape == (3, 2)
+        assert timing["dimred_model"] == "pca:1"
+
+    def test_start_run_clears_cache(self, reducer_instance):
+        reducer, _, _, _ = reducer_instance
+        reducer.reduce(_make_raw_frame())
+        reducer.start_run()
+        assert reducer.reproject() == ([], None, {})
+
+    def test_swap_notifies_listener(self, reducer_instance):
+        reducer, _, _, _ = reducer_instance
+        swaps = []
+        reducer.on_model_swap = lambda model_type, model_id: swaps.append((model_type, model_id))
+        reducer._swap_model("dimred", MagicMock(), "pca:1")
+        assert swaps == [("dimred", "pca:1")]
+
+
+class TestInferenceBackend:
+    def test_autoencoder_optimized_once_in_background(self, reducer_instance):
+        from arroyosas.lse_reduction.inference import InferenceConfig
+
+        reducer, _, _, _ = reducer_instance
+        reducer.inference_config = InferenceConfig(backend="torchscript")
+
+        def run_inline(target, args, daemon):
+            thread = MagicMock()
+            thread.start.side_effect = lambda: target(*args)
+            return thread
+
+        with (
+            patch("arroyosas.lse_reduction.reducer.optimize_model") as optimize,
+            patch("arroyosas.lse_reduction.reducer.threading.Thread", side_effect=run_inline),
+        ):
+            reducer.reduce(_make_raw_frame())
+            reducer.reduce(_make_raw_frame())
+        optimize.assert_called_once()
+        assert optimize.call_args[0][3] == "ae_model:1"
+
+    def test_optimizer_converts_a_private_copy(self, reducer_instance):
+        from arroyosas.lse_reduction.inference import InferenceConfig
+
+        reducer, _, _, _ = reducer_instance
+        reducer.inference_config = InferenceConfig(backend="torchscript")
+        served = reducer.current_torch_model
+        threads = []
+
+        def deferred(target, args, daemon):
+            threads.append((target, args))
+            return MagicMock()
+
+        with (
+            patch("arroyosas.lse_reduction.reducer.optimize_model", return_value=True) as optimize,
+            patch("arroyosas.lse_reduction.reducer.threading.Thread", side_effect=deferred),
+        ):
+            reducer.reduce(_make_raw_frame())
+            served_calls = served.predict.call_count
+            target, args = threads[0]
+            target(*args)
+
+        # The optimizer never runs the served model, its optimized copy replaces it under the lock
+        optimized = optimize.call_args[0][0]
+        assert optimized is not served
+        assert served.predict.call_count == served_calls
+        assert reducer.current_torch_model is optimized
+        assert reducer.autoencoder_model_name == "ae_model:1"
+
+        # Reloading the same autoencoder later serves its optimized copy
+        reducer.mlflow_client = MagicMock()
+        reducer.mlflow_client.load_model.return_value = served
+        reducer._swap_model("autoencoder", MagicMock(), "other_ae:1")
+        reducer._handle_model_update({"model_type": "autoencoder", "model_name": "ae_model:1"})
+        assert reducer.current_torch_model is optimized
+
+    def test_optimized_copy_not_served_after_swap(self, reducer_instance):
+        from arroyosas.lse_reduction.inference import InferenceConfig
+
+        reducer, _, _, _ = reducer_instance
+        reducer.inference_config = InferenceConfig(backend="torchscript")
+        threads = []
+
+        def deferred(target, args, daemon):
+            threads.append((target, args))
+            return MagicMock()
+
+        with (
+            patch("arroyosas.lse_reduction.reducer.optimize_model", return_value=True),
+            patch("arroyosas.lse_reduction.reducer.threading.Thread", side_effect=deferred),
+        ):
+            reducer.reduce(_make_raw_frame())
+            new_model = MagicMock()
+            reducer._swap_model("autoencoder", new_model, "new_ae:2")
+            target, args = threads[0]
+            target(*args)
+        assert reducer.current_torch_model is new_model
+        assert reducer.autoencoder_model_name == "new_ae:2"
+
+    def test_failed_optimization_keeps_served_model(self, reducer_instance):
+        from arroyosas.lse_reduction.inference import InferenceConfig
+
+        reducer, _, _, _ = reducer_instance
+        reducer.inference_config = InferenceConfig(backend="torchscript")
+        served = reducer.current_torch_model
+
+        def run_inline(target, args, daemon):
+            thread = MagicMock()
+            thread.start.side_effect = lambda: target(*args)
+            return thread
+
+        with (
+            patch("arroyosas.lse_reduction.reducer.optimize_model", return_value=False),
+            patch("arroyosas.lse_reduction.reducer.threading.Thread", side_effect=run_inline),
+        ):
+            reducer.reduce(_make_raw_frame())
+        assert reducer.current_torch_model is served
+
+    def test_default_config_does_not_optimize(self, reducer_instance):
+        reducer, _, _, _ = reducer_instance
+        with patch("arroyosas.lse_reduction.reducer.optimize_model") as optimize:
+            reducer.reduce(_make_raw_frame())
+        optimize.assert_not_called()
+
+
+class TestModelPinning:
+    def test_active_models_pinned_after_swap(self, reducer_instance):
+        reducer, _, _, _ = reducer_instance
+        reducer.mlflow_client = MagicMock()
+        reducer._swap_model("dimred", MagicMock(), "pca:1")
+        reducer.mlflow_client.pin_models.assert_called_with(["ae_model:1", "pca:1", None])
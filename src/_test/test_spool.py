@@ -0,0 +1,146 @@
+"""Tests for arroyosas.tiled.spool (TiledSpool)"""
+
+import asyncio
+from unittest.mock import MagicMock
+
+import httpx
+import numpy as np
+import pandas as pd
+import pytest
+
+from arroyosas.tiled.spool import (
+    OP_APPEND,
+    OP_CONTAINER,
+    OP_ROWS,
+    TiledSpool,
+    ensure_container,
+    is_transient,
+    write_rows,
+)
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = TiledSpool(str(tmp_path / "spool" / "tiled.db"), replay_rate=1000, retry_s=0.01)
+    yield spool
+    spool.close()
+
+
+class TestTiledSpool:
+    def test_entries_kept_in_order(self, spool):
+        spool.append(OP_CONTAINER, ("run",))
+        spool.append(OP_ROWS, ("run", "dim_reduction"), np.ones((2, 3), dtype=np.float32), offset=4)
+        spool.append(OP_APPEND, ("run", "table"), pd.DataFrame({"a": [1.0, 2.0], "b": ["x", "y"]}))
+        entries = spool.peek(10)
+        assert [entry.op for entry in entries] == [OP_CONTAINER, OP_ROWS, OP_APPEND]
+        assert entries[0].payload is None
+        assert entries[1].path == ("run", "dim_reduction")
+        assert entries[1].offset == 4
+        assert entries[1].payload.dtype == np.float32
+        assert entries[1].payload.shape == (2, 3)
+        assert list(entries[2].payload["b"]) == ["x", "y"]
+        assert len(spool) == 3
+
+    def test_survives_reopen(self, spool):
+        spool.append(OP_CONTAINER, ("run",))
+        reopened = TiledSpool(spool.path)
+        assert len(reopened) == 1
+        assert reopened.blocks(("run", "dim_reduction"))
+        reopened.close()
+
+    def test_blocks_related_paths(self, spool):
+        spool.append(OP_ROWS, ("run", "dim_reduction"), np.ones((1, 2)), offset=0)
+        assert spool.blocks(("run", "dim_reduction"))
+        assert spool.blocks(("run", "dim_reduction", "child"))
+        assert spool.blocks(("run",))
+        assert not spool.blocks(("run", "one_d_reduction"))
+        assert not spool.blocks(("other_run",))
+        spool.remove(spool.peek(1)[0])
+        assert not spool.blocks(("run", "dim_reduction"))
+        assert len(spool) == 0
+
+    async def test_replay_in_order(self, spool):
+        for index in range(3):
+            spool.append(OP_ROWS, ("run", "node"), np.full((1, 2), index), offset=index)
+        applied = []
+        spool.start_replay(lambda entry: applied.append(entry.offset))
+        await spool._replay_task
+        assert applied == [0, 1, 2]
+        assert len(spool) == 0
+
+    async def test_replay_retries_until_applied(self, spool):
+        spool.append(OP_CONTAINER, ("run",))
+        apply = MagicMock(side_effect=[httpx.ConnectError("tiled unavailable"), None])
+        await asyncio.wait_for(spool.replay(apply), timeout=1)
+        assert apply.call_count == 2
+        assert len(spool) == 0
+
+    async def test_rejected_entry_moved_to_dead_letters(self, spool):
+        for index in range(3):
+            spool.append(OP_ROWS, ("run", "node"), np.full((1, 2), index), offset=index)
+        applied = []
+
+        def apply(entry):
+            if entry.offset == 0:
+                raise ValueError("shape mismatch")
+            applied.append(entry.offset)
+
+        await asyncio.wait_for(spool.replay(apply), timeout=1)
+        assert applied == [1, 2]
+        assert len(spool) == 0
+        assert not spool.blocks(("run", "node"))
+        [(entry, error)] = spool.dead_letters()
+        assert entry.offset == 0
+        assert entry.payload.tolist() == [[0, 0]]
+        assert error == "ValueError: shape mismatch"
+
+    def test_dead_letters_survive_reopen(self, spool):
+        spool.append(OP_CONTAINER, ("run",))
+        spool.dead_letter(spool.peek(1)[0], ValueError("bad"))
+        reopened = TiledSpool(spool.path)
+        assert len(reopened) == 0
+        assert [entry.path for entry, _ in reopened.dead_letters()] == [("run",)]
+        reopened.close()
+
+    def test_transient_errors(self):
+        request = httpx.Request("PUT", "http://tiled")
+        assert is_transient(httpx.ConnectError("refused"))
+        assert is_transient(httpx.ReadTimeout("slow"))
+        assert is_transient(ConnectionResetError())
+        for status, transient in ((503, True), (429, True), (400, False), (404, False), (422, False)):
+            response = httpx.Response(status, request=request)
+            error = httpx.HTTPStatusError("failed", request=request, response=response)
+            assert is_transient(error) is transient
+        assert not is_transient(ValueError("schema mismatch"))
+
+    async def test_start_replay_noop_when_empty(self, spool):
+        spool.start_replay(MagicMock())
+        assert spool._replay_task is None
+
+
+class TestTiledHelpers:
+    def test_ensure_container_creates_missing(self):
+        root = MagicMock()
+        root.__contains__ = MagicMock(return_value=False)
+        child = root.create_container.return_value
+        child.__contains__ = MagicMock(return_value=True)
+        assert ensure_container(root, ("a", "b")) is child.__getitem__.return_value
+        root.create_container.assert_called_once_with("a")
+        child.__getitem__.assert_called_once_with("b")
+
+    def test_write_rows_patches_existing(self):
+        parent = MagicMock()
+        parent.__contains__ = MagicMock(return_value=True)
+        rows = np.ones((2, 3))
+        write_rows(parent, "node", rows, 5)
+        parent.__getitem__.return_value.patch.assert_called_once_with(rows, offset=(5,), extend=True)
+
+    def test_write_rows_creates_padded_node(self):
+        parent = MagicMock()
+        parent.__contains__ = MagicMock(return_value=False)
+        write_rows(parent, "node", np.ones((1, 2), dtype=np.float32), 2)
+        written = parent.write_array.call_args[0][0]
+        assert written.shape == (3, 2)
+        assert np.isnan(written[:2]).all()
+        assert written[2].tolist() == [1.0, 1.0]
+        assert parent.write_array.call_args[1] == {"key": "node"}
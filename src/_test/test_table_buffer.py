@@ -0,0 +1,124 @@
+"""Tests for arroyosas.lse_reduction.table_buffer (LatentTableBuffer)"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from arroyosas.lse_reduction.schemas import LatentSpaceEvent
+from arroyosas.lse_reduction.table_buffer import MAX_FEATURE_COLUMNS, LatentTableBuffer, table_schema
+
+
+def _event(index, vector, **kwargs):
+    return LatentSpaceEvent(tiled_url=f"http://example.com/{index}", feature_vector=vector, index=index, **kwargs)
+
+
+def _append(buffer, index, vector, **kwargs):
+    buffer.append(_event(index, vector, **kwargs), np.array(vector, dtype=np.float32))
+
+
+class TestLatentTableBuffer:
+    def test_to_dataframe_columns(self):
+        buffer = LatentTableBuffer()
+        _append(buffer, 0, [1.0, 2.0], autoencoder_model="ae:1", dimred_model="umap:1", timestamp=10.0, dimred_time=0.5)
+        df = buffer.to_dataframe()
+        assert list(df.columns) == [
+            "tiled_url",
+            "autoencoder_model",
+            "dimred_model",
+            "timestamp",
+            "total_processing_time",
+            "autoencoder_time",
+            "dimred_time",
+            "vector_row",
+            "feature_0",
+            "feature_1",
+        ]
+        row = df.iloc[0]
+        assert row["tiled_url"] == "http://example.com/0"
+        assert row["autoencoder_model"] == "ae:1"
+        assert row["timestamp"] == 10.0
+        assert row["dimred_time"] == 0.5
+        assert np.isnan(row["autoencoder_time"])
+        assert row["feature_1"] == 2.0
+
+    def test_missing_timestamp_defaults_to_append_time(self):
+        buffer = LatentTableBuffer()
+        before = time.time()
+        _append(buffer, 0, [1.0, 2.0])
+        timestamp = buffer.to_dataframe()["timestamp"].iloc[0]
+        assert before <= timestamp <= time.time()
+
+    def test_grows_past_capacity(self):
+        buffer = LatentTableBuffer(capacity=2)
+        for index in range(5):
+            _append(buffer, index, [float(index), 0.0])
+        df = buffer.to_dataframe()
+        assert len(buffer) == 5
+        assert list(df["feature_0"]) == [0.0, 1.0, 2.0, 3.0, 4.0]
+        assert list(df["tiled_url"])[-1] == "http://example.com/4"
+
+    def test_wider_vector_adds_columns(self):
+        buffer = LatentTableBuffer()
+        _append(buffer, 0, [1.0, 2.0])
+        _append(buffer, 1, [1.0, 2.0, 3.0])
+        df = buffer.to_dataframe()
+        assert np.isnan(df["feature_2"].iloc[0])
+        assert df["feature_2"].iloc[1] == 3.0
+
+    def test_feature_columns_capped(self):
+        buffer = LatentTableBuffer()
+        _append(buffer, 0, list(np.arange(64, dtype=float)))
+        df = buffer.to_dataframe()
+        assert f"feature_{MAX_FEATURE_COLUMNS - 1}" in df.columns
+        assert f"feature_{MAX_FEATURE_COLUMNS}" not in df.columns
+
+    def test_clear(self):
+        buffer = LatentTableBuffer()
+        _append(buffer, 0, [1.0, 2.0, 3.0])
+        buffer.clear()
+        assert buffer.empty
+        _append(buffer, 1, [5.0])
+        df = buffer.to_dataframe()
+        assert list(df["feature_0"]) == [5.0]
+        assert "feature_1" not in df.columns
+
+    def test_matches_row_by_row_concat(self):
+        buffer = LatentTableBuffer(capacity=1)
+        rows = []
+        for index in range(3):
+            _append(buffer, index, [0.5 * index, 1.5], total_processing_time=0.1 * index)
+            rows.append(buffer.to_dataframe().iloc[-1].to_dict())
+        pd.testing.assert_frame_equal(buffer.to_dataframe(), pd.DataFrame(rows))
+
+    def test_full_vectors_kept_past_feature_columns(self):
+        buffer = LatentTableBuffer(capacity=1)
+        _append(buffer, 0, list(np.arange(64, dtype=float)))
+        _append(buffer, 1, [1.0, 2.0])
+        vectors = buffer.vector_array()
+        assert vectors.dtype == np.float32
+        assert vectors.shape == (2, 64)
+        assert vectors[0, 63] == 63.0
+        assert vectors[1, 1] == 2.0
+        assert np.isnan(vectors[1, 2])
+
+    def test_vector_array_resized_to_width(self):
+        buffer = LatentTableBuffer()
+        _append(buffer, 0, [1.0, 2.0, 3.0])
+        assert buffer.vector_array(2).tolist() == [[1.0, 2.0]]
+        assert np.isnan(buffer.vector_array(4)[0, 3])
+
+    def test_vector_rows_continue_after_clear(self):
+        buffer = LatentTableBuffer()
+        _append(buffer, 0, [1.0])
+        _append(buffer, 1, [1.0])
+        assert list(buffer.to_dataframe()["vector_row"]) == [0, 1]
+        buffer.clear()
+        _append(buffer, 2, [1.0])
+        assert buffer.first_row == 2
+        assert list(buffer.to_dataframe()["vector_row"]) == [2]
+        assert buffer.vector_array().shape == (1, 1)
+
+    def test_schema_types(self):
+        schema = table_schema(["tiled_url", "vector_row", "feature_0"])
+        assert [str(t) for t in schema.types] == ["string", "int64", "double"]
@@ -13,9 +13,11 @@ from arroyosas.schemas import (
     SerializableNumpyArrayModel,
 )
 from arroyosas.tiled.tiled_poller import (
+    ProcessedRun,
     TiledPollingRedisListener,
     TiledProcessedPublisher,
     TiledRawFrameOperator,
+    TiledRowWriter,
     create_run_container,
     get_most_recent_run,
     get_run_container,
@@ -259,14 +261,15 @@ async def test_processed_publisher_handles_start():
     with patch("arroyosas.tiled.tiled_poller.get_run_container", return_value=run_container):
         await publisher.publish(start)
 
-    assert publisher.run_node is run_container
+    assert publisher.run.node is run_container
+    assert publisher.runs == {"id1": publisher.run}
 
 
 @pytest.mark.asyncio
 async def test_processed_publisher_handles_stop():
     root_container = MagicMock()
     publisher = TiledProcessedPublisher(root_container)
-    publisher.run_node = MagicMock()
+    publisher.run = ProcessedRun("id1", "run1_id1", MagicMock())
 
     stop = SASStop(num_frames=5)
     await publisher.publish(stop)  # Should not raise
@@ -276,9 +279,8 @@ async def test_processed_publisher_handles_stop():
 async def test_processed_publisher_no_run_node_logs_error():
     root_container = MagicMock()
     publisher = TiledProcessedPublisher(root_container)
-    publisher.run_node = None
 
-    # Publish a non-start, non-stop message without run_node
+    # Publish a non-start, non-stop message without a run
     from arroyosas.schemas import SAS1DReduction
 
     curve = SerializableNumpyArrayModel(array=np.array([1.0, 2.0]))
@@ -299,7 +301,8 @@ async def test_processed_publisher_handles_latent_space_event():
 
     root_container = MagicMock()
     publisher = TiledProcessedPublisher(root_container)
-    publisher.run_node = MagicMock()
+    publisher.run = ProcessedRun("id1", "run1_id1", MagicMock())
+    publisher.runs["id1"] = publisher.run
 
     event = LSEEvent(
         tiled_url="http://example.com",
@@ -308,7 +311,267 @@ async def test_processed_publisher_handles_latent_space_event():
     )
 
     mock_dim_node = MagicMock()
-    with patch("arroyosas.tiled.tiled_poller.create_dim_reduction_node", return_value=mock_dim_node):
+    with patch("arroyosas.tiled.tiled_poller.create_row_node", return_value=mock_dim_node) as create:
         await publisher.publish(event)
 
-    assert publisher.dim_reduced_array_node is mock_dim_node
+    assert publisher.run.writers["dim_reduction"].array_client is mock_dim_node
+    assert create.call_args[0][1] == "dim_reduction"
+    assert create.call_args[0][2].shape == (256, 2)
+
+
+# ---------------------------------------------------------------------------
+# TiledProcessedPublisher write-behind rows
+# ---------------------------------------------------------------------------
+
+
+def _latent(index, vector=(0.1, 0.2)):
+    from arroyosas.schemas import LatentSpaceEvent as LSEEvent
+
+    return LSEEvent(tiled_url=f"http://example.com/{index}", feature_vector=list(vector), index=index)
+
+
+@pytest.fixture
+def write_behind():
+    publisher = TiledProcessedPublisher(MagicMock(), flush_interval_s=60, rows_per_chunk=1)
+    publisher.run = ProcessedRun("id1", "run1_id1", MagicMock())
+    publisher.runs["id1"] = publisher.run
+    dim_node = MagicMock()
+    with patch("arroyosas.tiled.tiled_poller.create_row_node", return_value=dim_node):
+        yield publisher, dim_node
+
+
+@pytest.mark.asyncio
+async def test_processed_publisher_coalesces_rows(write_behind):
+    publisher, dim_node = write_behind
+    for index in range(4):
+        await publisher.publish(_latent(index, (float(index), 0.5)))
+    dim_node.patch.assert_not_called()
+
+    await publisher.flush()
+    dim_node.patch.assert_called_once()
+    rows = dim_node.patch.call_args[0][0]
+    assert rows.tolist() == [[1.0, 0.5], [2.0, 0.5], [3.0, 0.5]]
+    assert dim_node.patch.call_args[1] == {"offset": (1,), "extend": True}
+
+    await publisher.publish(_latent(4))
+    await publisher.flush()
+    assert dim_node.patch.call_args[1]["offset"] == (4,)
+
+
+@pytest.mark.asyncio
+async def test_processed_publisher_stop_flushes(write_behind):
+    publisher, dim_node = write_behind
+    for index in range(3):
+        await publisher.publish(_latent(index))
+    await publisher.publish(SASStop(num_frames=3))
+    assert dim_node.patch.call_args[0][0].shape == (2, 2)
+    assert publisher._flush_timer is None
+
+
+@pytest.mark.asyncio
+async def test_processed_publisher_flushes_after_interval(write_behind):
+    publisher, dim_node = write_behind
+    publisher.flush_interval_s = 0.01
+    for index in range(3):
+        await publisher.publish(_latent(index))
+    await asyncio.sleep(0.05)
+    dim_node.patch.assert_called_once()
+
+
+def test_row_writer_retries_failed_patch():
+    array_client = MagicMock()
+    array_client.patch.side_effect = [RuntimeError("tiled unavailable"), None]
+    writer = TiledRowWriter(array_client, (2,), np.float32)
+    writer.add(np.array([1.0, 2.0]))
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    writer.add(np.array([3.0, 4.0]))
+    assert writer.flush() == 2
+    assert array_client.patch.call_args[0][0].dtype == np.float32
+    assert array_client.patch.call_args[1]["offset"] == (1,)
+    assert writer.rows_written == 3
+
+
+def test_row_writer_drops_mismatched_rows():
+    array_client = MagicMock()
+    writer = TiledRowWriter(array_client, (2,), np.float64)
+    writer.add(np.array([1.0, 2.0, 3.0]))
+    assert writer.flush() == 0
+    array_client.patch.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_processed_publisher_spools_and_replays(tmp_path):
+    root_container = MagicMock()
+    publisher = TiledProcessedPublisher(
+        root_container, flush_interval_s=60, spool_path=str(tmp_path / "spool.db"), rows_per_chunk=1
+    )
+    publisher.spool.retry_s = 0.01
+    publisher.spool.replay_rate = 1000
+    dim_node = MagicMock()
+    dim_node.patch.side_effect = RuntimeError("tiled unavailable")
+    # Tiled is down for the replay too
+    root_container.__contains__ = MagicMock(side_effect=RuntimeError("tiled unavailable"))
+    start = SASStart(run_name="run1", run_id="id1", width=10, height=10, data_type="float32", tiled_url="http://x")
+
+    with (
+        patch("arroyosas.tiled.tiled_poller.get_run_container", return_value=MagicMock()),
+        patch("arroyosas.tiled.tiled_poller.create_row_node", return_value=dim_node),
+    ):
+        await publisher.publish(start)
+        for index in range(3):
+            await publisher.publish(_latent(index))
+        await publisher.flush()
+        # Later rows of the node queue up behind the spooled ones
+        await publisher.publish(_latent(3))
+        await publisher.flush()
+    dim_node.patch.assert_called_once()
+    assert [entry.offset for entry in publisher.spool.peek(10)] == [1, 3]
+
+    run_container = MagicMock()
+    run_container.__contains__ = MagicMock(return_value=True)
+    root_container.__contains__ = MagicMock(return_value=True)
+    root_container.__getitem__ = MagicMock(return_value=run_container)
+    await asyncio.wait_for(publisher.spool._replay_task, timeout=1)
+
+    root_container.__getitem__.assert_called_with("run1_id1")
+    replayed = run_container.__getitem__.return_value.patch.call_args_list
+    assert [c[1]["offset"] for c in replayed] == [(1,), (3,)]
+    assert replayed[0][0][0].shape == (2, 2)
+    assert len(publisher.spool) == 0
+    publisher.spool.close()
+
+
+@pytest.mark.asyncio
+async def test_processed_publisher_spools_run_creation(tmp_path):
+    publisher = TiledProcessedPublisher(
+        MagicMock(), flush_interval_s=60, spool_path=str(tmp_path / "spool.db"), rows_per_chunk=1
+    )
+    publisher.spool.retry_s = 60
+    start = SASStart(run_name="run1", run_id="id1", width=10, height=10, data_type="float32", tiled_url="http://x")
+    with patch("arroyosas.tiled.tiled_poller.get_run_container", side_effect=RuntimeError("tiled unavailable")):
+        await publisher.publish(start)
+    await publisher.publish(_latent(0))
+    await publisher.publish(_latent(1))
+    await publisher.flush()
+    entries = publisher.spool.peek(10)
+    assert [(entry.op, entry.path, entry.offset) for entry in entries] == [
+        ("container", ("run1_id1",), None),
+        ("rows", ("run1_id1", "dim_reduction"), 0),
+        ("rows", ("run1_id1", "dim_reduction"), 1),
+    ]
+    publisher.spool.close()
+
+
+# ---------------------------------------------------------------------------
+# TiledProcessedPublisher runs and chunked nodes
+# ---------------------------------------------------------------------------
+
+
+def _start(run_id):
+    return SASStart(run_name="run", run_id=run_id, width=10, height=10, data_type="float32", tiled_url="http://x")
+
+
+@pytest.mark.asyncio
+async def test_processed_publisher_new_run_gets_new_nodes():
+    publisher = TiledProcessedPublisher(MagicMock(), flush_interval_s=60, rows_per_chunk=4)
+    nodes = [MagicMock(), MagicMock()]
+    containers = {"id1": MagicMock(), "id2": MagicMock()}
+    with (
+        patch("arroyosas.tiled.tiled_poller.get_run_container", side_effect=lambda root, m: containers[m.run_id]),
+        patch("arroyosas.tiled.tiled_poller.create_row_node", side_effect=nodes) as create,
+    ):
+        for run_id in ("id1", "id2"):
+            await publisher.publish(_start(run_id))
+            await publisher.publish(_latent(0))
+            await publisher.publish(_latent(1))
+            await publisher.publish(SASStop(num_frames=2))
+
+    assert [c[0][0] for c in create.call_args_list] == [containers["id1"], containers["id2"]]
+    for node in nodes:
+        assert node.patch.call_args[1]["offset"] == (1,)
+        node.update_metadata.assert_called_once_with(metadata={"rows": 2, "chunk_rows": 4})
+    # The stopped first run is dropped once the second starts
+    assert list(publisher.runs) == ["id2"]
+
+
+@pytest.mark.asyncio
+async def test_processed_publisher_restarted_run_keeps_nodes():
+    publisher = TiledProcessedPublisher(MagicMock(), flush_interval_s=60, rows_per_chunk=4)
+    dim_node = MagicMock()
+    with (
+        patch("arroyosas.tiled.tiled_poller.get_run_container", return_value=MagicMock()) as get_run,
+        patch("arroyosas.tiled.tiled_poller.create_row_node", return_value=dim_node) as create,
+    ):
+        await publisher.publish(_start("id1"))
+        await publisher.publish(_latent(0))
+        await publisher.publish(_start("id1"))
+        await publisher.publish(_latent(1))
+        await publisher.flush()
+    get_run.assert_called_once()
+    create.assert_called_once()
+    assert dim_node.patch.call_args[1]["offset"] == (1,)
+
+
+def test_row_writer_grows_by_chunks():
+    array_client = MagicMock()
+    writer = TiledRowWriter(array_client, (2,), np.float32, chunk_rows=4, capacity=4)
+    for index in range(3):
+        writer.add(np.array([index, index]))
+    writer.flush()
+    # Rows 1-3 fit the first chunk
+    assert array_client.patch.call_args[0][0].shape == (3, 2)
+    writer.add(np.array([3.0, 3.0]))
+    writer.add(np.array([4.0, 4.0]))
+    writer.flush()
+    # Rows 4-5 start the second chunk, padded to its end
+    grown = array_client.patch.call_args[0][0]
+    assert array_client.patch.call_args[1]["offset"] == (4,)
+    assert grown.shape == (4, 2)
+    assert grown[:2].tolist() == [[3.0, 3.0], [4.0, 4.0]]
+    assert np.isnan(grown[2:]).all()
+    assert (writer.rows_written, writer.capacity) == (6, 8)
+
+
+def test_row_writer_records_row_count_every_flush():
+    array_client = MagicMock()
+    writer = TiledRowWriter(array_client, (2,), np.float32, chunk_rows=4, capacity=4)
+    writer.add(np.array([1.0, 2.0]))
+    writer.flush()
+    array_client.update_metadata.assert_called_once_with(metadata={"rows": 2, "chunk_rows": 4})
+    writer.add(np.array([3.0, 4.0]))
+    writer.flush()
+    array_client.update_metadata.assert_called_with(metadata={"rows": 3, "chunk_rows": 4})
+    # Already recorded, SASStop has nothing to update
+    writer.write_row_count()
+    assert array_client.update_metadata.call_count == 2
+
+
+def test_row_writer_keeps_rows_when_row_count_fails():
+    array_client = MagicMock()
+    array_client.update_metadata.side_effect = RuntimeError("tiled unavailable")
+    writer = TiledRowWriter(array_client, (2,), np.float32, path=("run", "dim"))
+    writer.add(np.array([1.0, 2.0]))
+    assert writer.flush() == 1
+    assert writer.pending == []
+    assert writer.rows_written == 2
+
+
+def test_row_writer_pads_integer_rows_with_nan():
+    array_client = MagicMock()
+    writer = TiledRowWriter(array_client, (2,), np.int64, chunk_rows=4, capacity=1)
+    writer.add(np.array([0, 0]))
+    writer.flush()
+    written = array_client.patch.call_args[0][0]
+    assert written.dtype == np.float64
+    assert written[0].tolist() == [0.0, 0.0]
+    assert np.isnan(written[1:]).all()
+
+
+@pytest.mark.asyncio
+async def test_processed_publisher_skips_reprojected_points(write_behind):
+    publisher, dim_node = write_behind
+    event = _latent(0)
+    event.reprojected = True
+    await publisher.publish(event)
+    assert publisher.run.writers == {}
@@ -12,58 +12,44 @@ from arroyosas.schemas import (
     SerializableNumpyArrayModel,
 )
 from arroyosas.tiled.tiled_poller import (
+    ProcessedRun,
     TiledPollingFrameListener,
     TiledProcessedPublisher,
+    allocate_rows,
     create_array_node,
-    create_dim_reduction_node,
-    create_one_d_node,
+    create_row_node,
     create_tiled_processed_publisher,
     get_nested_client,
     get_runs_container,
     patch_tiled_frame,
+    writer_for_node,
 )
 
 # ---------------------------------------------------------------------------
-# create_one_d_node
+# allocate_rows / create_row_node
 # ---------------------------------------------------------------------------
 
 
-def test_create_one_d_node():
-    run_node = MagicMock()
-    mock_array_node = MagicMock()
-    run_node.write_array.return_value = mock_array_node
-
-    curve = SerializableNumpyArrayModel(array=np.array([1.0, 2.0, 3.0]))
-    raw = SerializableNumpyArrayModel(array=np.array([[1.0], [2.0]]))
-    msg = SAS1DReduction(
-        curve=curve,
-        curve_tiled_url="http://c.com",
-        raw_frame=raw,
-        raw_frame_tiled_url="http://r.com",
-    )
-    result = create_one_d_node(run_node, msg)
-    run_node.write_array.assert_called_once()
-    assert result is mock_array_node
+def test_allocate_rows_pads_first_chunk():
+    rows = allocate_rows(np.array([1.0, 2.0, 3.0], dtype=np.float32), 4)
+    assert rows.shape == (4, 3)
+    assert rows.dtype == np.float32
+    assert rows[0].tolist() == [1.0, 2.0, 3.0]
+    assert np.isnan(rows[1:]).all()
 
 
-# ---------------------------------------------------------------------------
-# create_dim_reduction_node
-# ---------------------------------------------------------------------------
+def test_allocate_rows_integer_rows_as_float():
+    rows = allocate_rows(np.array([1, 2]), 2)
+    assert rows.dtype == np.float64
+    assert np.isnan(rows[1]).all()
 
 
-def test_create_dim_reduction_node():
+def test_create_row_node():
     run_node = MagicMock()
-    mock_node = MagicMock()
-    run_node.write_array.return_value = mock_node
-
-    event = LatentSpaceEvent(
-        tiled_url="http://example.com",
-        feature_vector=[0.1, 0.2, 0.3],
-        index=0,
-    )
-    result = create_dim_reduction_node(run_node, event)
-    run_node.write_array.assert_called_once()
-    assert result is mock_node
+    rows = allocate_rows(np.array([0.1, 0.2, 0.3]), 8)
+    result = create_row_node(run_node, "dim_reduction", rows)
+    run_node.write_array.assert_called_once_with(rows, key="dim_reduction", metadata={"rows": 1, "chunk_rows": 8})
+    assert result is run_node.write_array.return_value
 
 
 # ---------------------------------------------------------------------------
@@ -179,7 +165,7 @@ def test_create_tiled_processed_publisher_no_api_key(monkeypatch):
 
 
 # ---------------------------------------------------------------------------
-# TiledProcessedPublisher - update_1d_nodes, update_ls_nodes, get_run_path
+# TiledProcessedPublisher - existing nodes, get_run_path
 # ---------------------------------------------------------------------------
 
 
@@ -187,11 +173,13 @@ def test_create_tiled_processed_publisher_no_api_key(monkeypatch):
 async def test_processed_publisher_update_1d_nodes():
     root_container = MagicMock()
     publisher = TiledProcessedPublisher(root_container)
-    publisher.run_node = MagicMock()
+    publisher.run = ProcessedRun("id1", "run1_id1", MagicMock())
 
     mock_array_node = MagicMock()
     mock_array_node.shape = (3, 5)
-    publisher.one_d_array_node = mock_array_node
+    mock_array_node.dtype = np.dtype("float64")
+    publisher.run.writers["one_d_reduction"] = writer_for_node(mock_array_node)
+    publisher.runs["id1"] = publisher.run
 
     curve = SerializableNumpyArrayModel(array=np.array([1.0, 2.0, 3.0, 4.0, 5.0]))
     raw = SerializableNumpyArrayModel(array=np.array([[1.0], [2.0]]))
@@ -202,20 +190,25 @@ async def test_processed_publisher_update_1d_nodes():
         raw_frame_tiled_url="http://r.com",
     )
 
-    with patch("arroyosas.tiled.tiled_poller.patch_tiled_frame") as mock_patch:
-        await publisher.publish(msg)
-        mock_patch.assert_called_once()
+    await publisher.publish(msg)
+    mock_array_node.patch.assert_not_called()
+    await publisher.flush()
+    mock_array_node.patch.assert_called_once()
+    assert mock_array_node.patch.call_args[0][0].shape == (1, 5)
+    assert mock_array_node.patch.call_args[1] == {"offset": (3,), "extend": True}
 
 
 @pytest.mark.asyncio
 async def test_processed_publisher_update_ls_nodes():
     root_container = MagicMock()
     publisher = TiledProcessedPublisher(root_container)
-    publisher.run_node = MagicMock()
+    publisher.run = ProcessedRun("id1", "run1_id1", MagicMock())
 
     mock_dim_node = MagicMock()
     mock_dim_node.shape = (5, 3)
-    publisher.dim_reduced_array_node = mock_dim_node
+    mock_dim_node.dtype = np.dtype("float64")
+    publisher.run.writers["dim_reduction"] = writer_for_node(mock_dim_node)
+    publisher.runs["id1"] = publisher.run
 
     event = LatentSpaceEvent(
         tiled_url="http://example.com",
@@ -223,9 +216,10 @@ async def test_processed_publisher_update_ls_nodes():
         index=0,
     )
 
-    with patch("arroyosas.tiled.tiled_poller.patch_tiled_frame") as mock_patch:
-        await publisher.publish(event)
-        mock_patch.assert_called_once()
+    await publisher.publish(event)
+    await publisher.flush()
+    mock_dim_node.patch.assert_called_once()
+    assert mock_dim_node.patch.call_args[1]["offset"] == (5,)
 
 
 def test_processed_publisher_get_run_path():
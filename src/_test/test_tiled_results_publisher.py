@@ -1,13 +1,31 @@
 """Tests for arroyosas.lse_reduction.tiled_results_publisher (TiledResultsPublisher)"""
 
+from datetime import datetime
 from unittest.mock import AsyncMock, MagicMock, patch
 
-import pandas as pd
+import numpy as np
 import pytest
 
 from arroyosas.lse_reduction.schemas import LatentSpaceEvent
-from arroyosas.lse_reduction.tiled_results_publisher import TiledResultsPublisher
+from arroyosas.lse_reduction.table_buffer import LatentTableBuffer
+from arroyosas.lse_reduction.tiled_results_publisher import CALIFORNIA_TZ, DayContainerCache, TiledResultsPublisher
 from arroyosas.schemas import SASStop
+from arroyosas.tiled.spool import TiledSpool
+
+
+def _spool_without_replay(path):
+    # Replay is driven by the tests
+    spool = TiledSpool(path)
+    spool.start_replay = MagicMock()
+    return spool
+
+
+def _buffer_with_rows(count=1, vector=(0.1, 0.2)):
+    buffer = LatentTableBuffer()
+    for index in range(count):
+        event = LatentSpaceEvent(tiled_url=f"http://example.com/{index}", feature_vector=list(vector), index=index)
+        buffer.append(event, np.array(vector, dtype=np.float32))
+    return buffer
 
 
 @pytest.fixture
@@ -171,7 +189,7 @@ class TestPublishAsync:
     async def test_publish_flush_signal(self, publisher):
         pub, _ = publisher
         pub.current_uuid = "some-uuid"
-        pub.uuid_dataframes = {"some-uuid": pd.DataFrame([{"x": 1}])}
+        pub.uuid_buffers = {"some-uuid": _buffer_with_rows()}
 
         with patch.object(pub, "write_table_to_tiled", new=AsyncMock()) as mock_write:
             flush_event = LatentSpaceEvent(
@@ -219,8 +237,8 @@ class TestPublishAsync:
         )
         with patch.object(pub, "write_table_to_tiled", new=AsyncMock()):
             await pub.publish(event)
-        # Should have added to uuid_dataframes
-        assert len(pub.uuid_dataframes) > 0
+        # Should have added to uuid_buffers
+        assert len(pub.uuid_buffers) > 0
 
 
 class TestStopSync:
@@ -228,7 +246,7 @@ class TestStopSync:
         pub, day_container = publisher
         uuid = "cccccccc-cccc-cccc-cccc-cccccccccccc"
         pub.current_uuid = uuid
-        pub.uuid_dataframes = {uuid: pd.DataFrame([{"x": 1}])}
+        pub.uuid_buffers = {uuid: _buffer_with_rows()}
 
         exp_container = MagicMock()
         exp_container.__contains__ = MagicMock(return_value=False)
@@ -270,3 +288,321 @@ class TestStartSync:
             pub.day_container.__iter__ = MagicMock(return_value=iter([]))
             pub._start_sync()
             mock_setup.assert_called_once()
+
+
+class TestStreaming:
+    @pytest.fixture
+    def streaming(self, publisher):
+        pub, day_container = publisher
+        pub.stream_rows = 2
+        uuid_container = MagicMock()
+        uuid_container.__contains__ = MagicMock(return_value=False)
+        uuid_container.write_array.return_value.shape = (2, 2)
+        exp_container = MagicMock()
+        exp_container.__contains__ = MagicMock(return_value=False)
+        exp_container.__getitem__ = MagicMock(return_value=uuid_container)
+        day_container.__contains__ = MagicMock(return_value=False)
+        day_container.__getitem__ = MagicMock(return_value=exp_container)
+        return pub, uuid_container
+
+    @staticmethod
+    def _event(index, uuid="abc12345-1234-1234-1234-abcdef012345"):
+        return LatentSpaceEvent(
+            tiled_url=f"http://tiled.example.com/{uuid}/data/{index}",
+            feature_vector=[float(index), 0.5],
+            index=index,
+            experiment_name="exp",
+        )
+
+    async def test_appends_partitions_every_n_rows(self, streaming):
+        pub, uuid_container = streaming
+        table = uuid_container.create_appendable_table.return_value
+        for index in range(5):
+            await pub.publish(self._event(index))
+
+        uuid_container.create_appendable_table.assert_called_once()
+        schema = uuid_container.create_appendable_table.call_args[0][0]
+        assert schema.names[0] == "tiled_url"
+        assert uuid_container.create_appendable_table.call_args[1]["key"] == "feature_vectors"
+        partitions = [c[0][1] for c in table.append_partition.call_args_list]
+        assert [list(df["feature_0"]) for df in partitions] == [[0.0, 1.0], [2.0, 3.0]]
+        uuid_container.write_dataframe.assert_not_called()
+        # Only the unwritten row is kept in memory
+        assert len(pub.uuid_buffers["abc12345-1234-1234-1234-abcdef012345"]) == 1
+
+    async def test_stop_appends_remaining_rows(self, streaming):
+        pub, uuid_container = streaming
+        table = uuid_container.create_appendable_table.return_value
+        for index in range(3):
+            await pub.publish(self._event(index))
+        await pub.publish(SASStop(num_frames=3))
+        partitions = [c[0][1] for c in table.append_partition.call_args_list]
+        assert [len(df) for df in partitions] == [2, 1]
+
+    async def test_appends_after_interval(self, streaming):
+        pub, uuid_container = streaming
+        pub.stream_rows = 100
+        pub.stream_interval_s = 0
+        table = uuid_container.create_appendable_table.return_value
+        await pub.publish(self._event(0))
+        await pub.publish(self._event(1))
+        assert table.append_partition.call_count == 2
+
+    async def test_later_rows_keep_table_columns(self, streaming):
+        pub, uuid_container = streaming
+        table = uuid_container.create_appendable_table.return_value
+        for index in range(2):
+            await pub.publish(self._event(index))
+        wide = self._event(2)
+        wide.feature_vector = [1.0, 2.0, 3.0]
+        await pub.publish(wide)
+        await pub.publish(self._event(3))
+        partitions = [c[0][1] for c in table.append_partition.call_args_list]
+        assert list(partitions[1].columns) == list(partitions[0].columns)
+
+    async def test_vectors_appended_to_array(self, streaming):
+        pub, uuid_container = streaming
+        table = uuid_container.create_appendable_table.return_value
+        array = uuid_container.write_array.return_value
+        for index in range(5):
+            await pub.publish(self._event(index))
+
+        uuid_container.write_array.assert_called_once()
+        first = uuid_container.write_array.call_args
+        assert first[1]["key"] == "feature_vector_array"
+        assert first[0][0].dtype == np.float32
+        assert first[0][0].tolist() == [[0.0, 0.5], [1.0, 0.5]]
+        array.patch.assert_called_once()
+        assert array.patch.call_args[0][0].tolist() == [[2.0, 0.5], [3.0, 0.5]]
+        assert array.patch.call_args[1] == {"offset": (2,), "extend": True}
+        partitions = [c[0][1] for c in table.append_partition.call_args_list]
+        assert [list(df["vector_row"]) for df in partitions] == [[0, 1], [2, 3]]
+
+    async def test_failed_table_write_rewrites_same_rows(self, streaming):
+        pub, uuid_container = streaming
+        table = uuid_container.create_appendable_table.return_value
+        array = uuid_container.write_array.return_value
+        for index in range(2):
+            await pub.publish(self._event(index))
+        table.append_partition.side_effect = RuntimeError("tiled unavailable")
+        for index in range(2, 4):
+            await pub.publish(self._event(index))
+        table.append_partition.side_effect = None
+        await pub.publish(SASStop(num_frames=4))
+        assert [c[1]["offset"] for c in array.patch.call_args_list] == [(2,), (2,)]
+        assert [list(c[0][1]["vector_row"]) for c in table.append_partition.call_args_list][-1] == [2, 3]
+
+
+class TestNodeIndex:
+    @pytest.fixture
+    def indexed(self, publisher):
+        pub, day_container = publisher
+        uuid_container = MagicMock()
+        uuid_container.__contains__ = MagicMock(return_value=False)
+        exp_container = MagicMock()
+        exp_container.__contains__ = MagicMock(return_value=False)
+        exp_container.__getitem__ = MagicMock(return_value=uuid_container)
+        day_container.__contains__ = MagicMock(return_value=False)
+        day_container.__getitem__ = MagicMock(return_value=exp_container)
+        return pub, day_container, exp_container
+
+    @staticmethod
+    def _event(index, uuid="abc12345-1234-1234-1234-abcdef012345"):
+        return LatentSpaceEvent(
+            tiled_url=f"http://tiled.example.com/{uuid}/data/{index}",
+            feature_vector=[float(index), 0.5],
+            index=index,
+            experiment_name="exp",
+        )
+
+    def test_vectors_do_not_query_tiled(self, indexed):
+        pub, day_container, exp_container = indexed
+        pub._publish_sync(self._event(0))
+        day_container.__contains__.reset_mock()
+        exp_container.__contains__.reset_mock()
+        for index in range(1, 10):
+            pub._publish_sync(self._event(index))
+        day_container.__contains__.assert_not_called()
+        exp_container.__contains__.assert_not_called()
+        day_container.create_container.assert_called_once_with("exp")
+
+    def test_full_vectors_written_as_array(self, indexed):
+        pub, _, exp_container = indexed
+        uuid_container = exp_container.__getitem__.return_value
+        event = self._event(0)
+        event.feature_vector = list(np.arange(32, dtype=float))
+        pub._publish_sync(event)
+        pub._write_table_to_tiled_sync("abc12345-1234-1234-1234-abcdef012345")
+        vectors = uuid_container.write_array.call_args[0][0]
+        assert vectors.shape == (1, 32)
+        df = uuid_container.write_dataframe.call_args[0][0]
+        assert "feature_31" not in df.columns
+        assert list(df["vector_row"]) == [0]
+
+    def test_created_nodes_are_not_looked_up_again(self, indexed):
+        pub, _, exp_container = indexed
+        pub._publish_sync(self._event(0))
+        pub._write_table_to_tiled_sync("abc12345-1234-1234-1234-abcdef012345")
+        exp_container.create_container.assert_called_once()
+        exp_container.__contains__.reset_mock()
+        # The table just written is known locally, later vectors for the UUID are skipped
+        assert pub._publish_sync(self._event(1)) is None
+        assert len(pub.uuid_buffers["abc12345-1234-1234-1234-abcdef012345"]) == 0
+        exp_container.__contains__.assert_not_called()
+
+    def test_index_refreshed_when_due(self, indexed):
+        pub, day_container, _ = indexed
+        pub.node_index.refresh_s = 0
+        pub._publish_sync(self._event(0))
+        pub._publish_sync(self._event(1))
+        assert day_container.__contains__.call_count == 2
+
+
+class TestSpool:
+    UUID = "abc12345-1234-1234-1234-abcdef012345"
+
+    @pytest.fixture
+    def spooled(self, publisher, tmp_path):
+        pub, day_container = publisher
+        pub.day_path = ("2026", "10", "19")
+        pub.spool = _spool_without_replay(str(tmp_path / "spool.db"))
+        uuid_container = MagicMock()
+        uuid_container.__contains__ = MagicMock(return_value=False)
+        uuid_container.write_array.side_effect = RuntimeError("tiled unavailable")
+        exp_container = MagicMock()
+        exp_container.__contains__ = MagicMock(return_value=False)
+        exp_container.__getitem__ = MagicMock(return_value=uuid_container)
+        day_container.__contains__ = MagicMock(return_value=False)
+        day_container.__getitem__ = MagicMock(return_value=exp_container)
+        yield pub, uuid_container
+        pub.spool.close()
+
+    def _event(self, index):
+        return LatentSpaceEvent(
+            tiled_url=f"http://tiled.example.com/{self.UUID}/data/{index}",
+            feature_vector=[float(index), 0.5],
+            index=index,
+            experiment_name="exp",
+        )
+
+    def test_failed_write_spooled(self, spooled):
+        pub, uuid_container = spooled
+        for index in range(3):
+            pub._publish_sync(self._event(index))
+        pub._write_table_to_tiled_sync(self.UUID)
+
+        rows, table = pub.spool.peek(10)
+        uuid_path = ("2026", "10", "19", "exp", self.UUID)
+        assert rows.op == "rows"
+        assert rows.path == (*uuid_path, "feature_vector_array")
+        assert rows.offset == 0
+        assert rows.payload.shape == (3, 2)
+        assert table.op == "table"
+        assert table.path == (*uuid_path, "feature_vectors")
+        assert list(table.payload["vector_row"]) == [0, 1, 2]
+        assert pub.uuid_buffers[self.UUID].empty
+        # As after a live write, the spooled table counts as written
+        assert pub._publish_sync(self._event(3)) is None
+        assert pub.uuid_buffers[self.UUID].empty
+
+    def test_streamed_rows_queue_behind_spooled(self, spooled):
+        pub, uuid_container = spooled
+        pub.stream_rows = 2
+        for index in range(2):
+            pub._publish_sync(self._event(index))
+        pub._write_table_to_tiled_sync(self.UUID)
+        uuid_container.write_array.side_effect = None
+        for index in range(2, 4):
+            pub._publish_sync(self._event(index))
+        pub._write_table_to_tiled_sync(self.UUID)
+
+        uuid_container.write_array.assert_called_once()
+        entries = pub.spool.peek(10)
+        assert [entry.op for entry in entries] == ["rows", "append", "rows", "append"]
+        assert [entry.offset for entry in entries if entry.op == "rows"] == [0, 2]
+        assert list(entries[3].payload["vector_row"]) == [2, 3]
+
+    def test_replay_writes_below_root(self, spooled):
+        pub, _ = spooled
+        pub._publish_sync(self._event(0))
+        pub._write_table_to_tiled_sync(self.UUID)
+        parent = MagicMock()
+        parent.__contains__ = MagicMock(return_value=False)
+        with patch("arroyosas.lse_reduction.tiled_results_publisher.ensure_container", return_value=parent) as ensure:
+            for entry in pub.spool.peek(10):
+                pub._apply_spooled(entry)
+        ensure.assert_called_with(pub.root_container, ("2026", "10", "19", "exp", self.UUID))
+        assert parent.write_array.call_args[1] == {"key": "feature_vector_array"}
+        assert parent.write_dataframe.call_args[1] == {"key": "feature_vectors"}
+
+
+class TestDayContainerCache:
+    def test_resolves_each_container_once(self, mock_container):
+        _, root, year, month, _ = mock_container
+        cache = DayContainerCache(root)
+        day = cache.get(("2026", "10", "19"))
+        assert cache.get(("2026", "10", "19")) is day
+        cache.get(("2026", "10", "20"))
+        root.create_container.assert_called_once_with("2026")
+        year.create_container.assert_called_once_with("10")
+        assert [c[0][0] for c in month.create_container.call_args_list] == ["19", "20"]
+
+    def test_keeps_recent_days(self, mock_container):
+        _, root, *_ = mock_container
+        cache = DayContainerCache(root, keep_days=2)
+        for day in ("19", "20", "21"):
+            cache.get(("2026", "10", day))
+        assert [path for path in cache.nodes if len(path) == 3] == [("2026", "10", "20"), ("2026", "10", "21")]
+
+    def test_next_day_due_before_midnight(self, mock_container):
+        _, root, *_ = mock_container
+        cache = DayContainerCache(root, prefetch_s=600)
+        assert cache.next_day_due(CALIFORNIA_TZ.localize(datetime(2026, 12, 31, 12, 0))) is None
+        late = CALIFORNIA_TZ.localize(datetime(2026, 12, 31, 23, 55))
+        assert cache.next_day_due(late) == ("2027", "01", "01")
+        # Not again until retry_s has passed, and not once resolved
+        assert cache.next_day_due(late) is None
+        cache.attempted.clear()
+        cache.get(("2027", "01", "01"))
+        assert cache.next_day_due(late) is None
+
+
+class TestDayRollover:
+    @pytest.fixture
+    def rolling(self, publisher):
+        pub, _ = publisher
+        pub.day_cache = DayContainerCache(pub.root_container)
+        pub.day_path = ("2000", "01", "01")
+        pub.node_index.add(("exp",), MagicMock())
+        return pub
+
+    def test_moves_to_today(self, rolling):
+        rolling._roll_day_sync()
+        assert rolling.day_path == rolling.day_cache.day_key()
+        assert rolling.day_container is rolling.day_cache.nodes[rolling.day_path]
+        assert rolling.node_index.nodes == {}
+
+    def test_started_uuid_stays_in_its_day(self, rolling):
+        rolling.current_uuid = "abc"
+        rolling.streaming_tables["abc"] = (MagicMock(), [])
+        rolling._roll_day_sync()
+        assert rolling.day_path == ("2000", "01", "01")
+
+    def test_unwritten_uuid_moves(self, rolling):
+        rolling.current_uuid = "abc"
+        rolling.uuid_buffers["abc"] = _buffer_with_rows(2)
+        rolling._roll_day_sync()
+        assert rolling.day_path == rolling.day_cache.day_key()
+
+    def test_stays_when_day_unreachable(self, rolling):
+        rolling.root_container.__contains__ = MagicMock(side_effect=RuntimeError("tiled unavailable"))
+        rolling._roll_day_sync()
+        assert rolling.day_path == ("2000", "01", "01")
+        assert ("exp",) in rolling.node_index.nodes
+
+    async def test_prefetches_next_day(self, rolling):
+        # Always within the prefetch window
+        rolling.day_cache.prefetch_s = 2 * 24 * 3600
+        rolling._prefetch_next_day()
+        await rolling._prefetch_task
+        assert len([path for path in rolling.day_cache.nodes if len(path) == 3]) == 1
@@ -2,15 +2,25 @@
 
 from unittest.mock import MagicMock, patch
 
-import pandas as pd
+import numpy as np
 import pytest
 
+from arroyosas.lse_reduction.schemas import LatentSpaceEvent
+from arroyosas.lse_reduction.table_buffer import LatentTableBuffer
 from arroyosas.lse_reduction.tiled_results_publisher import (
     TiledResultsPublisher,
     tiled_results_publisher_factory,
 )
 
 
+def _buffer_with_rows(count=1, vector=(0.1, 0.2)):
+    buffer = LatentTableBuffer()
+    for index in range(count):
+        event = LatentSpaceEvent(tiled_url=f"http://example.com/{index}", feature_vector=list(vector), index=index)
+        buffer.append(event, np.array(vector, dtype=np.float32))
+    return buffer
+
+
 def _make_publisher_with_containers(
     has_day_container=True,
     tiled_prefix=None,
@@ -162,8 +172,8 @@ class TestWriteTableToTiledSync:
         day_container.__contains__ = MagicMock(return_value=False)
         day_container.__getitem__ = MagicMock(return_value=exp_container)
 
-        # No dataframe stored
-        pub.uuid_dataframes = {}
+        # No rows stored
+        pub.uuid_buffers = {}
 
         pub._write_table_to_tiled_sync("nonexistent-uuid")
         # write_dataframe should NOT have been called
@@ -182,7 +192,7 @@ class TestWriteTableToTiledSync:
         day_container.__contains__ = MagicMock(return_value=False)
         day_container.__getitem__ = MagicMock(return_value=exp_container)
 
-        pub.uuid_dataframes = {uuid: pd.DataFrame()}  # empty
+        pub.uuid_buffers = {uuid: LatentTableBuffer()}  # empty
 
         pub._write_table_to_tiled_sync(uuid)
         # write_dataframe should NOT be called for empty DF
@@ -206,8 +216,7 @@ class TestWriteTableToTiledSync:
         day_container.__contains__ = MagicMock(return_value=False)
         day_container.__getitem__ = MagicMock(return_value=exp_container)
 
-        df = pd.DataFrame([{"feature_0": 0.1, "feature_1": 0.2}])
-        pub.uuid_dataframes = {uuid: df}
+        pub.uuid_buffers = {uuid: _buffer_with_rows()}
 
         pub._write_table_to_tiled_sync(uuid)
 
@@ -215,8 +224,10 @@ class TestWriteTableToTiledSync:
         uuid_container.write_dataframe.assert_called_once()
         # uuid should be in existing_uuids
         assert uuid in pub.existing_uuids
-        # DataFrame should be cleared
-        assert pub.uuid_dataframes[uuid].empty
+        written = uuid_container.write_dataframe.call_args[0][0]
+        assert list(written["feature_0"]) == [np.float32(0.1)]
+        # Buffered rows should be cleared
+        assert pub.uuid_buffers[uuid].empty
 
     def test_write_table_exception_handled(self):
         """Test that exceptions in _write_table_to_tiled_sync are handled."""
@@ -301,7 +312,7 @@ def test_stop_sync_uuid_already_written():
     pub, day_container = _make_publisher_with_containers()
     uuid = "dddddddd-dddd-dddd-dddd-dddddddddddd"
     pub.current_uuid = uuid
-    pub.uuid_dataframes = {uuid: pd.DataFrame([{"x": 1}])}
+    pub.uuid_buffers = {uuid: _buffer_with_rows()}
     pub.current_experiment_name = "exp_1"
 
     uuid_container = MagicMock()
@@ -321,7 +332,7 @@ def test_stop_sync_exception():
     """Test that _stop_sync handles exceptions."""
     pub, day_container = _make_publisher_with_containers()
     pub.current_uuid = "some-uuid"
-    pub.uuid_dataframes = {"some-uuid": pd.DataFrame([{"x": 1}])}
+    pub.uuid_buffers = {"some-uuid": _buffer_with_rows()}
     pub.current_experiment_name = "exp_1"
 
     day_container.__contains__ = MagicMock(side_effect=Exception("container error"))
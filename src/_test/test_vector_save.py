@@ -1,9 +1,16 @@
 """Tests for arroyosas.lse_reduction.vector_save"""
 
+import asyncio
+import json
+import sqlite3
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
 import pytest
 
+from arroyosas.app.unified_sim_cli import get_urls_from_db
 from arroyosas.lse_reduction.schemas import LatentSpaceEvent
-from arroyosas.lse_reduction.vector_save import VectorSavePublisher
+from arroyosas.lse_reduction.vector_save import VectorSavePublisher, decode_vector, encode_vector
 from arroyosas.schemas import SASStart, SASStop
 
 
@@ -39,6 +46,7 @@ class TestVectorSavePublisher:
             autoencoder_model="ae_v1",
             dimred_model="umap_v1",
         )
+        await publisher.flush()
         async with publisher.db.execute("SELECT * FROM vectors") as cursor:
             rows = await cursor.fetchall()
         assert len(rows) == 1
@@ -56,6 +64,7 @@ class TestVectorSavePublisher:
             autoencoder_time=0.3,
             dimred_time=0.2,
         )
+        await publisher.flush()
         async with publisher.db.execute("SELECT * FROM vectors") as cursor:
             row = await cursor.fetchone()
         assert row[5] == "my_exp"  # experiment_name
@@ -75,6 +84,7 @@ class TestVectorSavePublisher:
             dimred_time=0.05,
         )
         await publisher.publish(event)
+        await publisher.flush()
         async with publisher.db.execute("SELECT COUNT(*) FROM vectors") as cursor:
             count = await cursor.fetchone()
         assert count[0] == 1
@@ -108,6 +118,7 @@ class TestVectorSavePublisher:
                 autoencoder_model="ae",
                 dimred_model="umap",
             )
+        await publisher.flush()
         async with publisher.db.execute("SELECT COUNT(*) FROM vectors") as cursor:
             count = await cursor.fetchone()
         assert count[0] == 5
@@ -120,3 +131,183 @@ class TestVectorSavePublisher:
         await pub.save_vector("url", [1.0], "ae", "umap")
         assert pub._db_initialized
         await pub.db.close()
+
+
+def _event(index, vector=(0.1, 0.2)):
+    return LatentSpaceEvent(
+        tiled_url=f"http://example.com/run/{index}",
+        feature_vector=list(vector),
+        index=index,
+        experiment_name="exp",
+        timestamp=float(index),
+    )
+
+
+async def _count(pub):
+    async with pub.db.execute("SELECT COUNT(*) FROM vectors") as cursor:
+        return (await cursor.fetchone())[0]
+
+
+def _sqlite_count(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class TestBatchedStorage:
+    async def test_wal_mode(self, publisher):
+        async with publisher.db.execute("PRAGMA journal_mode") as cursor:
+            assert (await cursor.fetchone())[0] == "wal"
+
+    async def test_indexes(self, publisher):
+        async with publisher.db.execute("PRAGMA index_list(vectors)") as cursor:
+            names = {row[1] for row in await cursor.fetchall()}
+        assert {"idx_vectors_tiled_url", "idx_vectors_experiment_name", "idx_vectors_timestamp"} <= names
+
+    async def test_vectors_stored_as_float32_blobs(self, publisher):
+        await publisher.publish(_event(0, (1.5, -2.0, 3.25)))
+        await publisher.flush()
+        async with publisher.db.execute("SELECT feature_vector, dim FROM vectors") as cursor:
+            blob, dim = await cursor.fetchone()
+        assert isinstance(blob, bytes)
+        assert dim == 3
+        assert decode_vector(blob, dim).tolist() == [1.5, -2.0, 3.25]
+
+    async def test_rows_inserted_every_flush_rows(self, tmp_path):
+        pub = VectorSavePublisher(db_path=str(tmp_path / "batched.db"), flush_rows=3, flush_interval_ms=60000)
+        await pub.start()
+        for index in range(5):
+            await pub.publish(_event(index))
+        assert await _count(pub) == 3
+        assert len(pub.pending_rows) == 2
+        await pub.stop()
+        assert _sqlite_count(pub.db_path) == 5
+
+    async def test_rows_inserted_after_interval(self, tmp_path):
+        pub = VectorSavePublisher(db_path=str(tmp_path / "timed.db"), flush_rows=100, flush_interval_ms=10)
+        await pub.start()
+        await pub.publish(_event(0))
+        assert await _count(pub) == 0
+        await asyncio.sleep(0.05)
+        assert await _count(pub) == 1
+        await pub.db.close()
+
+    async def test_sas_stop_flushes(self, publisher):
+        for index in range(2):
+            await publisher.publish(_event(index))
+        await publisher.publish(SASStop(num_frames=2))
+        assert _sqlite_count(publisher.db_path) == 2
+        assert publisher.pending_rows == []
+
+    async def test_stop_closes_db_and_next_run_reopens_it(self, publisher):
+        await publisher.publish(_event(0))
+        await publisher.publish(SASStop(num_frames=1))
+        assert publisher.db is None
+        await publisher.publish(_event(1))
+        await publisher.flush()
+        assert await _count(publisher) == 2
+
+    async def test_concurrent_flushes_do_not_lose_rows(self, publisher):
+        connection = publisher.db
+        failing = MagicMock(wraps=connection)
+        calls = []
+
+        async def fail_first(sql, rows):
+            calls.append(len(rows))
+            if len(calls) == 1:
+                await asyncio.sleep(0.01)
+                raise sqlite3.OperationalError("disk I/O error")
+            await connection.executemany(sql, rows)
+
+        failing.executemany = fail_first
+        failing.commit = AsyncMock(side_effect=connection.commit)
+        failing.rollback = AsyncMock(side_effect=connection.rollback)
+        publisher.db = failing
+
+        await publisher.publish(_event(0))
+
+        async def second_flush():
+            await publisher.publish(_event(1))
+            await publisher.flush()
+
+        results = await asyncio.gather(publisher.flush(), second_flush(), return_exceptions=True)
+        assert isinstance(results[0], sqlite3.OperationalError)
+        # The second flush waits for the first and inserts the rows it kept back too
+        assert calls == [1, 2]
+        assert await _count(publisher) == 2
+        assert publisher.pending_rows == []
+
+    async def test_rows_keep_publish_order(self, publisher):
+        for index in range(4):
+            await publisher.publish(_event(index))
+        await publisher.flush()
+        async with publisher.db.execute("SELECT tiled_url FROM vectors ORDER BY id") as cursor:
+            urls = [row[0] for row in await cursor.fetchall()]
+        assert urls == [f"http://example.com/run/{index}" for index in range(4)]
+
+    async def test_failed_flush_keeps_rows_for_next_flush(self, publisher):
+        connection = publisher.db
+        failing = MagicMock(wraps=connection)
+        failing.executemany = AsyncMock(side_effect=sqlite3.OperationalError("disk I/O error"))
+        failing.rollback = AsyncMock(side_effect=connection.rollback)
+        publisher.db = failing
+        for index in range(2):
+            await publisher.publish(_event(index))
+        with pytest.raises(sqlite3.OperationalError):
+            await publisher.flush()
+        failing.rollback.assert_awaited_once()
+        assert len(publisher.pending_rows) == 2
+
+        # Rows buffered after the failure are inserted after the ones kept back
+        publisher.db = connection
+        await publisher.publish(_event(2))
+        await publisher.flush()
+        async with publisher.db.execute("SELECT tiled_url FROM vectors ORDER BY id") as cursor:
+            urls = [row[0] for row in await cursor.fetchall()]
+        assert urls == [f"http://example.com/run/{index}" for index in range(3)]
+        assert publisher.pending_rows == []
+
+    async def test_db_replay_reads_saved_urls(self, publisher):
+        for index in range(3):
+            await publisher.publish(_event(index))
+        await publisher.flush()
+        rows = await get_urls_from_db(publisher.db_path, limit=2)
+        assert [url for _, url in rows] == ["http://example.com/run/0", "http://example.com/run/1"]
+
+
+class TestLegacyDatabase:
+    async def test_json_vector_database_upgraded(self, tmp_path):
+        db_path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "CREATE TABLE vectors (id INTEGER PRIMARY KEY AUTOINCREMENT, tiled_url TEXT NOT NULL, "
+            "feature_vector TEXT NOT NULL, autoencoder_model TEXT, dimred_model TEXT, experiment_name TEXT, "
+            "timestamp REAL, total_processing_time REAL, autoencoder_time REAL, dimred_time REAL)"
+        )
+        conn.execute("INSERT INTO vectors (tiled_url, feature_vector) VALUES (?, ?)", ("old", json.dumps([1.0, 2.0])))
+        conn.commit()
+        conn.close()
+
+        pub = VectorSavePublisher(db_path=db_path)
+        await pub.start()
+        await pub.publish(_event(0, (3.0, 4.0)))
+        await pub.flush()
+        async with pub.db.execute("SELECT feature_vector, dim FROM vectors ORDER BY id") as cursor:
+            rows = await cursor.fetchall()
+        await pub.db.close()
+        assert [decode_vector(value, dim).tolist() for value, dim in rows] == [[1.0, 2.0], [3.0, 4.0]]
+        assert rows[0][1] is None
+
+
+class TestVectorEncoding:
+    def test_round_trip(self):
+        blob, dim = encode_vector([0.25, 0.5])
+        assert len(blob) == 8
+        assert np.array_equal(decode_vector(blob, dim), np.array([0.25, 0.5], dtype=np.float32))
+
+    def test_dim_mismatch(self):
+        blob, _ = encode_vector([0.25, 0.5])
+        with pytest.raises(ValueError):
+            decode_vector(blob, 3)
@@ -1,14 +1,25 @@
 """Tests for arroyosas.websockets (OneDWSPublisher, convert_to_uint8, pack_images)"""
 
+import asyncio
+import io
 import json
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import msgpack
 import numpy as np
 import pytest
+from dynaconf import Dynaconf
 
 from arroyosas.schemas import SASStart, SASStop, SerializableNumpyArrayModel
-from arroyosas.websockets import OneDWSPublisher, convert_to_uint8, pack_images
+from arroyosas.websockets import (
+    OneDWSPublisher,
+    convert_to_uint8,
+    downsample,
+    encode_curve,
+    pack_images,
+    pack_snapshot,
+    parse_preview_level,
+)
 
 
 @pytest.fixture(autouse=True)
@@ -112,12 +123,30 @@ class TestOneDWSPublisher:
         assert pub.port == 9999
 
     def test_from_settings(self):
-        settings = MagicMock()
-        settings.host = "myhost"
-        settings.port = 7777
-        pub = OneDWSPublisher.from_settings(settings)
+        settings = Dynaconf()
+        settings.set("ws_publisher", {"host": "myhost", "port": 7777})
+        pub = OneDWSPublisher.from_settings(settings.ws_publisher)
         assert pub.host == "myhost"
         assert pub.port == 7777
+        assert (pub.image_format, pub.curve_dtype, pub.encode_workers) == ("raw", "float32", 2)
+        assert pub.recent_curves.maxlen == 100
+
+    def test_from_settings_reads_preview_options(self):
+        settings = Dynaconf()
+        settings.set(
+            "ws_publisher",
+            {
+                "host": "h",
+                "port": 1,
+                "image_format": "webp",
+                "encode_workers": 4,
+                "history_size": 10,
+                "curve_dtype": "float16",
+            },
+        )
+        pub = OneDWSPublisher.from_settings(settings.ws_publisher)
+        assert (pub.image_format, pub.curve_dtype, pub.encode_workers) == ("webp", "float16", 4)
+        assert pub.recent_curves.maxlen == 10
 
     async def test_publish_no_clients(self, publisher):
         from arroyosas.schemas import SAS1DReduction
@@ -209,3 +238,279 @@ class TestOneDWSPublisher:
                 publisher.host,
                 publisher.port,
             )
+        # The preview encoders are shut down with the server
+        with pytest.raises(RuntimeError):
+            publisher.encode_executor.submit(print)
+
+
+# ---------------------------------------------------------------------------
+# Late-joiner snapshot
+# ---------------------------------------------------------------------------
+
+
+def _reduction(value: float):
+    from arroyosas.schemas import SAS1DReduction
+
+    return SAS1DReduction(
+        curve=SerializableNumpyArrayModel(array=np.full(8, value, dtype=np.float32)),
+        curve_tiled_url=f"http://c.com/{value}",
+        raw_frame=SerializableNumpyArrayModel(array=np.random.rand(4, 4).astype(np.float32)),
+        raw_frame_tiled_url="http://r.com",
+    )
+
+
+def _start():
+    return SASStart(
+        run_name="run1",
+        run_id="id1",
+        width=4,
+        height=4,
+        data_type="float32",
+        tiled_url="http://example.com",
+    )
+
+
+class TestSnapshot:
+    async def test_history_bounded_and_reset_on_start(self):
+        publisher = OneDWSPublisher(history_size=2)
+        await publisher.publish(_start())
+        for value in range(4):
+            await publisher.publish(_reduction(value))
+        assert [c.curve.array[0] for c in publisher.recent_curves] == [2, 3]
+        assert publisher.latest_frame.curve.array[0] == 3
+
+        await publisher.publish(_start())
+        assert len(publisher.recent_curves) == 0
+        assert publisher.latest_frame is None
+
+    async def test_stop_keeps_curves(self, publisher):
+        await publisher.publish(_start())
+        await publisher.publish(_reduction(1))
+        await publisher.publish(SASStop(num_frames=1))
+        assert publisher.current_start_message is None
+        assert len(publisher.recent_curves) == 1
+
+    def test_pack_snapshot(self):
+        unpacked = msgpack.unpackb(pack_snapshot(_start(), [_reduction(1), _reduction(2)], _reduction(2)), raw=False)
+        assert unpacked["msg_type"] == "snapshot"
+        assert unpacked["start"]["run_id"] == "id1"
+        curves = [np.frombuffer(c, dtype="<f4") for c in unpacked["curves"]]
+        assert [c[0] for c in curves] == [1, 2]
+        assert unpacked["curve_tiled_urls"] == ["http://c.com/1", "http://c.com/2"]
+        assert unpacked["preview"]["width"] == 4
+
+    async def test_new_client_receives_snapshot(self, publisher):
+        await publisher.publish(_start())
+        await publisher.publish(_reduction(1))
+        mock_ws = AsyncMock()
+        mock_ws.remote_address = ("127.0.0.1", 1234)
+        mock_ws.request = MagicMock()
+        mock_ws.request.path = "/viz"
+        mock_ws.wait_closed = AsyncMock(return_value=None)
+
+        await publisher.websocket_handler(mock_ws)
+
+        unpacked = msgpack.unpackb(mock_ws.send.call_args[0][0], raw=False)
+        assert unpacked["msg_type"] == "snapshot"
+        assert len(unpacked["curves"]) == 1
+
+    async def test_snapshot_preview_encoded_off_the_event_loop(self):
+        import threading
+
+        from arroyosas.websockets import image_bundle
+
+        publisher = OneDWSPublisher(image_format="png")
+        await publisher.publish(_start())
+        await publisher.publish(_reduction(1))
+        threads = []
+
+        def recording_bundle(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return image_bundle(*args, **kwargs)
+
+        mock_ws = AsyncMock()
+        mock_ws.remote_address = ("127.0.0.1", 1234)
+        mock_ws.request = MagicMock()
+        mock_ws.request.path = "/viz?level=1"
+        mock_ws.wait_closed = AsyncMock(return_value=None)
+        with patch("arroyosas.websockets.image_bundle", side_effect=recording_bundle):
+            await publisher.websocket_handler(mock_ws)
+
+        assert len(threads) == 1 and threads[0].startswith("preview_encode")
+        unpacked = msgpack.unpackb(mock_ws.send.call_args[0][0], raw=False)
+        assert unpacked["preview"]["image_format"] == "png"
+        assert unpacked["preview"]["level"] == 1
+
+    async def test_no_snapshot_without_run(self, publisher):
+        mock_ws = AsyncMock()
+        mock_ws.remote_address = ("127.0.0.1", 1234)
+        mock_ws.request = MagicMock()
+        mock_ws.request.path = "/viz"
+        mock_ws.wait_closed = AsyncMock(return_value=None)
+
+        await publisher.websocket_handler(mock_ws)
+        mock_ws.send.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# Typed array curves
+# ---------------------------------------------------------------------------
+
+
+def _reduction_with_q(q):
+    from arroyosas.schemas import SAS1DReduction
+
+    return SAS1DReduction(
+        curve=SerializableNumpyArrayModel(array=np.linspace(10, 1000, len(q))),
+        curve_tiled_url="http://c.com",
+        raw_frame=SerializableNumpyArrayModel(array=np.random.rand(4, 4).astype(np.float32)),
+        raw_frame_tiled_url="http://r.com",
+        q=SerializableNumpyArrayModel(array=q),
+    )
+
+
+class TestCurveEncoding:
+    def test_float32_is_lossless_for_float32_input(self):
+        curve = np.random.rand(50).astype(np.float32) * 1e6
+        data, dtype = encode_curve(curve, "float32")
+        assert dtype == "float32"
+        np.testing.assert_array_equal(np.frombuffer(data, dtype="<f4"), curve)
+
+    def test_float16_halves_payload(self):
+        curve = np.linspace(0, 100, 64)
+        data, dtype = encode_curve(curve, "float16")
+        assert dtype == "float16"
+        assert len(data) == 128
+        np.testing.assert_allclose(np.frombuffer(data, dtype="<f2"), curve, rtol=1e-3)
+
+    def test_float16_falls_back_on_overflow(self):
+        curve = np.array([1.0, 1e6, np.nan])
+        data, dtype = encode_curve(curve, "float16")
+        assert dtype == "float32"
+        assert np.frombuffer(data, dtype="<f4")[1] == 1e6
+
+    def test_pack_images_keeps_dynamic_range(self):
+        msg = _reduction_with_q(np.linspace(0.01, 0.2, 16))
+        unpacked = msgpack.unpackb(pack_images(msg), raw=False)
+        assert unpacked["curve_dtype"] == "float32"
+        np.testing.assert_allclose(np.frombuffer(unpacked["curve"], dtype="<f4"), msg.curve.array, rtol=1e-6)
+        assert "q" not in unpacked
+
+    def test_pack_images_includes_q_when_asked(self):
+        msg = _reduction_with_q(np.linspace(0.01, 0.2, 16))
+        unpacked = msgpack.unpackb(pack_images(msg, include_q=True), raw=False)
+        np.testing.assert_allclose(np.frombuffer(unpacked["q"], dtype="<f4"), msg.q.array, rtol=1e-6)
+
+    def test_invalid_curve_dtype(self):
+        with pytest.raises(ValueError):
+            OneDWSPublisher(curve_dtype="uint8")
+
+    def test_q_sent_only_on_geometry_change(self, publisher):
+        q = np.linspace(0.01, 0.2, 16)
+        assert publisher.geometry_changed(_reduction_with_q(q))
+        assert not publisher.geometry_changed(_reduction_with_q(q.copy()))
+        assert publisher.geometry_changed(_reduction_with_q(q * 2))
+        # Every run starts without a known geometry
+        publisher.geometry_changed(_start())
+        assert publisher.geometry_changed(_reduction_with_q(q * 2))
+
+
+# ---------------------------------------------------------------------------
+# Compressed previews
+# ---------------------------------------------------------------------------
+
+
+class TestPreviewEncoding:
+    def test_invalid_image_format(self):
+        with pytest.raises(ValueError):
+            OneDWSPublisher(image_format="jpeg")
+
+    def test_downsample_block_mean(self):
+        image = np.arange(36, dtype=np.float32).reshape(6, 6)
+        small = downsample(image, 1)
+        assert small.shape == (3, 3)
+        assert small[0, 0] == pytest.approx(np.mean([0, 1, 6, 7]))
+        # Remainders are cropped
+        assert downsample(np.ones((9, 5)), 2).shape == (2, 1)
+        assert downsample(image, 0) is image
+
+    def test_parse_preview_level(self):
+        assert parse_preview_level("") == 0
+        assert parse_preview_level("level=2") == 2
+        assert parse_preview_level("level=99") == 4
+        assert parse_preview_level("level=abc") == 0
+
+    @pytest.mark.parametrize("image_format", ["png", "webp"])
+    def test_compressed_preview_is_lossless(self, image_format):
+        from PIL import Image
+
+        msg = _reduction_with_q(np.linspace(0.01, 0.2, 16))
+        raw = msgpack.unpackb(pack_images(msg), raw=False)
+        packed = msgpack.unpackb(pack_images(msg, image_format=image_format), raw=False)
+        assert packed["image_format"] == image_format
+        # webp has no greyscale mode and decodes as RGB
+        decoded = np.asarray(Image.open(io.BytesIO(packed["raw_frame"])).convert("L"))
+        assert decoded.shape == (packed["width"], packed["height"])
+        assert decoded.tobytes() == raw["raw_frame"]
+
+    def test_pack_images_level_reduces_shape(self):
+        msg = _reduction_with_q(np.linspace(0.01, 0.2, 16))
+        unpacked = msgpack.unpackb(pack_images(msg, level=1), raw=False)
+        assert (unpacked["width"], unpacked["height"]) == (2, 2)
+        assert len(unpacked["raw_frame"]) == 4
+
+    async def test_handler_accepts_level_query(self, publisher):
+        mock_ws = AsyncMock()
+        mock_ws.remote_address = ("127.0.0.1", 1234)
+        mock_ws.request = MagicMock()
+        mock_ws.request.path = "/viz?level=1"
+        levels = []
+        mock_ws.wait_closed = AsyncMock(side_effect=lambda: levels.append(publisher.client_levels[mock_ws]))
+
+        await publisher.websocket_handler(mock_ws)
+        assert levels == [1]
+        assert mock_ws not in publisher.client_levels
+
+    async def test_frame_encoded_once_per_level(self):
+        publisher = OneDWSPublisher(image_format="png")
+        clients = [AsyncMock(), AsyncMock(), AsyncMock()]
+        OneDWSPublisher.connected_clients = set(clients)
+        publisher.client_levels = {clients[0]: 0, clients[1]: 1, clients[2]: 1}
+        msg = _reduction_with_q(np.linspace(0.01, 0.2, 16))
+        with patch("arroyosas.websockets.pack_images", wraps=pack_images) as packer:
+            await publisher.publish_frame(msg, include_q=True)
+        assert packer.call_count == 2
+        assert clients[1].send.call_args[0][0] == clients[2].send.call_args[0][0]
+        assert clients[0].send.call_args[0][0] != clients[1].send.call_args[0][0]
+
+    async def test_preview_skipped_when_encoders_busy(self):
+        publisher = OneDWSPublisher(image_format="png", encode_workers=1)
+        client = AsyncMock()
+        OneDWSPublisher.connected_clients = {client}
+        msg = _reduction_with_q(np.linspace(0.01, 0.2, 16))
+        publisher.frames_in_flight = 1
+        await publisher.publish_frame(msg, include_q=True)
+        sent = msgpack.unpackb(client.send.call_args[0][0], raw=False)
+        assert "raw_frame" not in sent
+        assert len(sent["curve"]) == 16 * 4
+        assert "q" in sent
+
+    @pytest.mark.parametrize("image_format", ["raw", "png"])
+    async def test_burst_delivers_every_curve(self, image_format):
+        publisher = OneDWSPublisher(image_format=image_format, encode_workers=1)
+        client = AsyncMock()
+        OneDWSPublisher.connected_clients = {client}
+        for index in range(10):
+            msg = _reduction_with_q(np.linspace(0.01, 0.2, 16))
+            msg.curve_tiled_url = f"http://c.com/{index}"
+            await publisher.publish(msg)
+
+        async def delivered():
+            while publisher.frames_in_flight or client.send.call_count < 10:
+                await asyncio.sleep(0.01)
+
+        await asyncio.wait_for(delivered(), timeout=5)
+        sent = [msgpack.unpackb(c[0][0], raw=False) for c in client.send.call_args_list]
+        assert sorted(bundle["curve_tiled_url"] for bundle in sent) == sorted(f"http://c.com/{i}" for i in range(10))
+        if image_format == "raw":
+            assert all("raw_frame" in bundle for bundle in sent)
@@ -0,0 +1,101 @@
+"""Tests for arroyosas.lse_reduction.worker_pool (WorkerPoolReducer)"""
+
+import os
+import time
+
+import numpy as np
+import pytest
+
+from arroyosas.lse_reduction.reducer import Reducer
+from arroyosas.lse_reduction.worker_pool import WorkerPoolReducer
+from arroyosas.schemas import RawFrameEvent, SerializableNumpyArrayModel
+
+
+class FakeReducer(Reducer):
+    """Stands in for LatentSpaceReducer inside the worker processes."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.autoencoder_model_name = "ae:1"
+        self.dimred_model_name = "umap:1"
+        self.experiment_name = f"exp-{os.getpid()}"
+        self.seen = []
+        self.on_model_swap = None
+
+    def reduce(self, message):
+        if message.frame_number < 0:
+            os._exit(1)
+        time.sleep(self.delay)
+        self.seen.append((message.tiled_url, message.frame_number))
+        return np.array([[float(message.frame_number), float(os.getpid())]]), {"autoencoder_time": 0.1}
+
+    def start_run(self):
+        self.seen = []
+        if self.on_model_swap is not None:
+            self.on_model_swap("dimred", "umap:2")
+
+    def reproject(self):
+        if not self.seen:
+            return [], None, {}
+        coords = np.array([[float(index), 0.0] for _, index in self.seen])
+        timing = {"dimred_time": 0.01, "batch_size": len(self.seen), "autoencoder_model": "ae:1", "dimred_model": "umap:1"}
+        return list(self.seen), coords, timing
+
+
+def _frame(number: int):
+    image = SerializableNumpyArrayModel(array=np.zeros((4, 4), dtype=np.float32))
+    return RawFrameEvent(image=image, frame_number=number, tiled_url=f"http://example.com/{number}")
+
+
+@pytest.fixture
+def pool():
+    # fork keeps FakeReducer importable in the workers without installing the test module
+    pool = WorkerPoolReducer(2, reducer_factory=FakeReducer, factory_args=(0.1,), mp_context="fork", start_timeout=30)
+    yield pool
+    pool.close()
+
+
+class TestWorkerPoolReducer:
+    def test_reduce_returns_worker_result(self, pool):
+        f_vec, timing_info = pool.reduce(_frame(3))
+        assert f_vec[0, 0] == 3.0
+        assert timing_info["autoencoder_time"] == 0.1
+        assert pool.experiment_name.startswith("exp-")
+
+    def test_concurrent_frames_use_all_workers(self, pool):
+        from concurrent.futures import ThreadPoolExecutor
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda n: pool.reduce(_frame(n))[0], range(4)))
+        elapsed = time.perf_counter() - start
+        assert [r[0, 0] for r in results] == [0.0, 1.0, 2.0, 3.0]
+        assert len({r[0, 1] for r in results}) == 2
+        # Four 0.1 s frames on two workers
+        assert elapsed < 0.35
+
+    def test_reproject_collects_every_worker(self, pool):
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda n: pool.reduce(_frame(n)), range(4)))
+        keys, coords, timing_info = pool.reproject()
+        assert sorted(index for _, index in keys) == [0, 1, 2, 3]
+        assert coords.shape == (4, 2)
+        assert timing_info["batch_size"] == 4
+
+    def test_model_swap_reported_once_all_workers_swapped(self, pool):
+        swaps = []
+        pool.on_model_swap = lambda model_type, model_id: swaps.append((model_type, model_id))
+        pool.start_run()
+        deadline = time.time() + 5
+        while not swaps and time.time() < deadline:
+            time.sleep(0.01)
+        assert swaps == [("dimred", "umap:2")]
+
+    def test_dead_worker_fails_its_task(self, pool):
+        with pytest.raises(RuntimeError, match="exited"):
+            pool.reduce(_frame(-1))
+        # The remaining worker keeps serving
+        f_vec, _ = pool.reduce(_frame(1))
+        assert f_vec[0, 0] == 1.0
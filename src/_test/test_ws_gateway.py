@@ -0,0 +1,292 @@
+"""Tests for arroyosas.ws_gateway (WSGatewayPublisher)"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import msgpack
+import numpy as np
+import pytest
+
+from arroyosas.lse_reduction.schemas import LatentSpaceEvent
+from arroyosas.schemas import SAS1DReduction, SASStart, SASStop, SerializableNumpyArrayModel
+from arroyosas.ws_gateway import GatewayClient, WSGatewayPublisher
+
+
+@pytest.fixture
+def gateway():
+    return WSGatewayPublisher(latent_batch_max_events=2, max_queue=2)
+
+
+def _start():
+    return SASStart(
+        run_name="run1",
+        run_id="id1",
+        width=4,
+        height=4,
+        data_type="float32",
+        tiled_url="http://example.com",
+    )
+
+
+def _reduction():
+    return SAS1DReduction(
+        curve=SerializableNumpyArrayModel(array=np.linspace(0, 1, 8)),
+        curve_tiled_url="http://c.com",
+        raw_frame=SerializableNumpyArrayModel(array=np.random.rand(4, 4).astype(np.float32)),
+        raw_frame_tiled_url="http://r.com",
+    )
+
+
+def _latent(index):
+    return LatentSpaceEvent(
+        tiled_url=f"http://example.com?slice={index}",
+        feature_vector=[float(index), 1.0],
+        index=index,
+        autoencoder_model="ae",
+        dimred_model="umap",
+    )
+
+
+def _client(gateway, topics):
+    client = GatewayClient(AsyncMock(), set())
+    gateway.subscribe(client, topics)
+    gateway.clients.add(client)
+    return client
+
+
+def _drain(client):
+    items = []
+    while not client.queue.empty():
+        items.append(client.queue.get_nowait()[1])
+    return items
+
+
+class TestTopics:
+    def test_parse_topics_defaults_to_all(self, gateway):
+        assert gateway.parse_topics("/") == {"run", "viz", "curves", "latent"}
+
+    def test_parse_topics_filters_unknown(self, gateway):
+        assert gateway.parse_topics("/?topics=viz,bogus,latent") == {"viz", "latent"}
+
+    def test_compressed_topics_override(self):
+        gateway = WSGatewayPublisher(compressed_topics=["viz"])
+        assert gateway.topics["viz"].compress
+        assert not gateway.topics["latent"].compress
+
+    def test_process_request_disables_deflate_for_uncompressed_topics(self, gateway):
+        connection = MagicMock()
+        connection.protocol.available_extensions = ["deflate"]
+        request = MagicMock()
+        request.path = "/?topics=latent,viz"
+        gateway.process_request(connection, request)
+        assert connection.protocol.available_extensions == []
+
+    def test_process_request_keeps_deflate_for_compressed_topics(self, gateway):
+        connection = MagicMock()
+        connection.protocol.available_extensions = ["deflate"]
+        request = MagicMock()
+        request.path = "/?topics=latent,run"
+        gateway.process_request(connection, request)
+        assert connection.protocol.available_extensions == ["deflate"]
+
+
+class TestRouting:
+    async def test_messages_only_reach_subscribers(self, gateway):
+        run_client = _client(gateway, {"run"})
+        viz_client = _client(gateway, {"viz", "curves"})
+
+        await gateway.publish(_start())
+        await gateway.publish(_reduction())
+
+        run_items = _drain(run_client)
+        assert len(run_items) == 1
+        assert json.loads(run_items[0])["msg_type"] == "start"
+        viz_items = [msgpack.unpackb(item, raw=False) for item in _drain(viz_client)]
+        assert [item["msg_type"] for item in viz_items] == ["viz", "curve"]
+        np.testing.assert_allclose(np.frombuffer(viz_items[1]["curve"], dtype="<f4"), np.linspace(0, 1, 8), rtol=1e-6)
+
+    async def test_payload_encoded_once_for_all_clients(self, gateway):
+        first = _client(gateway, {"curves"})
+        second = _client(gateway, {"curves"})
+        await gateway.publish(_reduction())
+        assert _drain(first)[0] is _drain(second)[0]
+
+    async def test_latent_is_batched(self, gateway):
+        client = _client(gateway, {"latent"})
+        await gateway.publish(_latent(0))
+        assert client.queue.empty()
+        await gateway.publish(_latent(1))
+        batch = msgpack.unpackb(_drain(client)[0], raw=False)
+        assert batch["msg_type"] == "latent_batch"
+        assert batch["count"] == 2
+
+    async def test_latent_batch_marks_reprojected_points(self, gateway):
+        client = _client(gateway, {"latent"})
+        await gateway.publish(_latent(0))
+        await gateway.publish(_latent(0).model_copy(update={"reprojected": True}))
+        batch = msgpack.unpackb(_drain(client)[0], raw=False)
+        assert np.frombuffer(batch["reprojected"], dtype="u1").tolist() == [0, 1]
+
+    async def test_stop_flushes_latent(self, gateway):
+        client = _client(gateway, {"latent", "run"})
+        await gateway.publish(_latent(0))
+        await gateway.publish(SASStop(num_frames=1))
+        items = _drain(client)
+        assert msgpack.unpackb(items[0], raw=False)["count"] == 1
+        assert json.loads(items[1])["msg_type"] == "stop"
+
+    async def test_lossy_topic_dropped_for_slow_client(self, gateway):
+        client = _client(gateway, {"curves", "run"})
+        for _ in range(3):
+            await gateway.publish(_reduction())
+        assert client.queue.qsize() == 2
+        assert client.dropped == 1
+        # Run status is never dropped
+        await gateway.publish(SASStop(num_frames=3))
+        assert client.queue.qsize() == 3
+
+    async def test_lossless_overflow_disconnects_client(self):
+        gateway = WSGatewayPublisher(max_queue=2, max_backlog=3)
+        client = GatewayClient(AsyncMock(), set(), max_backlog=3)
+        gateway.subscribe(client, {"run", "curves"})
+        gateway.clients.add(client)
+        for _ in range(3):
+            await gateway.publish(_reduction())
+        # The lossy curves stop at max_queue, run messages fill the rest of the backlog
+        await gateway.publish(SASStop(num_frames=3))
+        assert client in gateway.clients
+        await gateway.publish(SASStop(num_frames=3))
+        assert client.overflowed
+        assert client not in gateway.clients
+        await asyncio.sleep(0)
+        client.websocket.close.assert_awaited_once_with(code=1013, reason="send queue overflow")
+        # Nothing more is queued to it
+        await gateway.publish(SASStop(num_frames=3))
+        assert client.queue.qsize() == 3
+
+    async def test_replay_overflow_disconnects_client(self):
+        gateway = WSGatewayPublisher(latent_batch_max_events=1, max_backlog=2)
+        for index in range(3):
+            await gateway.publish(_latent(index))
+        client = GatewayClient(AsyncMock(), set(), max_backlog=2)
+        gateway.subscribe(client, {"latent"})
+        assert client.overflowed
+        assert "latent" not in client.topics
+        await asyncio.sleep(0)
+        client.websocket.close.assert_awaited_once()
+
+
+class TestReplay:
+    async def test_late_subscriber_gets_history(self, gateway):
+        await gateway.publish(_start())
+        await gateway.publish(_reduction())
+        await gateway.publish(_latent(0))
+        await gateway.publish(_latent(1))
+
+        client = _client(gateway, {"run", "curves", "latent"})
+        items = _drain(client)
+        assert json.loads(items[0])["msg_type"] == "start"
+        assert msgpack.unpackb(items[1], raw=False)["msg_type"] == "curve"
+        assert msgpack.unpackb(items[2], raw=False)["msg_type"] == "latent_dictionary"
+        assert msgpack.unpackb(items[3], raw=False)["count"] == 2
+
+    async def test_start_resets_history(self, gateway):
+        await gateway.publish(_reduction())
+        await gateway.publish(_start())
+        assert len(gateway.history["curves"]) == 0
+        assert len(gateway.history["run"]) == 1
+
+    def test_subscribe_and_unsubscribe_messages(self, gateway):
+        client = _client(gateway, {"run"})
+        gateway.handle_client_message(client, json.dumps({"subscribe": ["latent", "bogus"]}))
+        assert client.topics == {"run", "latent"}
+        gateway.handle_client_message(client, json.dumps({"unsubscribe": ["run"]}))
+        assert client.topics == {"latent"}
+        gateway.handle_client_message(client, "not json")
+        assert client.topics == {"latent"}
+
+    async def test_unsubscribe_drops_queued_messages(self, gateway):
+        client = _client(gateway, {"run", "curves"})
+        await gateway.publish(_start())
+        await gateway.publish(_reduction())
+        gateway.handle_client_message(client, json.dumps({"unsubscribe": ["curves"]}))
+        items = _drain(client)
+        assert len(items) == 1
+        assert json.loads(items[0])["run_name"] == "run1"
+
+    def test_from_settings_reads_every_option(self):
+        from dynaconf import Dynaconf
+
+        settings = Dynaconf()
+        settings.set(
+            "ws_gateway",
+            {
+                "host": "h",
+                "port": 1,
+                "compressed_topics": ["latent"],
+                "max_queue": 10,
+                "max_backlog": 20,
+                "latent_batch_max_events": 30,
+                "latent_batch_interval_ms": 40,
+                "curve_dtype": "float16",
+                "image_format": "png",
+            },
+        )
+        gateway = WSGatewayPublisher.from_settings(settings.ws_gateway)
+        assert (gateway.host, gateway.port, gateway.max_queue, gateway.max_backlog) == ("h", 1, 10, 20)
+        assert (gateway.latent_batch_max_events, gateway.latent_batch_interval_ms) == (30, 40)
+        assert (gateway.curve_dtype, gateway.image_format) == ("float16", "png")
+        assert [name for name, config in gateway.topics.items() if config.compress] == ["latent"]
+
+    def test_from_settings_defaults(self):
+        from dynaconf import Dynaconf
+
+        settings = Dynaconf()
+        settings.set("ws_gateway", {"host": "h", "port": 1})
+        gateway = WSGatewayPublisher.from_settings(settings.ws_gateway)
+        assert (gateway.max_queue, gateway.max_backlog, gateway.image_format) == (100, 5000, "raw")
+        assert gateway.topics["latent"].compress and not gateway.topics["viz"].compress
+
+    async def test_websocket_handler_registers_and_removes_client(self, gateway):
+        mock_ws = MagicMock()
+        mock_ws.remote_address = ("127.0.0.1", 1234)
+        mock_ws.request.path = "/?topics=run"
+        mock_ws.send = AsyncMock()
+
+        async def no_messages():
+            assert len(gateway.clients) == 1
+            return
+            yield
+
+        mock_ws.__aiter__ = lambda self: no_messages()
+        await gateway.websocket_handler(mock_ws)
+        assert gateway.clients == set()
+
+
+class TestCurves:
+    def _with_q(self, q):
+        return SAS1DReduction(
+            curve=SerializableNumpyArrayModel(array=np.linspace(0, 1, len(q))),
+            curve_tiled_url="http://c.com",
+            raw_frame=SerializableNumpyArrayModel(array=np.ones((2, 2))),
+            raw_frame_tiled_url="http://r.com",
+            q=SerializableNumpyArrayModel(array=q),
+        )
+
+    async def test_q_only_on_change(self, gateway):
+        client = _client(gateway, {"curves"})
+        q = np.linspace(0.01, 0.2, 8)
+        await gateway.publish(self._with_q(q))
+        await gateway.publish(self._with_q(q))
+        first, second = [msgpack.unpackb(item, raw=False) for item in _drain(client)]
+        assert "q" in first
+        assert "q" not in second
+
+    async def test_late_subscriber_gets_curve_axis(self, gateway):
+        q = np.linspace(0.01, 0.2, 8)
+        await gateway.publish(self._with_q(q))
+        client = _client(gateway, {"curves"})
+        axis = msgpack.unpackb(_drain(client)[0], raw=False)
+        assert axis["msg_type"] == "curve_axis"
+        np.testing.assert_allclose(np.frombuffer(axis["q"], dtype="<f4"), q, rtol=1e-6)
@@ -0,0 +1,137 @@
+"""Tests for arroyosas.zarr_archive (ZarrArchivePublisher)"""
+
+import asyncio
+
+import numpy as np
+import pytest
+import zarr
+
+from arroyosas.lse_reduction.schemas import LatentSpaceEvent
+from arroyosas.schemas import RawFrameEvent, SAS1DReduction, SASStart, SASStop, SerializableNumpyArrayModel
+from arroyosas.zarr_archive import ArchiveSeries, ZarrArchivePublisher
+
+
+def _start():
+    return SASStart(run_name="scan", run_id="id1", width=4, height=6, data_type="uint16", tiled_url="http://tiled/run")
+
+
+def _frame(number, value=1):
+    image = np.full((4, 6), value, dtype=np.uint16)
+    return RawFrameEvent(image=SerializableNumpyArrayModel(array=image), frame_number=number, tiled_url="http://tiled/f")
+
+
+def _reduction(value, q=None):
+    axis = {} if q is None else {"q": SerializableNumpyArrayModel(array=q)}
+    return SAS1DReduction(
+        curve=SerializableNumpyArrayModel(array=np.full(5, value, dtype=np.float32)),
+        curve_tiled_url="http://tiled/c",
+        raw_frame=SerializableNumpyArrayModel(array=np.full((4, 6), value, dtype=np.uint16)),
+        raw_frame_tiled_url="http://tiled/r",
+        **axis,
+    )
+
+
+def _latent(index):
+    return LatentSpaceEvent(tiled_url=f"http://tiled/{index}", feature_vector=[float(index), 0.5], index=index)
+
+
+def _open(tmp_path):
+    return zarr.open_group(str(tmp_path / "scan_id1.zarr"), mode="r")
+
+
+@pytest.fixture
+def publisher(tmp_path):
+    return ZarrArchivePublisher(root_path=str(tmp_path), frames_per_chunk=4, rows_per_chunk=8, flush_interval_s=60)
+
+
+class TestZarrArchivePublisher:
+    async def test_archives_run(self, publisher, tmp_path):
+        publisher.include_latent = True
+        await publisher.publish(_start())
+        q = np.linspace(0.1, 1.0, 5)
+        for number in range(3):
+            await publisher.publish(_frame(number, number))
+            await publisher.publish(_reduction(number, q))
+            await publisher.publish(_latent(number))
+        await publisher.publish(SASStop(num_frames=3))
+
+        group = _open(tmp_path)
+        assert group["frames"].shape == (3, 4, 6)
+        assert group["frames"].dtype == np.uint16
+        assert group["frames"][2].max() == 2
+        assert group["frame_number"][:].tolist() == [0, 1, 2]
+        assert group["curves"][:, 0].tolist() == [0.0, 1.0, 2.0]
+        np.testing.assert_allclose(group["q"][:], q)
+        assert group["latent"].dtype == np.float32
+        assert group["latent_index"][:].tolist() == [0, 1, 2]
+        assert group.attrs["run_id"] == "id1"
+        assert group.attrs["num_frames"] == 3
+
+    async def test_chunking_and_compression(self, tmp_path):
+        publisher = ZarrArchivePublisher(root_path=str(tmp_path), frames_per_chunk=4, frame_tile=4, compression=None)
+        await publisher.publish(_start())
+        await publisher.publish(_frame(0))
+        await publisher.publish(_reduction(0))
+        await publisher.flush()
+        group = _open(tmp_path)
+        assert group["frames"].chunks == (4, 4, 4)
+        assert group["curves"].chunks == (1024, 5)
+        assert group["frames"].compressors == ()
+
+    async def test_rows_buffered_until_chunk_full(self, publisher, tmp_path):
+        await publisher.publish(_start())
+        for number in range(3):
+            await publisher.publish(_frame(number))
+        assert "frames" not in _open(tmp_path)
+        await publisher.publish(_frame(3))
+        assert _open(tmp_path)["frames"].shape == (4, 4, 6)
+        assert len(publisher.series["frames"]) == 0
+
+    async def test_flushes_after_interval(self, publisher, tmp_path):
+        publisher.flush_interval_s = 0.01
+        await publisher.publish(_start())
+        await publisher.publish(_frame(0))
+        await asyncio.sleep(0.05)
+        assert _open(tmp_path)["frames"].shape[0] == 1
+
+    async def test_frames_from_reductions(self, publisher, tmp_path):
+        publisher.frame_source = "reduction"
+        await publisher.publish(_start())
+        await publisher.publish(_frame(7))
+        for value in range(2):
+            await publisher.publish(_reduction(value))
+        await publisher.flush()
+        group = _open(tmp_path)
+        assert group["frame_number"][:].tolist() == [0, 1]
+        assert group["frames"][1].max() == 1
+
+    async def test_latent_excluded_by_default(self, publisher, tmp_path):
+        await publisher.publish(_start())
+        await publisher.publish(_latent(0))
+        await publisher.flush()
+        assert "latent" not in _open(tmp_path)
+
+    async def test_ignores_messages_before_start(self, publisher, tmp_path):
+        await publisher.publish(_frame(0))
+        await publisher.flush()
+        assert publisher.group is None
+
+    def test_rejects_unknown_frame_source(self):
+        with pytest.raises(ValueError):
+            ZarrArchivePublisher(frame_source="tiled")
+
+
+class TestArchiveSeries:
+    def test_drops_rows_of_another_shape(self):
+        series = ArchiveSeries("curves", 8)
+        assert series.add(np.ones(5))
+        assert not series.add(np.ones(6))
+        assert len(series) == 1
+
+    def test_appends_to_existing_array(self, tmp_path):
+        group = zarr.open_group(str(tmp_path / "run.zarr"), mode="a")
+        for value in range(2):
+            series = ArchiveSeries("curves", 8)
+            series.add(np.full(3, value, dtype=np.float32))
+            series.flush(group, None)
+        assert group["curves"][:, 0].tolist() == [0.0, 1.0]
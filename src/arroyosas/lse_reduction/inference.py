@@ -0,0 +1,242 @@
+import contextlib
+import logging
+import os
+
+import numpy as np
+import torch
+from pydantic import BaseModel, field_validator
+
+logger = logging.getLogger("arroyo_reduction.inference")
+
+BACKEND_PYFUNC = "pyfunc"
+BACKEND_TORCHSCRIPT = "torchscript"
+BACKEND_ONNX = "onnx"
+
+# Layer types replaced by dynamic int8 quantization, convolutions stay fp32
+QUANTIZED_LAYERS = {torch.nn.Linear, torch.nn.LSTM, torch.nn.GRU}
+
+
+class InferenceConfig(BaseModel):
+    """
+    CPU inference settings for the autoencoder.
+
+    backend: "pyfunc" runs the MLflow model as loaded, "torchscript" and "onnx" replace its
+        torch module with a traced or ONNX Runtime version, cached next to the MLflow disk cache
+    inference_mode: run predict under torch.inference_mode
+    intra_op_threads / inter_op_threads: torch (and ONNX Runtime) thread pools, default left to torch
+    quantize: dynamic int8 quantization of the linear and recurrent layers
+    max_relative_delta: largest output difference, relative to the fp32 output range, accepted
+        from an optimized module before falling back to the original one
+    """
+
+    backend: str = BACKEND_PYFUNC
+    inference_mode: bool = True
+    intra_op_threads: int | None = None
+    inter_op_threads: int | None = None
+    quantize: bool = False
+    max_relative_delta: float = 0.02
+
+    @field_validator("backend")
+    @classmethod
+    def check_backend(cls, value):
+        if value not in (BACKEND_PYFUNC, BACKEND_TORCHSCRIPT, BACKEND_ONNX):
+            raise ValueError(f"Unknown inference backend {value}")
+        return value
+
+    @property
+    def optimizes(self) -> bool:
+        return self.backend != BACKEND_PYFUNC or self.quantize
+
+
+def configure_threads(config: InferenceConfig):
+    if config.intra_op_threads:
+        torch.set_num_threads(config.intra_op_threads)
+    if config.inter_op_threads:
+        try:
+            torch.set_num_interop_threads(config.inter_op_threads)
+        except RuntimeError as e:
+            # Only allowed before torch starts any parallel work
+            logger.warning(f"Could not set inter-op threads: {e}")
+    logger.info(f"Torch threads: intra-op {torch.get_num_threads()}, inter-op {torch.get_num_interop_threads()}")
+
+
+def inference_context(config: InferenceConfig):
+    return torch.inference_mode() if config.inference_mode else contextlib.nullcontext()
+
+
+def find_torch_module(model) -> tuple:
+    """
+    Find the torch module behind an MLflow pyfunc model, as (owner, attribute, module).
+    Custom python models are searched for their largest module attribute, native pytorch
+    flavor models expose ``pytorch_model``. Returns None when there is no torch module.
+    """
+    try:
+        owner = model.unwrap_python_model()
+    except Exception:
+        owner = getattr(model, "_model_impl", None)
+    if owner is None:
+        return None
+    modules = [(name, value) for name, value in vars(owner).items() if isinstance(value, torch.nn.Module)]
+    if not modules:
+        return None
+    name, module = max(modules, key=lambda item: sum(p.numel() for p in item[1].parameters()))
+    return owner, name, module
+
+
+def capture_inputs(model, module: torch.nn.Module, frame: np.ndarray) -> tuple:
+    """Run the pyfunc model on a frame and return the positional tensors its torch module received."""
+    captured = {}
+
+    def hook(_, args, kwargs):
+        captured.setdefault("args", args)
+        captured.setdefault("kwargs", kwargs)
+
+    handle = module.register_forward_pre_hook(hook, with_kwargs=True)
+    try:
+        with torch.no_grad():
+            model.predict(frame)
+    finally:
+        handle.remove()
+    if "args" not in captured:
+        raise ValueError("The torch module was not called by predict")
+    if captured["kwargs"] or not all(isinstance(arg, torch.Tensor) for arg in captured["args"]):
+        raise ValueError("Only modules called with positional tensors can be exported")
+    return tuple(arg.detach().clone() for arg in captured["args"])
+
+
+def _tensors(output) -> list:
+    if isinstance(output, torch.Tensor):
+        return [output]
+    if isinstance(output, (tuple, list)) and all(isinstance(item, torch.Tensor) for item in output):
+        return list(output)
+    raise ValueError(f"Unsupported module output type {type(output).__name__}")
+
+
+def relative_delta(reference, candidate) -> float:
+    """Largest absolute difference between two module outputs, relative to the reference range."""
+    reference, candidate = _tensors(reference), _tensors(candidate)
+    if len(reference) != len(candidate):
+        return float("inf")
+    delta = 0.0
+    for ref, cand in zip(reference, candidate):
+        if ref.shape != cand.shape:
+            return float("inf")
+        ref, cand = ref.float(), cand.float()
+        scale = float(ref.abs().max()) or 1.0
+        delta = max(delta, float((ref - cand).abs().max()) / scale)
+    return delta
+
+
+def quantize_module(module: torch.nn.Module) -> torch.nn.Module:
+    return torch.ao.quantization.quantize_dynamic(module, QUANTIZED_LAYERS, dtype=torch.qint8)
+
+
+def torchscript_module(module: torch.nn.Module, args: tuple, path: str = None) -> torch.nn.Module:
+    if path and os.path.exists(path):
+        logger.info(f"Loading TorchScript module from {path}")
+        return torch.jit.load(path)
+    with torch.no_grad():
+        traced = torch.jit.freeze(torch.jit.trace(module, args, check_trace=False))
+    if path:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        torch.jit.save(traced, path + ".tmp")
+        os.replace(path + ".tmp", path)
+    return traced
+
+
+class OnnxModule(torch.nn.Module):
+    """Runs an ONNX Runtime session with the call signature of the module it was exported from."""
+
+    def __init__(self, session):
+        super().__init__()
+        self.session = session
+        self.input_names = [i.name for i in session.get_inputs()]
+
+    def forward(self, *args):
+        feeds = {name: arg.detach().cpu().numpy() for name, arg in zip(self.input_names, args)}
+        outputs = [torch.from_numpy(output) for output in self.session.run(None, feeds)]
+        return outputs[0] if len(outputs) == 1 else tuple(outputs)
+
+
+def onnx_module(module: torch.nn.Module, args: tuple, config: InferenceConfig, path: str) -> torch.nn.Module:
+    """Export (or reuse) an ONNX model of the module and wrap an ONNX Runtime session around it."""
+    import onnxruntime
+
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        input_names = [f"input_{i}" for i in range(len(args))]
+        fp32_path = path + ".fp32.tmp" if config.quantize else path + ".tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                module,
+                args,
+                fp32_path,
+                input_names=input_names,
+                dynamic_axes={name: {0: "batch"} for name in input_names},
+                dynamo=False,
+            )
+        if config.quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            quantize_dynamic(fp32_path, path + ".tmp", weight_type=QuantType.QInt8)
+            os.remove(fp32_path)
+        os.replace(path + ".tmp", path)
+    else:
+        logger.info(f"Loading ONNX model from {path}")
+
+    options = onnxruntime.SessionOptions()
+    if config.intra_op_threads:
+        options.intra_op_num_threads = config.intra_op_threads
+    if config.inter_op_threads:
+        options.inter_op_num_threads = config.inter_op_threads
+    session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+    return OnnxModule(session)
+
+
+def optimized_path(cache_dir: str, model_id: str, config: InferenceConfig, args: tuple) -> str:
+    """Where an exported module is cached, None for models without a pinned version."""
+    if not cache_dir or not model_id or ":" not in model_id:
+        # "latest" may point at a different version next time
+        return None
+    name, version = model_id.split(":", 1)
+    shape = "x".join(str(d) for d in args[0].shape[1:])
+    suffix = ".onnx" if config.backend == BACKEND_ONNX else ".pt"
+    quantized = "_int8" if config.quantize else ""
+    return os.path.join(cache_dir, "optimized", f"{name}_v{version}_{config.backend}{quantized}_{shape}{suffix}")
+
+
+def optimize_model(model, frame: np.ndarray, config: InferenceConfig, model_id: str = None, cache_dir: str = None) -> bool:
+    """
+    Replace the torch module inside a pyfunc model with its optimized version, keeping the
+    model's own predict (and preprocessing). The optimized module is only swapped in when its
+    output on ``frame`` is within ``max_relative_delta`` of the original module.
+    """
+    found = find_torch_module(model)
+    if found is None:
+        logger.warning(f"No torch module found in {model_id}, keeping the pyfunc model")
+        return False
+    owner, attribute, module = found
+    module.eval()
+    args = capture_inputs(model, module, frame)
+    path = optimized_path(cache_dir, model_id, config, args)
+
+    candidate = quantize_module(module) if config.quantize and config.backend != BACKEND_ONNX else module
+    if config.backend == BACKEND_TORCHSCRIPT:
+        candidate = torchscript_module(candidate, args, path)
+    elif config.backend == BACKEND_ONNX:
+        candidate = onnx_module(candidate, args, config, path)
+
+    with torch.no_grad():
+        delta = relative_delta(module(*args), candidate(*args))
+    if delta > config.max_relative_delta:
+        logger.warning(
+            f"Optimized {model_id} ({config.backend}, quantize={config.quantize}) differs by {delta:.4g}, "
+            f"above {config.max_relative_delta}, keeping the original module"
+        )
+        if path and os.path.exists(path):
+            os.remove(path)
+        return False
+
+    setattr(owner, attribute, candidate)
+    logger.info(f"Optimized {model_id} with {config.backend}, quantize={config.quantize}, relative delta {delta:.4g}")
+    return True
@@ -0,0 +1,116 @@
+import logging
+import tempfile
+import threading
+
+import numpy as np
+
+logger = logging.getLogger("arroyo_reduction.latent_cache")
+
+
+class LatentStore:
+    """
+    Latent features of one autoencoder model, one float32 row per (tiled_url, index) key.
+    Frames of a run can share a tiled_url (the run's URI, or "" from the websocket
+    listeners), so the frame index is part of the key.
+
+    Rows live in a numpy array that doubles when full. Once it would grow past
+    ``max_memory_bytes`` it is moved to a float32 memmap in ``spill_dir``, which is
+    deleted when the store is dropped.
+    """
+
+    def __init__(self, shape: tuple, max_memory_bytes: int, spill_dir: str = None):
+        self.shape = shape
+        self.width = int(np.prod(shape))
+        self.max_memory_bytes = max_memory_bytes
+        self.spill_dir = spill_dir
+        self.rows: dict[tuple[str, int], int] = {}
+        self.keys: list[tuple[str, int]] = []
+        self.data = np.empty((64, self.width), dtype=np.float32)
+        self._spill_file = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def spilled(self) -> bool:
+        return self._spill_file is not None
+
+    def add(self, tiled_url: str, index: int, latent: np.ndarray):
+        key = (tiled_url, index)
+        row = self.rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row == len(self.data):
+                self._grow()
+            self.rows[key] = row
+            self.keys.append(key)
+        self.data[row] = np.asarray(latent, dtype=np.float32).reshape(-1)
+
+    def latents(self) -> np.ndarray:
+        """A copy of all rows, in the shape the autoencoder produced them."""
+        return np.array(self.data[: len(self.keys)]).reshape((len(self.keys), *self.shape))
+
+    def _grow(self):
+        capacity = len(self.data) * 2
+        if capacity * self.width * 4 <= self.max_memory_bytes:
+            grown = np.empty((capacity, self.width), dtype=np.float32)
+            spill_file = None
+        else:
+            spill_file = tempfile.NamedTemporaryFile(dir=self.spill_dir, prefix="latents_", suffix=".f32")
+            grown = np.memmap(spill_file, dtype=np.float32, mode="w+", shape=(capacity, self.width))
+            logger.info(f"Latent cache spilled to {spill_file.name} ({capacity} rows)")
+        grown[: len(self.data)] = self.data
+        old_file = self._spill_file
+        self.data = grown
+        self._spill_file = spill_file
+        if old_file is not None:
+            old_file.close()
+
+    def close(self):
+        self.data = np.empty((0, self.width), dtype=np.float32)
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+
+class LatentCache:
+    """
+    Per-run cache of autoencoder latent features, keyed by autoencoder model id and
+    (tiled_url, frame index). Lets a dimred model change re-project the run without re-encoding it.
+
+    Filled from the inference threads and read from the model update listener, so
+    every access holds the lock.
+    """
+
+    def __init__(self, max_memory_mb: float = 256, spill_dir: str = None):
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self.spill_dir = spill_dir
+        self.stores: dict[str, LatentStore] = {}
+        self._lock = threading.Lock()
+
+    def add(self, autoencoder_model: str, keys: list[tuple[str, int]], latent_features: np.ndarray):
+        """Cache one latent row per (tiled_url, index) key."""
+        latent_features = np.asarray(latent_features)
+        shape = latent_features.shape[1:]
+        with self._lock:
+            store = self.stores.get(autoencoder_model)
+            if store is None or store.shape != shape:
+                if store is not None:
+                    store.close()
+                store = LatentStore(shape, self.max_memory_bytes, self.spill_dir)
+                self.stores[autoencoder_model] = store
+            for (tiled_url, index), latent in zip(keys, latent_features):
+                store.add(tiled_url, index, latent)
+
+    def get(self, autoencoder_model: str) -> tuple[list[tuple[str, int]], np.ndarray]:
+        with self._lock:
+            store = self.stores.get(autoencoder_model)
+            if store is None or not len(store):
+                return [], None
+            return list(store.keys), store.latents()
+
+    def clear(self):
+        with self._lock:
+            for store in self.stores.values():
+                store.close()
+            self.stores = {}
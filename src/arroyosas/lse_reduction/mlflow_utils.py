@@ -1,8 +1,15 @@
+import contextlib
+import fcntl
 import hashlib
+import json
 import logging
 import os
 import shutil
 import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import mlflow
 from mlflow.tracking import MlflowClient
@@ -12,17 +19,269 @@ MLFLOW_TRACKING_USERNAME = os.getenv("MLFLOW_TRACKING_USERNAME", "")
 MLFLOW_TRACKING_PASSWORD = os.getenv("MLFLOW_TRACKING_PASSWORD", "")
 # Define a cache directory that will be mounted as a volume
 MLFLOW_CACHE_DIR = os.getenv("MLFLOW_CACHE_DIR", os.path.join(tempfile.gettempdir(), "mlflow_cache"))
+# In-memory model cache budget, the memory budget is measured on the models' artifact size on disk
+MLFLOW_MODEL_CACHE_MAX_MODELS = int(os.getenv("MLFLOW_MODEL_CACHE_MAX_MODELS", 8))
+MLFLOW_MODEL_CACHE_MAX_MB = float(os.getenv("MLFLOW_MODEL_CACHE_MAX_MB", 0)) or None
+# Disk cache budget, least recently used models are deleted past it (0 for no limit)
+MLFLOW_CACHE_MAX_GB = float(os.getenv("MLFLOW_CACHE_MAX_GB", 0)) or None
+
+# Registry and run metadata is reused for this long, model_updates events clear it earlier
+MLFLOW_METADATA_TTL_SECONDS = float(os.getenv("MLFLOW_METADATA_TTL_SECONDS", 60))
+# Concurrent get_run calls when listing models
+MLFLOW_METADATA_WORKERS = int(os.getenv("MLFLOW_METADATA_WORKERS", 8))
+
+MANIFEST_FILE = "manifest.json"
+DOWNLOAD_PREFIX = ".download_"
+# Interrupted downloads older than this are removed during eviction
+STALE_DOWNLOAD_SECONDS = 3600
 
 logger = logging.getLogger("lse.mlflow_utils")
 
 
+@contextlib.contextmanager
+def _file_lock(path, blocking=True):
+    """
+    Exclusive advisory lock shared by all processes using the cache, yields whether it was acquired.
+
+    Eviction deletes lock files, so a lock taken on a file that was deleted (or replaced)
+    meanwhile is dropped and taken again on the current file.
+    """
+    while True:
+        with open(path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                if not _is_same_file(lock_file, path):
+                    continue
+                yield True
+                return
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _is_same_file(opened, path) -> bool:
+    try:
+        return os.stat(path).st_ino == os.fstat(opened.fileno()).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def _artifact_stats(path) -> tuple[int, int]:
+    """Total size and count of all files except the manifest, without reading them."""
+    size = 0
+    count = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            file_path = os.path.join(root, name)
+            if os.path.relpath(file_path, path) != MANIFEST_FILE:
+                size += os.path.getsize(file_path)
+                count += 1
+    return size, count
+
+
+def _artifact_digest(path) -> tuple[str, int, int]:
+    """sha256 over the relative paths and contents of all files except the manifest, with total size and count."""
+    digest = hashlib.sha256()
+    size = 0
+    count = 0
+    files = []
+    for root, _, names in os.walk(path):
+        for name in names:
+            rel = os.path.relpath(os.path.join(root, name), path)
+            if rel != MANIFEST_FILE:
+                files.append(rel)
+    for rel in sorted(files):
+        digest.update(rel.encode())
+        with open(os.path.join(path, rel), "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+                size += len(chunk)
+        count += 1
+    return digest.hexdigest(), size, count
+
+
+def _directory_size(path) -> int:
+    """Total size of the files under path, 0 if it can not be read."""
+    total = 0
+    try:
+        for root, _, files in os.walk(path):
+            for name in files:
+                total += os.path.getsize(os.path.join(root, name))
+    except OSError:
+        return 0
+    return total
+
+
+class ModelCache:
+    """
+    Thread-safe LRU cache of loaded models, bounded by a model count and optionally by
+    the total artifact size of its models. Pinned models (the ones being served) are
+    never evicted, so the cache can go over budget while they are all pinned.
+    """
+
+    def __init__(self, max_models: int = MLFLOW_MODEL_CACHE_MAX_MODELS, max_memory_mb: float = MLFLOW_MODEL_CACHE_MAX_MB):
+        self.max_models = max_models
+        self.max_bytes = int(max_memory_mb * 1024 * 1024) if max_memory_mb else None
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._pinned = set()
+        self._lock = threading.RLock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._models
+
+    def __len__(self):
+        with self._lock:
+            return len(self._models)
+
+    def __getitem__(self, key):
+        with self._lock:
+            self._models.move_to_end(key)
+            return self._models[key]
+
+    def __setitem__(self, key, model):
+        self.put(key, model)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._models:
+                return default
+            return self[key]
+
+    def put(self, key, model, size_bytes: int = 0, recent: bool = True):
+        """Add a model, as the most recently used one or (for prefetched models) the least."""
+        with self._lock:
+            self._models[key] = model
+            self._models.move_to_end(key, last=recent)
+            self._sizes[key] = size_bytes
+            self._evict()
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def has_room(self, size_bytes: int = 0) -> bool:
+        with self._lock:
+            if len(self._models) >= self.max_models:
+                return False
+            return self.max_bytes is None or self.total_bytes + size_bytes <= self.max_bytes
+
+    def pin(self, keys):
+        """Replace the set of pinned models."""
+        with self._lock:
+            self._pinned = {key for key in keys if key}
+            self._evict()
+
+    def configure(self, max_models: int = None, max_memory_mb: float = None):
+        with self._lock:
+            if max_models is not None:
+                self.max_models = max_models
+            if max_memory_mb is not None:
+                self.max_bytes = int(max_memory_mb * 1024 * 1024) if max_memory_mb else None
+            self._evict()
+
+    def _over_budget(self) -> bool:
+        if len(self._models) > self.max_models:
+            return True
+        return self.max_bytes is not None and self.total_bytes > self.max_bytes
+
+    def _evict(self):
+        for key in list(self._models):
+            if not self._over_budget():
+                return
+            if key in self._pinned:
+                continue
+            del self._models[key]
+            size = self._sizes.pop(key, 0)
+            logger.info(f"Evicted model {key} from the in-memory cache ({size / 1e6:.1f} MB)")
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._sizes.clear()
+
+
+class MetadataCache:
+    """
+    Thread-safe TTL cache of MLflow registry and run metadata. Concurrent misses for the
+    same key share a single request instead of each querying the tracking server.
+    """
+
+    def __init__(self, ttl_seconds: float = MLFLOW_METADATA_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._loading = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key, loader):
+        """Return the cached value for key, calling loader() when it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds:
+                return entry[1]
+            event = self._loading.get(key)
+            owner = event is None
+            if owner:
+                event = self._loading[key] = threading.Event()
+            generation = self._generation
+
+        if not owner:
+            event.wait()
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None:
+                return entry[1]
+            # The owner failed or the cache was cleared meanwhile, query directly
+            return loader()
+
+        try:
+            value = loader()
+            with self._lock:
+                # Results loaded before an invalidation may already be stale
+                if generation == self._generation:
+                    self._entries[key] = (time.monotonic(), value)
+            return value
+        finally:
+            with self._lock:
+                if self._loading.get(key) is event:
+                    del self._loading[key]
+            event.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+
 class MLflowClient:
     """A wrapper class for MLflow client operations."""
 
-    # In-memory model cache (for quick access)
-    _model_cache = {}
-
-    def __init__(self, tracking_uri=None, username=None, password=None, cache_dir=None):
+    # In-memory model cache (for quick access), shared by all clients in the process
+    _model_cache = ModelCache()
+    # Registry and run metadata, shared the same way
+    _metadata_cache = MetadataCache()
+    _metadata_executor = ThreadPoolExecutor(max_workers=MLFLOW_METADATA_WORKERS, thread_name_prefix="mlflow_metadata")
+
+    def __init__(
+        self,
+        tracking_uri=None,
+        username=None,
+        password=None,
+        cache_dir=None,
+        max_cached_models=None,
+        max_cache_memory_mb=None,
+        max_disk_cache_gb=None,
+    ):
         """
         Initialize the MLflow client with connection parameters.
 
@@ -31,11 +290,16 @@ class MLflowClient:
             username: MLflow authentication username
             password: MLflow authentication password
             cache_dir: Directory to store cached models
+            max_cached_models: Number of models kept in memory (default MLFLOW_MODEL_CACHE_MAX_MODELS)
+            max_cache_memory_mb: Artifact size of the models kept in memory (default MLFLOW_MODEL_CACHE_MAX_MB)
+            max_disk_cache_gb: Size of the disk cache (default MLFLOW_CACHE_MAX_GB)
         """
         self.tracking_uri = tracking_uri or os.getenv("MLFLOW_TRACKING_URI")
         self.username = username or os.getenv("MLFLOW_TRACKING_USERNAME", "")
         self.password = password or os.getenv("MLFLOW_TRACKING_PASSWORD", "")
         self.cache_dir = cache_dir or MLFLOW_CACHE_DIR
+        self.max_disk_cache_bytes = int((max_disk_cache_gb or MLFLOW_CACHE_MAX_GB or 0) * 1024**3) or None
+        self._model_cache.configure(max_cached_models, max_cache_memory_mb)
 
         # Create cache directory if it doesn't exist
         os.makedirs(self.cache_dir, exist_ok=True)
@@ -69,8 +333,9 @@ class MLflowClient:
         # Check dimension compatibility
         try:
             # get_mlflow_params now handles "name:version" format automatically
-            auto_params = self.get_mlflow_params(autoencoder_model)
+            auto_future = self._metadata_executor.submit(self.get_mlflow_params, autoencoder_model)
             dimred_params = self.get_mlflow_params(dim_reduction_model)
+            auto_params = auto_future.result()
 
             auto_dim = int(auto_params.get("latent_dim", 0))
             dimred_dim = int(dimred_params.get("input_dim", 0))
@@ -115,13 +380,45 @@ class MLflowClient:
             else:
                 version = "1"  # Default to version 1 for backward compatibility
 
-        model_version_details = self.client.get_model_version(name=mlflow_model_id, version=str(version))
+        model_version_details = self._metadata_cache.get(
+            ("model_version", mlflow_model_id, str(version)),
+            lambda: self.client.get_model_version(name=mlflow_model_id, version=str(version)),
+        )
         run_id = model_version_details.run_id
 
-        run_info = self.client.get_run(run_id)
+        run_info = self.get_run(run_id)
         params = run_info.data.params
         return params
 
+    def get_run(self, run_id):
+        """MLflow run by id, through the metadata cache."""
+        return self._metadata_cache.get(("run", run_id), lambda: self.client.get_run(run_id))
+
+    def get_runs(self, run_ids) -> dict:
+        """
+        Fetch several runs concurrently, returning {run_id: run or the exception raised}.
+        """
+
+        def fetch(run_id):
+            try:
+                return self.get_run(run_id)
+            except Exception as e:
+                return e
+
+        run_ids = list(dict.fromkeys(run_ids))
+        return dict(zip(run_ids, self._metadata_executor.map(fetch, run_ids)))
+
+    def search_model_versions(self, filter_string=None):
+        """search_model_versions through the metadata cache."""
+        if filter_string is None:
+            return self._metadata_cache.get(("versions", None), lambda: self.client.search_model_versions())
+        return self._metadata_cache.get(("versions", filter_string), lambda: self.client.search_model_versions(filter_string))
+
+    @classmethod
+    def invalidate_metadata(cls):
+        """Forget cached registry and run metadata, e.g. after a model_updates event."""
+        cls._metadata_cache.clear()
+
     def get_mlflow_models(self, livemode=False, model_type=None):
         """
         Retrieve available MLflow models and create dropdown options.
@@ -135,7 +432,9 @@ class MLflowClient:
             list: Dropdown options for MLflow models matching the tag filters.
         """
         try:
-            all_versions = self.client.search_model_versions()
+            all_versions = self.search_model_versions()
+            # One concurrent round of run lookups instead of one request per version
+            runs = self.get_runs(v.run_id for v in all_versions)
 
             model_map = {}  # model name -> latest version info
 
@@ -145,7 +444,9 @@ class MLflowClient:
                     if current and int(v.version) <= int(current.version):
                         continue
 
-                    run = self.client.get_run(v.run_id)
+                    run = runs[v.run_id]
+                    if isinstance(run, Exception):
+                        raise run
                     run_tags = run.data.tags
 
                     # Tag-based filtering
@@ -193,7 +494,7 @@ class MLflowClient:
             list: List of version options sorted by version number (latest first)
         """
         try:
-            versions = self.client.search_model_versions(f"name='{model_name}'")
+            versions = self.search_model_versions(f"name='{model_name}'")
 
             if not versions:
                 return []
@@ -222,13 +523,14 @@ class MLflowClient:
             # Include version in the filename
             return os.path.join(self.cache_dir, f"{model_name}_v{version}")
 
-    def load_model(self, model_name, version=None):
+    def load_model(self, model_name, version=None, prefetch=False):
         """
         Load a model from MLflow by name with disk caching
 
         Args:
             model_name: Name of the model in MLflow
             version: Specific version to load (optional, defaults to latest)
+            prefetch: Cache the model as least recently used, so it is evicted first
 
         Returns:
             The loaded model or None if loading fails
@@ -241,9 +543,10 @@ class MLflowClient:
         cache_key = f"{model_name}:{version}" if version else model_name
 
         # Check in-memory cache first
-        if cache_key in self._model_cache:
+        cached_model = self._model_cache.get(cache_key)
+        if cached_model is not None:
             logger.info(f"Using in-memory cached model: {cache_key}")
-            return self._model_cache[cache_key]
+            return cached_model
 
         try:
             # Get the specific version or latest version
@@ -258,43 +561,19 @@ class MLflowClient:
 
             model_uri = f"models:/{model_name}/{version}"
 
-            # Check disk cache
-            cache_path = self._get_cache_path(model_name, version)
-            if os.path.exists(cache_path):
-                logger.info(f"Loading model from disk cache: {cache_path}")
-                try:
-                    model = mlflow.pyfunc.load_model(cache_path)
-                    self._model_cache[cache_key] = model
-                    logger.info(f"Successfully loaded cached model: {cache_key}")
-                    return model
-                except Exception as e:
-                    logger.warning(f"Error loading model from cache: {e}")
-
-            # Create cache directory if it doesn't exist
-            os.makedirs(
-                os.path.dirname(cache_path) if os.path.dirname(cache_path) else ".",
-                exist_ok=True,
-            )
-
-            logger.info(f"Downloading model {model_name}, version {version} from MLflow to cache")
-
             try:
-                # Download the model directly to the cache location
-                download_path = mlflow.artifacts.download_artifacts(
-                    artifact_uri=f"models:/{model_name}/{version}", dst_path=cache_path
-                )
-                logger.info(f"Downloaded model artifacts to: {download_path}")
-
-                # Load the model from the cached location
-                model = mlflow.pyfunc.load_model(download_path)
-                logger.info(f"Successfully loaded model from cache: {cache_key}")
+                # Verified disk cache, downloaded first if missing or corrupt
+                model_path, size = self.ensure_cached(model_name, version)
+                logger.info(f"Loading model from disk cache: {model_path}")
+                model = mlflow.pyfunc.load_model(model_path)
+                logger.info(f"Successfully loaded cached model: {cache_key}")
 
                 # Store in memory cache
-                self._model_cache[cache_key] = model
+                self._model_cache.put(cache_key, model, size, recent=not prefetch)
 
                 return model
             except Exception as e:
-                logger.warning(f"Error downloading artifacts: {e}")
+                logger.warning(f"Error loading model through the disk cache: {e}")
 
                 # Fallback: Load the model directly from MLflow
                 logger.info("Falling back to direct model loading from MLflow")
@@ -302,13 +581,194 @@ class MLflowClient:
                 logger.info(f"Successfully loaded model: {cache_key}")
 
                 # Store in memory cache
-                self._model_cache[cache_key] = model
+                self._model_cache.put(cache_key, model, recent=not prefetch)
 
                 return model
         except Exception as e:
             logger.error(f"Error loading model {cache_key}: {e}")
             return None
 
+    def _read_manifest(self, cache_path):
+        try:
+            with open(os.path.join(cache_path, MANIFEST_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _verified_model_path(self, cache_path, full_check=False):
+        """
+        Model directory of a complete cache entry with a matching manifest, or None. Called
+        with the entry's lock held, as it touches the manifest.
+
+        Loads compare the size and number of files with the manifest; ``full_check`` also
+        compares the sha256 of the contents, which reads the whole entry.
+        """
+        manifest = self._read_manifest(cache_path)
+        if manifest is None:
+            return None
+        if full_check:
+            found = _artifact_digest(cache_path)
+            expected = (manifest.get("sha256"), manifest.get("size"), manifest.get("files"))
+        else:
+            found = _artifact_stats(cache_path)
+            expected = (manifest.get("size"), manifest.get("files"))
+        if found != expected:
+            logger.warning(f"Disk cache entry {cache_path} does not match its manifest, downloading it again")
+            return None
+        # The manifest mtime records when the entry was last used, for eviction
+        os.utime(os.path.join(cache_path, MANIFEST_FILE))
+        return os.path.normpath(os.path.join(cache_path, manifest.get("model_path", ".")))
+
+    def verify_cached(self, model_name, version) -> bool:
+        """Check a cached model's contents against the sha256 of its manifest, deleting the entry if they differ."""
+        cache_path = self._get_cache_path(model_name, version)
+        if not os.path.isdir(cache_path):
+            return False
+        with _file_lock(cache_path + ".lock"):
+            if self._verified_model_path(cache_path, full_check=True) is not None:
+                return True
+            shutil.rmtree(cache_path, ignore_errors=True)
+            return False
+
+    def ensure_cached(self, model_name, version):
+        """
+        Make sure a model version is in the disk cache and return (model path, size in bytes).
+
+        Downloads go into a temporary directory that is renamed into place once the manifest
+        is written, so a cache entry is either complete or absent, and their sha256 is kept in
+        the manifest for verify_cached. A lock file per model keeps concurrent workers from
+        downloading the same model, the ones that waited reuse the finished download, and
+        keeps eviction away from an entry while it is checked and marked as used.
+        """
+        cache_path = self._get_cache_path(model_name, version)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with _file_lock(cache_path + ".lock"):
+            model_path = self._verified_model_path(cache_path)
+            if model_path is not None:
+                return model_path, self._read_manifest(cache_path)["size"]
+
+            logger.info(f"Downloading model {model_name}, version {version} from MLflow to cache")
+            download_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=DOWNLOAD_PREFIX)
+            try:
+                download_path = mlflow.artifacts.download_artifacts(
+                    artifact_uri=f"models:/{model_name}/{version}", dst_path=download_dir
+                )
+                model_rel = os.path.relpath(download_path, download_dir)
+                if model_rel.startswith(os.pardir):
+                    raise ValueError(f"Artifacts were downloaded outside of {download_dir}: {download_path}")
+                digest, size, count = _artifact_digest(download_dir)
+                manifest = {
+                    "model": model_name,
+                    "version": str(version),
+                    "model_path": model_rel,
+                    "sha256": digest,
+                    "size": size,
+                    "files": count,
+                    "created": time.time(),
+                }
+                with open(os.path.join(download_dir, MANIFEST_FILE), "w") as f:
+                    json.dump(manifest, f)
+                if os.path.exists(cache_path):
+                    # Corrupt, or written before manifests existed
+                    shutil.rmtree(cache_path)
+                os.rename(download_dir, cache_path)
+                logger.info(f"Cached model {model_name}:{version} at {cache_path} ({size / 1e6:.1f} MB)")
+            except Exception:
+                shutil.rmtree(download_dir, ignore_errors=True)
+                raise
+
+        self.evict_disk_cache(keep=cache_path)
+        return os.path.normpath(os.path.join(cache_path, model_rel)), size
+
+    def evict_disk_cache(self, keep=None):
+        """
+        Delete the least recently used cache entries until the cache fits max_disk_cache_bytes,
+        along with stale downloads and the lock files of entries that no longer exist.
+        """
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(DOWNLOAD_PREFIX):
+                if now - os.path.getmtime(path) > STALE_DOWNLOAD_SECONDS:
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            if name.endswith(".lock"):
+                if not os.path.exists(path[: -len(".lock")]):
+                    self._remove_lock_file(path)
+                continue
+            manifest = self._read_manifest(path)
+            if manifest is not None:
+                entries.append((os.path.getmtime(os.path.join(path, MANIFEST_FILE)), path, manifest.get("size", 0)))
+        if self.max_disk_cache_bytes is None:
+            return
+        total = sum(size for _, _, size in entries)
+        for used, path, size in sorted(entries):
+            if total <= self.max_disk_cache_bytes:
+                return
+            if path == keep:
+                continue
+            with _file_lock(path + ".lock", blocking=False) as acquired:
+                # Skip entries another worker is downloading, replacing or loading
+                if not acquired:
+                    continue
+                try:
+                    if os.path.getmtime(os.path.join(path, MANIFEST_FILE)) != used:
+                        # Loaded since the cache was listed, it is no longer the least recently used
+                        continue
+                except OSError:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                os.remove(path + ".lock")
+            total -= size
+            logger.info(f"Evicted {path} from the disk cache ({size / 1e6:.1f} MB)")
+
+    @staticmethod
+    def _remove_lock_file(lock_path):
+        """Delete the lock file of a deleted entry, unless a worker holds it (e.g. while downloading it)."""
+        try:
+            with _file_lock(lock_path, blocking=False) as acquired:
+                if acquired and not os.path.exists(lock_path[: -len(".lock")]):
+                    os.remove(lock_path)
+        except OSError as e:
+            logger.debug(f"Could not remove lock file {lock_path}: {e}")
+
+    def pin_models(self, model_ids):
+        """Keep these models (in "name:version" or "name" form) in memory until they are unpinned."""
+        self._model_cache.pin(model_ids)
+
+    def prefetch_live_models(self):
+        """
+        Load the latest version of every live mode model in a background thread, as long as
+        the in-memory cache has room, so that switching to one of them does not wait on MLflow.
+        Models are cached under their bare name, the key load_model uses for the latest version.
+        """
+
+        def prefetch():
+            for option in self.get_mlflow_models(livemode=True):
+                model_name = option.get("value")
+                if not model_name:
+                    continue
+                try:
+                    versions = self.search_model_versions(f"name='{model_name}'")
+                    if not versions:
+                        continue
+                    version = str(max(int(mv.version) for mv in versions))
+                    if model_name in self._model_cache:
+                        continue
+                    size = _directory_size(self._get_cache_path(model_name, version))
+                    if not self._model_cache.has_room(size):
+                        logger.info("Model cache is full, stopping prefetch")
+                        return
+                    logger.info(f"Prefetching model {model_name}:{version}")
+                    self.load_model(model_name, prefetch=True)
+                except Exception as e:
+                    logger.warning(f"Error prefetching model {model_name}: {e}")
+
+        thread = threading.Thread(target=prefetch, daemon=True)
+        thread.start()
+        return thread
+
     @classmethod
     def clear_memory_cache(cls):
         """Clear the in-memory model cache"""
@@ -2,32 +2,92 @@ import asyncio
 import logging
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable
 
+import numpy as np
 from arroyopy.operator import Operator
 from arroyopy.schemas import Start, Stop
 
 from arroyosas.schemas import RawFrameEvent, SASMessage
 
+from .inference import InferenceConfig
 from .redis_model_store import RedisModelStore  # Import the RedisModelStore class
 from .reducer import LatentSpaceReducer, Reducer
 from .schemas import LatentSpaceEvent
+from .worker_pool import WorkerPoolReducer
 
 logger = logging.getLogger("arroyo_reduction.operator")
 
 
 class LatentSpaceOperator(Operator):
-    def __init__(self, reducer: Reducer, redis_model_store: RedisModelStore):
+    """
+    Reduces raw frames to latent space points.
+
+    With ``batch_max_frames`` above 1, frames are collected until the batch is full or
+    ``batch_max_wait_ms`` has passed since the first one, and the models run once on the
+    whole batch. Each resulting LatentSpaceEvent carries its share of the batch timing
+    plus the batch size and the timing of the whole batch.
+
+    The model selection is read from Redis once, then kept current from the
+    ``model_updates`` channel (and reloaded whenever that subscription reconnects), so
+    handling a frame never waits on Redis.
+
+    When the reducer swaps in a new dimred model, the cached latents of the current run
+    are re-projected in one batch and published again with the new coordinates, marked
+    ``reprojected`` so that publishers that store results skip them.
+
+    With ``max_in_flight`` above 1, frames are pipelined: a frame is published while
+    earlier frames are still in the models, and its latent point is published once every
+    earlier frame's has been. At most ``reducer.max_concurrency`` frames (or batches) are
+    in the reducer at the same time, so a WorkerPoolReducer reduces several at once.
+    Publishing is serialized, so publishers never see two messages at the same time.
+    """
+
+    def __init__(
+        self,
+        reducer: Reducer,
+        redis_model_store: RedisModelStore,
+        batch_max_frames: int = 1,
+        batch_max_wait_ms: float = 20,
+        max_in_flight: int = 1,
+    ):
         super().__init__()
         self.reducer = reducer
         self.redis_model_store = redis_model_store
+        self.batch_max_frames = batch_max_frames
+        self.batch_max_wait_ms = batch_max_wait_ms
+        self.max_in_flight = max_in_flight
 
         # NEW: Track if flush was already sent
         self._flush_sent = False
 
+        # (autoencoder_model, dimred_model), replaced as a whole by the listener thread
+        self.model_selection = self._check_models_selected()
+        if self.redis_model_store is not None:
+            self.redis_model_store.subscribe_to_model_updates(self._on_model_update, on_subscribe=self._reload_model_selection)
+
+        # Micro-batching state
+        self.pending_frames: list[RawFrameEvent] = []
+        self._batch_timer: asyncio.Task = None
+        # Batches are reduced and published one at a time, in arrival order
+        self._batch_lock = asyncio.Lock()
+        # Pipelined dispatches waiting to be published, oldest first
+        self._in_flight: asyncio.Queue = None
+        self._drain_task: asyncio.Task = None
+        self._publish_lock = asyncio.Lock()
+        self._inference_executor = ThreadPoolExecutor(
+            max_workers=self.reducer.max_concurrency, thread_name_prefix="lse-inference"
+        )
+
+        # Model swaps are reported from the reducer's threads
+        self._loop: asyncio.AbstractEventLoop = None
+        self.reducer.on_model_swap = self._on_model_swap
+
     def _check_models_selected(self):
         """
         Synchronous helper to check if models are selected in Redis.
-        This will be called via asyncio.to_thread() to avoid blocking the event loop.
+        Called at startup and from the model update listener thread, never per frame.
 
         Returns:
             tuple: (autoencoder_model, dimred_model) or (None, None) if not available
@@ -43,80 +103,180 @@ class LatentSpaceOperator(Operator):
             logger.error(f"Error checking model selection in Redis: {e}")
             return (None, None)
 
+    def _reload_model_selection(self):
+        self.model_selection = self._check_models_selected()
+        logger.info(f"Loaded model selection from Redis: {self.model_selection}")
+
+    def _on_model_update(self, update: dict):
+        """Apply a model_updates message to the local model selection. An empty name clears the selection."""
+        model_type = update.get("model_type")
+        if model_type not in ("autoencoder", "dimred"):
+            return
+        autoencoder_model, dimred_model = self.model_selection
+        if model_type == "autoencoder":
+            autoencoder_model = update.get("model_name") or None
+        else:
+            dimred_model = update.get("model_name") or None
+        self.model_selection = (autoencoder_model, dimred_model)
+        logger.info(f"Model selection updated: {self.model_selection}")
+
+    def _on_model_swap(self, model_type: str, model_id: str):
+        """Called from a reducer thread, schedules the re-projection on the event loop."""
+        if model_type != "dimred" or self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.reproject(), self._loop)
+
+    async def reproject(self) -> None:
+        """Publish the current run again with coordinates from the current dimred model."""
+        try:
+            keys, coords, timing_info = await asyncio.to_thread(self.reducer.reproject)
+        except Exception as e:
+            logger.error(f"Error re-projecting cached latents: {e}")
+            return
+        if not keys:
+            return
+        timestamp = time.time()
+        dimred_time = timing_info["dimred_time"] / len(keys)
+        async with self._batch_lock:
+            for (tiled_url, index), vector in zip(keys, coords):
+                await self.publish(
+                    LatentSpaceEvent(
+                        tiled_url=tiled_url,
+                        feature_vector=np.asarray(vector).tolist(),
+                        index=index,
+                        autoencoder_model=timing_info["autoencoder_model"],
+                        dimred_model=timing_info["dimred_model"],
+                        experiment_name=self.reducer.experiment_name,
+                        timestamp=timestamp,
+                        total_processing_time=dimred_time,
+                        dimred_time=dimred_time,
+                        batch_size=timing_info["batch_size"],
+                        batch_dimred_time=timing_info["dimred_time"],
+                        reprojected=True,
+                    )
+                )
+        logger.info(f"Published {len(keys)} re-projected points for {timing_info['dimred_model']}")
+
+    async def publish(self, message) -> None:
+        # Raw frames and latent points are published from different tasks
+        async with self._publish_lock:
+            await super().publish(message)
+
     async def process(self, message: SASMessage) -> None:
         # logger.debug("message recvd")
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
         if isinstance(message, Start):
             logger.info("Received Start Message")
+            await self.flush_frames()
+            await self.wait_in_flight()
+            self.reducer.start_run()
             await self.publish(message)
         elif isinstance(message, RawFrameEvent):
-            # NEW: Check if models are selected before publishing RawFrameEvent
-            if self.redis_model_store is not None:
-                # Run Redis check in thread pool to avoid blocking event loop
-                autoencoder_model, dimred_model = await asyncio.to_thread(self._check_models_selected)
-
-                if not autoencoder_model or not dimred_model:
-                    logger.info(f"In offline mode - skipping write image {message.frame_number}")
-                else:
-                    await self.publish(message)
+            # The raw frame is published while the frame is in the models
+            if self.batch_max_frames > 1:
+                await asyncio.gather(self.publish_raw_frame(message), self.enqueue(message))
             else:
-                # If redis not available, publish anyway (default behavior)
-                await self.publish(message)
-
-            result = await self.dispatch(message)
-            if result is not None:  # Only publish if we got a valid result
-                await self.publish(result)
+                await asyncio.gather(self.publish_raw_frame(message), self.submit(self.dispatch_frame(message)))
         elif isinstance(message, Stop):
             logger.info("Received Stop Message")
+            # The last frames of the run go out before the stop
+            await self.flush_frames()
+            await self.wait_in_flight()
             await self.publish(message)
         else:
             logger.warning(f"Unknown message type: {type(message)}")
         return None
 
+    async def publish_raw_frame(self, message: RawFrameEvent) -> None:
+        # NEW: Check if models are selected before publishing RawFrameEvent
+        if self.redis_model_store is not None:
+            autoencoder_model, dimred_model = self.model_selection
+
+            if not autoencoder_model or not dimred_model:
+                logger.info(f"In offline mode - skipping write image {message.frame_number}")
+            else:
+                await self.publish(message)
+        else:
+            # If redis not available, publish anyway (default behavior)
+            await self.publish(message)
+
+    async def _ready_for_inference(self, message: RawFrameEvent) -> bool:
+        """Check that models are selected and loaded, sending the flush signal when entering offline mode."""
+        # Use the RedisModelStore instead of direct Redis client
+        if self.redis_model_store is not None:
+            autoencoder_model, dimred_model = self.model_selection
+
+            if not autoencoder_model or not dimred_model:
+                # NEW: Send flush only once when entering offline mode
+                if not self._flush_sent:
+                    flush_event = LatentSpaceEvent(
+                        tiled_url="FLUSH_SIGNAL",
+                        feature_vector=[],
+                        index=-1,
+                        autoencoder_model="",
+                        dimred_model="",
+                        experiment_name="",
+                        timestamp=time.time(),
+                    )
+                    await self.publish(flush_event)
+                    self._flush_sent = True
+                    logger.info("Sent flush signal when entering offline mode")
+
+                logger.info(f"In offline mode - skipping dispatch frame {message.frame_number}")
+                return False
+            else:
+                # NEW: Reset flush flag when back in live mode
+                self._flush_sent = False
+        else:
+            # Model store couldn't be initialized, log a warning but continue processing
+            logger.debug("Redis Model Store not available, proceeding with processing")
+
+        # Existing loading check
+        if hasattr(self.reducer, "is_loading_model") and self.reducer.is_loading_model:
+            loading_type = self.reducer.loading_model_type or "unknown"
+            logger.info(
+                f"Waiting for {loading_type} model to finish loading before processing frame {message.frame_number}..."
+            )
+            return False
+        return True
+
+    def _latent_event(
+        self,
+        message: RawFrameEvent,
+        feature_vector,
+        start_time: float,
+        total_processing_time: float,
+        timing_info: dict,
+    ) -> LatentSpaceEvent:
+        return LatentSpaceEvent(
+            tiled_url=message.tiled_url,
+            feature_vector=feature_vector[0].tolist(),
+            index=message.frame_number,
+            # The models that produced this vector, which may have been swapped out since
+            autoencoder_model=timing_info.get("autoencoder_model", self.reducer.autoencoder_model_name),
+            dimred_model=timing_info.get("dimred_model", self.reducer.dimred_model_name),
+            experiment_name=self.reducer.experiment_name,  # NEW: Add experiment name
+            timestamp=start_time,  # Add start timestamp
+            total_processing_time=total_processing_time,  # Add total processing time
+            autoencoder_time=timing_info.get("autoencoder_time"),  # Add autoencoder processing time
+            dimred_time=timing_info.get("dimred_time"),  # Add dimension reduction processing time
+            batch_size=timing_info.get("batch_size"),
+            batch_autoencoder_time=timing_info.get("batch_autoencoder_time"),
+            batch_dimred_time=timing_info.get("batch_dimred_time"),
+        )
+
     async def dispatch(self, message: RawFrameEvent) -> LatentSpaceEvent:
         try:
-            # Use the RedisModelStore instead of direct Redis client
-            if self.redis_model_store is not None:
-                # Run Redis check in thread pool to avoid blocking event loop
-                autoencoder_model, dimred_model = await asyncio.to_thread(self._check_models_selected)
-
-                if not autoencoder_model or not dimred_model:
-                    # NEW: Send flush only once when entering offline mode
-                    if not self._flush_sent:
-                        flush_event = LatentSpaceEvent(
-                            tiled_url="FLUSH_SIGNAL",
-                            feature_vector=[],
-                            index=-1,
-                            autoencoder_model="",
-                            dimred_model="",
-                            experiment_name="",
-                            timestamp=time.time(),
-                        )
-                        await self.publish(flush_event)
-                        self._flush_sent = True
-                        logger.info("Sent flush signal when entering offline mode")
-
-                    logger.info(f"In offline mode - skipping dispatch frame {message.frame_number}")
-                    return None
-                else:
-                    # NEW: Reset flush flag when back in live mode
-                    self._flush_sent = False
-            else:
-                # Model store couldn't be initialized, log a warning but continue processing
-                logger.debug("Redis Model Store not available, proceeding with processing")
-
-            # Existing loading check
-            if hasattr(self.reducer, "is_loading_model") and self.reducer.is_loading_model:
-                loading_type = self.reducer.loading_model_type or "unknown"
-                logger.info(
-                    f"Waiting for {loading_type} model to finish loading before processing frame {message.frame_number}..."
-                )
+            if not await self._ready_for_inference(message):
                 return None
 
             # Record timing information
             start_time = time.time()
 
             # Pass message to reducer with timing information tracking
-            feature_vector, timing_info = await asyncio.to_thread(self.reducer.reduce, message)
+            loop = asyncio.get_running_loop()
+            feature_vector, timing_info = await loop.run_in_executor(self._inference_executor, self.reducer.reduce, message)
 
             # Calculate total processing time
             end_time = time.time()
@@ -126,30 +286,117 @@ class LatentSpaceOperator(Operator):
                 logger.info(f"Skipping frame {message.frame_number} due to processing error or model transition")
                 return None
 
-            # Get the current model names from the reducer
-            current_autoencoder = self.reducer.autoencoder_model_name
-            current_dimred = self.reducer.dimred_model_name
-
-            # NEW: Get experiment name from the reducer
-            experiment_name = self.reducer.experiment_name
-
-            response = LatentSpaceEvent(
-                tiled_url=message.tiled_url,
-                feature_vector=feature_vector[0].tolist(),
-                index=message.frame_number,
-                autoencoder_model=current_autoencoder,  # Add autoencoder model name
-                dimred_model=current_dimred,  # Add dimension reduction model name
-                experiment_name=experiment_name,  # NEW: Add experiment name
-                timestamp=start_time,  # Add start timestamp
-                total_processing_time=total_processing_time,  # Add total processing time
-                autoencoder_time=timing_info.get("autoencoder_time"),  # Add autoencoder processing time
-                dimred_time=timing_info.get("dimred_time"),  # Add dimension reduction processing time
-            )
-            return response
+            return self._latent_event(message, feature_vector, start_time, total_processing_time, timing_info)
         except Exception as e:
             logger.error(f"Error sending message to broker {e}")
             return None
 
+    async def dispatch_frame(self, message: RawFrameEvent) -> list[LatentSpaceEvent]:
+        result = await self.dispatch(message)
+        # Only publish if we got a valid result
+        return [result] if result is not None else []
+
+    async def submit(self, results: Awaitable[list[LatentSpaceEvent]]) -> None:
+        """
+        Publish the results of a dispatch after those of every earlier dispatch. Without
+        pipelining the dispatch is awaited here, otherwise it runs in the background and
+        this only waits while ``max_in_flight`` dispatches are already pending.
+        """
+        if self.max_in_flight <= 1:
+            async with self._batch_lock:
+                for result in await results:
+                    await self.publish(result)
+            return
+        if self._drain_task is None:
+            # The drain loop awaits one dispatch while the queue holds the others
+            self._in_flight = asyncio.Queue(maxsize=max(1, self.max_in_flight - 1))
+            self._drain_task = asyncio.create_task(self._drain_in_flight())
+        await self._in_flight.put(asyncio.ensure_future(results))
+
+    async def _drain_in_flight(self) -> None:
+        while True:
+            task = await self._in_flight.get()
+            try:
+                events = await task
+                async with self._batch_lock:
+                    for result in events:
+                        await self.publish(result)
+            except Exception as e:
+                logger.error(f"Error publishing pipelined results: {e}")
+            finally:
+                self._in_flight.task_done()
+
+    async def wait_in_flight(self) -> None:
+        """Wait until every pipelined dispatch has been published."""
+        if self._in_flight is not None:
+            await self._in_flight.join()
+
+    async def enqueue(self, message: RawFrameEvent) -> None:
+        """Add a frame to the current batch, reducing the batch once it is full."""
+        try:
+            if not await self._ready_for_inference(message):
+                return
+        except Exception as e:
+            logger.error(f"Error checking model state: {e}")
+            return
+        self.pending_frames.append(message)
+        if len(self.pending_frames) >= self.batch_max_frames:
+            await self.flush_frames()
+        elif self._batch_timer is None:
+            self._batch_timer = asyncio.create_task(self._flush_after_wait())
+
+    async def _flush_after_wait(self) -> None:
+        await asyncio.sleep(self.batch_max_wait_ms / 1000)
+        # Cleared before flushing so that a full batch arriving meanwhile does not cancel this flush
+        self._batch_timer = None
+        try:
+            await self.flush_frames()
+        except Exception as e:
+            logger.error(f"Error flushing frame batch: {e}")
+
+    async def flush_frames(self) -> None:
+        """Reduce the pending frames as one batch and publish the results in frame order."""
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        frames = self.pending_frames
+        self.pending_frames = []
+        if not frames:
+            return
+        await self.submit(self.dispatch_batch(frames))
+
+    async def dispatch_batch(self, messages: list[RawFrameEvent]) -> list[LatentSpaceEvent]:
+        try:
+            start_time = time.time()
+            loop = asyncio.get_running_loop()
+            feature_vectors, batch_timing = await loop.run_in_executor(
+                self._inference_executor, self.reducer.reduce_batch, messages
+            )
+            total_processing_time = time.time() - start_time
+        except Exception as e:
+            logger.error(f"Error reducing frame batch: {e}")
+            return []
+
+        count = len(messages)
+        timing_info = {key: batch_timing[key] for key in ("autoencoder_model", "dimred_model") if key in batch_timing}
+        timing_info |= {
+            "batch_size": count,
+            "batch_autoencoder_time": batch_timing.get("autoencoder_time"),
+            "batch_dimred_time": batch_timing.get("dimred_time"),
+        }
+        # Per-frame timings are each frame's share of the batch
+        for key in ("autoencoder_time", "dimred_time"):
+            if batch_timing.get(key) is not None:
+                timing_info[key] = batch_timing[key] / count
+
+        results = []
+        for message, feature_vector in zip(messages, feature_vectors):
+            if feature_vector is None:
+                logger.info(f"Skipping frame {message.frame_number} due to processing error or model transition")
+                continue
+            results.append(self._latent_event(message, feature_vector, start_time, total_processing_time / count, timing_info))
+        return results
+
     @classmethod
     def from_settings(cls, settings, reducer_settings=None):
         # socket.connect(settings.zmq_broker.router_address)
@@ -158,7 +405,24 @@ class LatentSpaceOperator(Operator):
         return cls(reducer)
 
 
-def build_lse_operator(redis_host: str = None, redis_port: int = None) -> LatentSpaceOperator:
+def build_lse_operator(
+    redis_host: str = None,
+    redis_port: int = None,
+    batch_max_frames: int = 1,
+    batch_max_wait_ms: float = 20,
+    dual_run_frames: int = 0,
+    latent_cache_mb: float = 256,
+    latent_spill_dir: str = None,
+    inference: dict = None,
+    prefetch_models: bool = False,
+    workers: int = 1,
+    max_in_flight: int = None,
+) -> LatentSpaceOperator:
+    """
+    With ``workers`` above 1 the models run in that many worker processes. Up to
+    ``max_in_flight`` frames are pipelined (default twice the workers, so a frame is
+    published while the previous one is in the models); 1 handles frames one at a time.
+    """
     # Initialize RedisModelStore instead of direct Redis client
     try:
         redis_host = redis_host or os.getenv("REDIS_HOST", "kvrocks")
@@ -169,5 +433,24 @@ def build_lse_operator(redis_host: str = None, redis_port: int = None) -> Latent
     except Exception as e:
         logger.warning(f"Could not connect to Redis Model Store: {e}")
         redis_model_store = None
-    reducer = LatentSpaceReducer(redis_model_store)
-    return LatentSpaceOperator(reducer, redis_model_store)
+    if workers > 1:
+        reducer_kwargs = {
+            "dual_run_frames": dual_run_frames,
+            "latent_cache_mb": latent_cache_mb,
+            "latent_spill_dir": latent_spill_dir,
+            "inference": inference,
+            "prefetch_models": prefetch_models,
+        }
+        reducer = WorkerPoolReducer(workers, redis_host, redis_port, reducer_kwargs)
+    else:
+        inference_config = InferenceConfig(**inference) if inference else None
+        reducer = LatentSpaceReducer(
+            redis_model_store,
+            dual_run_frames,
+            latent_cache_mb,
+            latent_spill_dir,
+            inference_config,
+            prefetch_models,
+        )
+    max_in_flight = max_in_flight or 2 * workers
+    return LatentSpaceOperator(reducer, redis_model_store, batch_max_frames, batch_max_wait_ms, max_in_flight)
@@ -1,9 +1,11 @@
 import asyncio
+import json
 import logging
+from collections import OrderedDict
 from typing import Union
 
-# import msgpack
-# import numpy as np
+import msgpack
+import numpy as np
 import websockets
 from arroyopy.publisher import Publisher
 
@@ -13,23 +15,57 @@ from .schemas import LatentSpaceEvent
 
 logger = logging.getLogger("arroyo_reduction.publisher")
 
+PROTOCOL_JSON = "json"
+PROTOCOL_BINARY = "binary"
+
 
 class LSEWSResultPublisher(Publisher):
     """
     A publisher class for sending dimensionality reduction information
 
+    Two wire protocols are supported:
+
+    - ``json``: one ``model_dump_json()`` text message per LatentSpaceEvent (default)
+    - ``binary``: msgpack batches of typed arrays, flushed every ``batch_interval_ms``
+      or every ``batch_max_events`` events, whichever comes first. Model and
+      experiment names are dictionary encoded and only sent when a new name appears.
+
+    The start message and the last ``history_size`` latent points of the current run
+    are kept so that a client connecting mid-run receives them as one snapshot.
     """
 
     websocket_server = None
     connected_clients = set()
     current_start_message = None
 
-    def __init__(self, host: str = "localhost", port: int = 8765, path="/lse_operator"):
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 8765,
+        path="/lse_operator",
+        protocol: str = PROTOCOL_JSON,
+        batch_max_events: int = 256,
+        batch_interval_ms: float = 100,
+        history_size: int = 10000,
+    ):
         super().__init__()
+        if protocol not in (PROTOCOL_JSON, PROTOCOL_BINARY):
+            raise ValueError(f"Unknown protocol {protocol}, expected '{PROTOCOL_JSON}' or '{PROTOCOL_BINARY}'")
         self.host = host
         self.port = port
         self.path = path
-        logger.info(f"Initialized LSEWSResultPublisher on {self.host}:{self.port}{self.path}")
+        self.protocol = protocol
+        self.batch_max_events = batch_max_events
+        self.batch_interval_ms = batch_interval_ms
+
+        # Binary protocol state
+        self.pending_events: list[LatentSpaceEvent] = []
+        self.pending_names: dict[str, int] = {}
+        self.name_dictionary = LatentNameDictionary()
+
+        # Late-joiner state, only holds events that have already been sent
+        self.recent_events = RecentLatentEvents(history_size)
+        logger.info(f"Initialized LSEWSResultPublisher on {self.host}:{self.port}{self.path} ({self.protocol})")
 
     async def start(
         self,
@@ -41,9 +77,24 @@ class LSEWSResultPublisher(Publisher):
             self.port,
         )
         logger.info(f"Websocket server started at ws://{self.host}:{self.port}")
-        await server.wait_closed()
+        flush_task = None
+        if self.protocol == PROTOCOL_BINARY:
+            flush_task = asyncio.create_task(self._flush_loop())
+        try:
+            await server.wait_closed()
+        finally:
+            if flush_task is not None:
+                flush_task.cancel()
 
     async def publish(self, message: LatentSpaceEvent) -> None:
+        if isinstance(message, SASStart):
+            self.current_start_message = message
+            self.recent_events.clear()
+        if self.protocol == PROTOCOL_BINARY:
+            await self._publish_binary(message)
+            return
+        if isinstance(message, LatentSpaceEvent) and message.tiled_url != "FLUSH_SIGNAL":
+            self.recent_events.append(message)
         if self.connected_clients:  # Only send if there are clients connected
             asyncio.gather(*(self.publish_ws(client, message) for client in self.connected_clients))
 
@@ -73,11 +124,69 @@ class LSEWSResultPublisher(Publisher):
             )
             await client.send(message.model_dump_json())
 
+    async def _publish_binary(self, message) -> None:
+        if isinstance(message, SASStop):
+            # Make sure the tail of the run reaches the clients
+            await self.flush()
+            return
+
+        if not isinstance(message, LatentSpaceEvent) or message.tiled_url == "FLUSH_SIGNAL":
+            return
+
+        if self.pending_events and len(message.feature_vector) != len(self.pending_events[0].feature_vector):
+            # A batch carries a single coordinate width, e.g. switching from a 2D to a 3D dimred model
+            await self.flush()
+        self.pending_names.update(self.name_dictionary.register([message]))
+        self.pending_events.append(message)
+        if len(self.pending_events) >= self.batch_max_events:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Encode the pending events once and send the batch to every connected client."""
+        if not self.pending_events:
+            return
+        events = self.pending_events
+        new_names = self.pending_names
+        self.pending_events = []
+        self.pending_names = {}
+        self.recent_events.extend(events)
+        # Clients connecting while the batch is packed get these events in their snapshot instead
+        clients = list(self.connected_clients)
+        if not clients:
+            return
+        payload = await asyncio.to_thread(pack_latent_batch, events, self.name_dictionary, new_names)
+        await asyncio.gather(*(client.send(payload) for client in clients), return_exceptions=True)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.batch_interval_ms / 1000)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing latent space batch: {e}")
+
+    def snapshot(self) -> Union[bytes | str]:
+        events = list(self.recent_events)
+        if self.protocol == PROTOCOL_BINARY:
+            return pack_latent_snapshot(self.current_start_message, events, self.name_dictionary)
+        return json.dumps(
+            {
+                "msg_type": "snapshot",
+                "start": self.current_start_message.model_dump() if self.current_start_message else None,
+                "events": [event.model_dump() for event in events],
+            }
+        )
+
     async def websocket_handler(self, websocket):
         logger.info(f"New connection from {websocket.remote_address}")
 
+        # Packed before the client is registered, with no await in between, so the
+        # snapshot is followed by exactly the messages published after it
+        snapshot = self.snapshot() if self.current_start_message or self.recent_events else None
         self.connected_clients.add(websocket)
         try:
+            if snapshot is not None:
+                await websocket.send(snapshot)
             # Keep the connection open and do nothing until the client disconnects
             await websocket.wait_closed()
         finally:
@@ -87,4 +196,143 @@ class LSEWSResultPublisher(Publisher):
 
     @classmethod
     def from_settings(cls, settings: dict) -> "LSEWSResultPublisher":
-        return cls(settings.host, settings.port)
+        return cls(
+            settings.host,
+            settings.port,
+            path=settings.get("path", "/lse_operator"),
+            protocol=settings.get("protocol", PROTOCOL_JSON),
+            batch_max_events=settings.get("batch_max_events", 256),
+            batch_interval_ms=settings.get("batch_interval_ms", 100),
+            history_size=settings.get("history_size", 10000),
+        )
+
+
+class RecentLatentEvents:
+    """
+    The last ``maxlen`` latent points of a run, one per (tiled_url, index). A re-projected
+    point replaces the original in place, so late joiners get each point once with its
+    latest coordinates.
+    """
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self.events: OrderedDict[tuple[str, int], LatentSpaceEvent] = OrderedDict()
+
+    def append(self, event: LatentSpaceEvent) -> None:
+        self.events[(event.tiled_url, event.index)] = event
+        while len(self.events) > self.maxlen:
+            self.events.popitem(last=False)
+
+    def extend(self, events: list[LatentSpaceEvent]) -> None:
+        for event in events:
+            self.append(event)
+
+    def clear(self) -> None:
+        self.events.clear()
+
+    def __iter__(self):
+        return iter(self.events.values())
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+
+class LatentNameDictionary:
+    """
+    Maps model and experiment names to small integer ids for the binary protocol.
+    Ids are never reused, so a client only has to learn each name once.
+    """
+
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+
+    def register(self, events: list[LatentSpaceEvent]) -> dict[str, int]:
+        """Assign ids to names not seen before, returning only the new entries."""
+        new_names = {}
+        for event in events:
+            for name in (event.autoencoder_model, event.dimred_model, event.experiment_name):
+                name = name or ""
+                if name not in self.ids:
+                    self.ids[name] = len(self.ids)
+                    new_names[name] = self.ids[name]
+        return new_names
+
+    def encode(self, names: list) -> bytes:
+        return np.array([self.ids[name or ""] for name in names], dtype="<u2").tobytes()
+
+
+def _float_column(values: list, dtype: str) -> bytes:
+    """Pack optional floats into a little-endian typed array, using NaN for missing values."""
+    return np.array([np.nan if v is None else v for v in values], dtype=dtype).tobytes()
+
+
+def latent_batch(
+    events: list[LatentSpaceEvent],
+    name_dictionary: LatentNameDictionary,
+    new_names: dict[str, int] = None,
+) -> dict:
+    """
+    Build the typed-array columns for a batch of LatentSpaceEvents.
+
+    Coordinates and timings are little-endian float32, the frame index is int32 and
+    the start timestamp is float64 (epoch seconds do not fit in float32). Model and
+    experiment names are uint16 ids into the dictionary; ``dictionary`` only carries
+    the names added since the previous batch. ``reprojected`` is a uint8 flag per point,
+    set for new coordinates of a point already sent (same tiled_url and index) that
+    clients should move rather than add.
+    """
+    # Points from different dimred models can differ in width, only the latest width is kept
+    dim = len(events[-1].feature_vector) if events else 0
+    events = [event for event in events if len(event.feature_vector) == dim]
+    coords = np.array([event.feature_vector for event in events], dtype="<f4")
+    return {
+        "msg_type": "latent_batch",
+        "count": len(events),
+        "dim": dim,
+        "dictionary": new_names or {},
+        "coords": coords.tobytes(),
+        "index": np.array([event.index for event in events], dtype="<i4").tobytes(),
+        "timestamp": _float_column([event.timestamp for event in events], "<f8"),
+        "total_processing_time": _float_column([event.total_processing_time for event in events], "<f4"),
+        "autoencoder_time": _float_column([event.autoencoder_time for event in events], "<f4"),
+        "dimred_time": _float_column([event.dimred_time for event in events], "<f4"),
+        "autoencoder_model": name_dictionary.encode([event.autoencoder_model for event in events]),
+        "dimred_model": name_dictionary.encode([event.dimred_model for event in events]),
+        "experiment_name": name_dictionary.encode([event.experiment_name for event in events]),
+        "tiled_url": [event.tiled_url for event in events],
+        "reprojected": np.array([event.reprojected for event in events], dtype="u1").tobytes(),
+    }
+
+
+def pack_latent_batch(
+    events: list[LatentSpaceEvent],
+    name_dictionary: LatentNameDictionary,
+    new_names: dict[str, int] = None,
+) -> bytes:
+    """
+    Pack a batch of LatentSpaceEvents into a single msgpack message of typed arrays.
+    """
+    try:
+        return msgpack.packb(latent_batch(events, name_dictionary, new_names), use_bin_type=True)
+    except Exception as e:
+        logger.error(f"Error packing latent space batch: {e}")
+        raise e
+
+
+def pack_latent_snapshot(start: SASStart, events: list[LatentSpaceEvent], name_dictionary: LatentNameDictionary) -> bytes:
+    """
+    Pack the current run for a newly connected client: the start message, the recent
+    points as one latent batch and the full name dictionary.
+    """
+    try:
+        return msgpack.packb(
+            {
+                "msg_type": "snapshot",
+                "start": start.model_dump() if start else None,
+                "latent": latent_batch(events, name_dictionary, dict(name_dictionary.ids)),
+            },
+            use_bin_type=True,
+        )
+    except Exception as e:
+        logger.error(f"Error packing latent space snapshot: {e}")
+        raise e
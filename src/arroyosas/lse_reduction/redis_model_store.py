@@ -250,12 +250,14 @@ class RedisModelStore:
             logger.error(f"Error publishing model update to Redis: {e}")
             return False
 
-    def subscribe_to_model_updates(self, callback):
+    def subscribe_to_model_updates(self, callback, on_subscribe=None):
         """
         Subscribe to model update notifications from Redis
 
         Args:
             callback: Function to call when a model update is received
+            on_subscribe: Optional function called each time the channel is (re)subscribed,
+                so state mirrored from Redis can be reloaded after missed updates
         """
         if self.redis_client is None:
             logger.warning("Redis client not available for subscribing to model updates")
@@ -270,6 +272,11 @@ class RedisModelStore:
                     pubsub = redis_client.pubsub()
                     pubsub.subscribe(self.CHANNEL_MODEL_UPDATES)
                     logger.info(f"Subscribed to channel: {self.CHANNEL_MODEL_UPDATES}")
+                    if on_subscribe is not None:
+                        try:
+                            on_subscribe()
+                        except Exception as e:
+                            logger.error(f"Error in model update subscribe callback: {e}")
 
                     # Listen for messages
                     for message in pubsub.listen():
@@ -1,6 +1,9 @@
+import copy
 import logging
 import os
+import threading
 import time
+import weakref
 from abc import ABC, abstractmethod
 
 import numpy as np
@@ -9,6 +12,8 @@ import torch
 
 from arroyosas.schemas import RawFrameEvent
 
+from .inference import InferenceConfig, configure_threads, inference_context, optimize_model
+from .latent_cache import LatentCache
 from .mlflow_utils import MLflowClient
 from .redis_model_store import RedisModelStore
 
@@ -40,6 +45,9 @@ class Reducer(ABC):
     latent space, and saving the latent space to a Tiled dataset.
     """
 
+    # Calls to reduce / reduce_batch that may run at the same time
+    max_concurrency = 1
+
     @abstractmethod
     def reduce(self, message: RawFrameEvent) -> tuple[np.ndarray, dict]:
         """
@@ -48,19 +56,104 @@ class Reducer(ABC):
         """
         pass
 
+    def reduce_batch(self, messages: list[RawFrameEvent]) -> tuple[list[np.ndarray], dict]:
+        """
+        Reduce several images, returning one feature vector (or None) per image and the
+        timing of the whole batch. The default runs ``reduce`` frame by frame.
+        """
+        timing_info = {"autoencoder_time": 0.0, "dimred_time": 0.0, "batch_size": len(messages)}
+        feature_vectors = []
+        for message in messages:
+            f_vec, frame_timing = self.reduce(message)
+            feature_vectors.append(f_vec)
+            for key in ("autoencoder_time", "dimred_time"):
+                timing_info[key] += frame_timing.get(key) or 0.0
+            for key in ("autoencoder_model", "dimred_model"):
+                if key in frame_timing:
+                    timing_info[key] = frame_timing[key]
+        return feature_vectors, timing_info
+
+    def start_run(self):
+        """Called when a new run starts, before its first frame."""
+        pass
+
+    def reproject(self) -> tuple[list[tuple[str, int]], np.ndarray, dict]:
+        """
+        Re-project the frames of the current run through the current dimred model.
+        Returns the (tiled_url, index) keys, their coordinates and timing information.
+        Reducers without a latent cache have nothing to re-project.
+        """
+        return [], None, {}
+
+
+class ModelCandidate:
+    """A loaded model running alongside the current one until it has seen ``remaining`` frames."""
+
+    def __init__(self, model_type: str, model, model_id: str, remaining: int):
+        self.model_type = model_type
+        self.model = model
+        self.model_id = model_id
+        self.remaining = remaining
+
 
 class LatentSpaceReducer(Reducer):
     """
     Responsible for taking an image, encoding it into a
     latent space, and reducing it to 2D
+
+    Model updates are loaded and warmed up on the listener thread while the current
+    models keep serving frames, then swapped in under a lock. With ``dual_run_frames``
+    set, the new model first runs alongside the current one for that many frames and
+    the difference between their outputs is logged before the swap.
+
+    Latent features of the current run are cached (spilling to a float32 memmap past
+    ``latent_cache_mb``) so that a dimred model change can re-project the whole run in
+    one ``predict``. ``on_model_swap(model_type, model_id)`` is called after each swap.
+
+    ``inference_config`` sets the torch thread pools and inference mode. With an optimizing
+    backend, each autoencoder is converted in the background after its first frame and
+    used as is until then.
+
+    Served models are only ever run by the inference calls. A new model is warmed up
+    before it is published under ``_swap_lock``, and the optimizer converts a private
+    copy of the autoencoder that replaces the served one under the lock once it is ready.
     """
 
-    def __init__(self, redis_model_store: RedisModelStore):
+    def __init__(
+        self,
+        redis_model_store: RedisModelStore,
+        dual_run_frames: int = 0,
+        latent_cache_mb: float = 256,
+        latent_spill_dir: str = None,
+        inference_config: InferenceConfig = None,
+        prefetch_models: bool = False,
+    ):
         """Initialize the reducer with models from Redis"""
         # Initialize model loading status flags
         self.is_loading_model = False
         self.loading_model_type = None
 
+        # Hot swap state, models and their names only change together under the lock
+        self.dual_run_frames = dual_run_frames
+        self._swap_lock = threading.Lock()
+        self._candidate: ModelCandidate = None
+        self._last_frame: np.ndarray = None
+        self._last_latent: np.ndarray = None
+        self.on_model_swap = None
+
+        # Latent features of the current run
+        self.latent_cache = LatentCache(latent_cache_mb, latent_spill_dir)
+
+        # CPU inference settings, autoencoders already optimized (or being optimized)
+        # and the optimized copy of each loaded autoencoder
+        self.inference_config = inference_config or InferenceConfig()
+        configure_threads(self.inference_config)
+        self._optimized = weakref.WeakSet()
+        self._optimized_copies = weakref.WeakKeyDictionary()
+
+        # Models that do not return one row per frame of a stacked batch
+        self._unbatchable = weakref.WeakSet()
+
         # Initialize Redis model store
         self.redis_model_store = redis_model_store
 
@@ -108,21 +201,26 @@ class LatentSpaceReducer(Reducer):
         finally:
             # Reset loading flags
             self._update_loading_state(False)
+        self._pin_active_models()
+        if prefetch_models:
+            mlflow_client.prefetch_live_models()
 
         # Subscribe to model update channel if supported
         self._subscribe_to_model_updates()
 
-    def _update_loading_state(self, is_loading, model_type=None):
+    def _update_loading_state(self, is_loading, model_type=None, blocking=True):
         """
         Update loading state both locally and in Redis
 
         Args:
             is_loading (bool): Whether models are currently loading
             model_type (str, optional): Type of model being loaded if is_loading=True
+            blocking (bool): Whether frames have to wait for the load. Background loads
+                are only reported in Redis.
         """
         # Update local state
-        self.is_loading_model = is_loading
-        self.loading_model_type = model_type if is_loading else None
+        self.is_loading_model = is_loading and blocking
+        self.loading_model_type = model_type if self.is_loading_model else None
 
         # Update Redis state
         try:
@@ -145,9 +243,14 @@ class LatentSpaceReducer(Reducer):
             # Return a placeholder while models are loading
             return None, timing_info
 
+        autoencoder, autoencoder_name, dimred, dimred_name = self._active_models()
+        timing_info["autoencoder_model"] = autoencoder_name
+        timing_info["dimred_model"] = dimred_name
+
         try:
             # Get numpy array from message
             img_array = message.image.array
+            self._last_frame = img_array
 
             # Additional debugging for the image data
             logger.info(
@@ -164,12 +267,16 @@ class LatentSpaceReducer(Reducer):
             autoencoder_start = time.time()
 
             # Pass numpy array directly to model, the predict() API will handle data preprocessing
-            autoencoder_result = self.current_torch_model.predict(img_array)
+            with inference_context(self.inference_config):
+                autoencoder_result = autoencoder.predict(img_array)
             latent_features = autoencoder_result["latent_features"]
 
             # End timing autoencoder processing
             autoencoder_end = time.time()
             timing_info["autoencoder_time"] = autoencoder_end - autoencoder_start
+            self.latent_cache.add(autoencoder_name, [(message.tiled_url, message.frame_number)], latent_features)
+            self._last_latent = latent_features[-1:]
+            self._optimize_in_background(autoencoder, autoencoder_name, img_array)
 
             logger.info(
                 f"Latent features shape: {latent_features.shape}, processing time: {timing_info['autoencoder_time']:.4f}s"
@@ -184,7 +291,8 @@ class LatentSpaceReducer(Reducer):
             # Start timing dimension reduction processing
             dimred_start = time.time()
 
-            dimred_result = self.current_dim_reduction_model.predict(latent_features)
+            with inference_context(self.inference_config):
+                dimred_result = dimred.predict(latent_features)
             f_vec = dimred_result["coords"]
 
             # End timing dimension reduction processing
@@ -192,12 +300,245 @@ class LatentSpaceReducer(Reducer):
             timing_info["dimred_time"] = dimred_end - dimred_start
 
             logger.info(f"Feature vector shape: {f_vec.shape}, processing time: {timing_info['dimred_time']:.4f}s")
-
-            return f_vec, timing_info
         except Exception as e:
             logger.error(f"Error in dimension reduction: {e}")
             return None, timing_info
 
+        self._dual_run(img_array, latent_features, f_vec)
+        return f_vec, timing_info
+
+    def reduce_batch(self, messages: list[RawFrameEvent]) -> tuple[list[np.ndarray], dict]:
+        """
+        Run each model once on the stacked frames and split the result back per frame.
+
+        Frames of different shapes, or a batch a model fails on, fall back to frame-by-frame
+        reduction. Models that do not return one row per frame are remembered and always
+        run frame by frame.
+        """
+        timing_info = {"autoencoder_time": None, "dimred_time": None, "batch_size": len(messages)}
+
+        if self.is_loading_model:
+            logger.info(f"Waiting for {self.loading_model_type} model to finish loading...")
+            return [None] * len(messages), timing_info
+
+        if len(messages) == 1 or len({message.image.array.shape for message in messages}) > 1:
+            return super().reduce_batch(messages)
+
+        autoencoder, autoencoder_name, dimred, dimred_name = self._active_models()
+        if autoencoder in self._unbatchable or dimred in self._unbatchable:
+            return super().reduce_batch(messages)
+        timing_info["autoencoder_model"] = autoencoder_name
+        timing_info["dimred_model"] = dimred_name
+
+        try:
+            img_batch = np.stack([message.image.array for message in messages])
+            self._last_frame = messages[-1].image.array
+            logger.debug(f"Get input batch shape: {img_batch.shape}, dtype: {img_batch.dtype}")
+        except Exception as e:
+            logger.error(f"Error in image preparation: {e}")
+            return [None] * len(messages), timing_info
+
+        try:
+            autoencoder_start = time.time()
+            with inference_context(self.inference_config):
+                latent_features = autoencoder.predict(img_batch)["latent_features"]
+            timing_info["autoencoder_time"] = time.time() - autoencoder_start
+        except Exception as e:
+            logger.error(f"Error in batched autoencoder processing, reducing frame by frame: {e}")
+            return super().reduce_batch(messages)
+
+        if len(latent_features) != len(messages):
+            logger.warning(
+                f"Autoencoder {autoencoder_name} returned {len(latent_features)} rows for {len(messages)} frames, "
+                "reducing frame by frame from now on"
+            )
+            self._unbatchable.add(autoencoder)
+            return super().reduce_batch(messages)
+        self.latent_cache.add(
+            autoencoder_name, [(message.tiled_url, message.frame_number) for message in messages], latent_features
+        )
+        self._last_latent = latent_features[-1:]
+        self._optimize_in_background(autoencoder, autoencoder_name, messages[-1].image.array)
+
+        try:
+            dimred_start = time.time()
+            with inference_context(self.inference_config):
+                f_vecs = dimred.predict(latent_features)["coords"]
+            timing_info["dimred_time"] = time.time() - dimred_start
+        except Exception as e:
+            logger.error(f"Error in batched dimension reduction, reducing frame by frame: {e}")
+            return super().reduce_batch(messages)
+
+        if len(f_vecs) != len(messages):
+            logger.warning(
+                f"Dimred model {dimred_name} returned {len(f_vecs)} rows for {len(messages)} frames, "
+                "reducing frame by frame from now on"
+            )
+            self._unbatchable.add(dimred)
+            return super().reduce_batch(messages)
+
+        logger.info(
+            f"Reduced batch of {len(messages)} frames, autoencoder: {timing_info['autoencoder_time']:.4f}s, "
+            f"dimred: {timing_info['dimred_time']:.4f}s"
+        )
+        self._dual_run(img_batch, latent_features, f_vecs)
+        # Keep the (1, dim) shape of the single frame path
+        return [f_vecs[i : i + 1] for i in range(len(messages))], timing_info
+
+    def start_run(self):
+        self.latent_cache.clear()
+
+    def _optimize_in_background(self, model, model_id: str, frame: np.ndarray):
+        """
+        Optimize each autoencoder once, using the first frame it reduced to trace it.
+
+        The copy is taken here, on the inference thread that just ran the model, so the
+        optimizer thread never calls or modifies a model that serves frames.
+        """
+        if not self.inference_config.optimizes or model in self._optimized:
+            return
+        self._optimized.add(model)
+        try:
+            private_model = copy.deepcopy(model)
+        except Exception as e:
+            logger.error(f"Error copying {model_id} for optimization, keeping the pyfunc model: {e}")
+            return
+        self._optimized.add(private_model)
+        threading.Thread(target=self._optimize, args=(model, private_model, model_id, np.array(frame)), daemon=True).start()
+
+    def _optimize(self, model, private_model, model_id: str, frame: np.ndarray):
+        """Optimize the private copy of ``model`` and serve it in place of ``model`` if that is still in use."""
+        try:
+            if not optimize_model(private_model, frame, self.inference_config, model_id, self.mlflow_client.cache_dir):
+                return
+        except Exception as e:
+            logger.error(f"Error optimizing {model_id}, keeping the pyfunc model: {e}")
+            return
+        self._optimized_copies[model] = private_model
+        with self._swap_lock:
+            if self.current_torch_model is model:
+                self.current_torch_model = private_model
+            elif self._candidate is not None and self._candidate.model is model:
+                self._candidate.model = private_model
+            else:
+                return
+        logger.info(f"Serving the optimized {model_id}")
+
+    def reproject(self) -> tuple[list[tuple[str, int]], np.ndarray, dict]:
+        autoencoder, autoencoder_name, dimred, dimred_name = self._active_models()
+        keys, latents = self.latent_cache.get(autoencoder_name)
+        if not keys:
+            return [], None, {}
+        dimred_start = time.time()
+        coords = dimred.predict(latents)["coords"]
+        timing_info = {
+            "dimred_time": time.time() - dimred_start,
+            "batch_size": len(keys),
+            "autoencoder_model": autoencoder_name,
+            "dimred_model": dimred_name,
+        }
+        logger.info(f"Re-projected {len(keys)} cached latents with {dimred_name} in {timing_info['dimred_time']:.4f}s")
+        return keys, coords, timing_info
+
+    def _active_models(self) -> tuple:
+        """The current (autoencoder, name, dimred, name), read together so a swap can not split them."""
+        with self._swap_lock:
+            return (
+                self.current_torch_model,
+                self.autoencoder_model_name,
+                self.current_dim_reduction_model,
+                self.dimred_model_name,
+            )
+
+    def _pin_active_models(self):
+        """Keep the served models, and a dual run candidate, out of reach of the model cache eviction."""
+        candidate = self._candidate
+        self.mlflow_client.pin_models(
+            [self.autoencoder_model_name, self.dimred_model_name, candidate.model_id if candidate else None]
+        )
+
+    def _swap_model(self, model_type: str, model, model_id: str):
+        with self._swap_lock:
+            if model_type == "autoencoder":
+                self.current_torch_model = model
+                self.autoencoder_model_name = model_id
+            else:
+                self.current_dim_reduction_model = model
+                self.dimred_model_name = model_id
+        logger.info(f"Swapped in new {model_type} model: {model_id}")
+        self._pin_active_models()
+        if self.on_model_swap is not None:
+            try:
+                self.on_model_swap(model_type, model_id)
+            except Exception as e:
+                logger.error(f"Error in model swap callback: {e}")
+
+    def _in_use(self, model) -> bool:
+        """Whether the inference calls may be running ``model``, as a served model or the dual run candidate."""
+        with self._swap_lock:
+            candidate = self._candidate
+            return (
+                model is self.current_torch_model
+                or model is self.current_dim_reduction_model
+                or (candidate is not None and model is candidate.model)
+            )
+
+    def _warm_up(self, model_type: str, model):
+        """
+        Run a freshly loaded model on the last frame (a dimred model on its latent features)
+        so its first-call costs are paid before it serves. Only the new model runs here,
+        models the inference calls may be using are left alone.
+        """
+        sample = self._last_frame if model_type == "autoencoder" else self._last_latent
+        if sample is None or self._in_use(model):
+            return
+        try:
+            warm_up_start = time.time()
+            model.predict(sample)
+            logger.info(f"Warmed up new {model_type} model in {time.time() - warm_up_start:.4f}s")
+        except Exception as e:
+            # e.g. a dimred model selected before its matching autoencoder, swap it in anyway
+            logger.warning(f"Warm-up of new {model_type} model failed: {e}")
+
+    def _dual_run(self, images: np.ndarray, latent_features: np.ndarray, coords: np.ndarray):
+        """Run the candidate model on the same input as the current one, swapping it in once it has seen enough frames."""
+        candidate = self._candidate
+        if candidate is None:
+            return
+        try:
+            candidate_start = time.time()
+            if candidate.model_type == "autoencoder":
+                current = latent_features
+                output = candidate.model.predict(images)["latent_features"]
+            else:
+                current = coords
+                output = candidate.model.predict(latent_features)["coords"]
+            candidate_time = time.time() - candidate_start
+        except Exception as e:
+            logger.error(f"Candidate {candidate.model_type} model {candidate.model_id} failed, keeping the current one: {e}")
+            with self._swap_lock:
+                if self._candidate is candidate:
+                    self._candidate = None
+            return
+
+        output, current = np.asarray(output), np.asarray(current)
+        if output.shape == current.shape:
+            logger.info(
+                f"Dual run {candidate.model_id}: max abs difference {np.max(np.abs(output - current)):.4g}, "
+                f"candidate time {candidate_time:.4f}s"
+            )
+        else:
+            logger.info(f"Dual run {candidate.model_id}: output shape {output.shape} vs current {current.shape}")
+
+        candidate.remaining -= len(coords)
+        if candidate.remaining > 0:
+            return
+        with self._swap_lock:
+            if self._candidate is not candidate:
+                return
+            self._candidate = None
+        self._swap_model(candidate.model_type, candidate.model, candidate.model_id)
+
     def _subscribe_to_model_updates(self):
         """
         Subscribe to model update notifications through Redis PubSub
@@ -243,6 +584,9 @@ class LatentSpaceReducer(Reducer):
     def _handle_model_update(self, update):
         """Handle a model update from Redis PubSub with version support"""
         try:
+            # Registry metadata (versions, tags, params) may have changed with the update
+            self.mlflow_client.invalidate_metadata()
+
             # NEW: Check if this is an experiment name update
             if update.get("update_type") == "experiment_name":
                 new_experiment_name = update.get("experiment_name")
@@ -292,44 +636,35 @@ class LatentSpaceReducer(Reducer):
 
             logger.info(f"Received model update: {model_type} = {model_id}")
 
-            # Set loading flags
-            self._update_loading_state(True, model_type)
+            if model_type not in ("autoencoder", "dimred"):
+                logger.warning(f"Unknown model type: {model_type}")
+                return
+
+            # Report the load, the current model keeps serving frames meanwhile
+            self._update_loading_state(True, model_type, blocking=False)
 
             try:
-                # Update the appropriate model
-                if model_type == "autoencoder":
-                    logger.info(f"Loading new autoencoder model: {model_id}...")
-                    # DON'T update name yet - wait until model is loaded
-                    # self.autoencoder_model_name = model_id  # ← REMOVE THIS
-
-                    # Load model with version if specified
-                    if model_version:
-                        new_model = self.mlflow_client.load_model(model_name, version=model_version)
-                    else:
-                        new_model = self.mlflow_client.load_model(model_name)
-
-                    # Only update name AFTER successful load
-                    self.current_torch_model = new_model
-                    self.autoencoder_model_name = model_id  # ← MOVE HERE
-                    logger.info(f"Successfully loaded new autoencoder model: {model_id}")
-
-                elif model_type == "dimred":
-                    logger.info(f"Loading new dimension reduction model: {model_id}...")
-                    # DON'T update name yet - wait until model is loaded
-                    # self.dimred_model_name = model_id  # ← REMOVE THIS
-
-                    # Load model with version if specified
-                    if model_version:
-                        new_model = self.mlflow_client.load_model(model_name, version=model_version)
-                    else:
-                        new_model = self.mlflow_client.load_model(model_name)
-
-                    # Only update name AFTER successful load
-                    self.current_dim_reduction_model = new_model
-                    self.dimred_model_name = model_id  # ← MOVE HERE
-                    logger.info(f"Successfully loaded new dimension reduction model: {model_id}")
+                logger.info(f"Loading new {model_type} model in the background: {model_id}...")
+
+                # Load model with version if specified
+                if model_version:
+                    new_model = self.mlflow_client.load_model(model_name, version=model_version)
+                else:
+                    new_model = self.mlflow_client.load_model(model_name)
+                # An autoencoder optimized while it served before comes back optimized
+                new_model = self._optimized_copies.get(new_model, new_model)
+                self._warm_up(model_type, new_model)
+
+                # Only update name AFTER successful load
+                if self.dual_run_frames > 0:
+                    with self._swap_lock:
+                        self._candidate = ModelCandidate(model_type, new_model, model_id, self.dual_run_frames)
+                    self._pin_active_models()
+                    logger.info(
+                        f"Running {model_id} alongside the current {model_type} model for {self.dual_run_frames} frames"
+                    )
                 else:
-                    logger.warning(f"Unknown model type: {model_type}")
+                    self._swap_model(model_type, new_model, model_id)
             finally:
                 # Reset loading flags
                 self._update_loading_state(False)
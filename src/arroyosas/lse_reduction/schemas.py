@@ -41,3 +41,7 @@ class LatentSpaceEvent(Event):
     total_processing_time: float = None  # Total time to process the frame
     autoencoder_time: float = None  # Time spent in autoencoder processing
     dimred_time: float = None  # Time spent in dimension reduction processing
+    batch_size: int | None = None  # Number of frames inferred together with this one
+    batch_autoencoder_time: float | None = None  # Autoencoder time for the whole batch
+    batch_dimred_time: float | None = None  # Dimension reduction time for the whole batch
+    reprojected: bool = False  # Re-sent with a new dimred model's coordinates, a view update only
@@ -0,0 +1,116 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from .schemas import LatentSpaceEvent
+
+# Columns of the feature_vectors table, in order
+TEXT_COLUMNS = ("tiled_url", "autoencoder_model", "dimred_model")
+NUMERIC_COLUMNS = ("timestamp", "total_processing_time", "autoencoder_time", "dimred_time")
+# Row of the frame's full vector in the UUID's vector array
+ROW_COLUMN = "vector_row"
+# Leading vector elements stored as feature_{i} columns
+MAX_FEATURE_COLUMNS = 20
+
+
+def _column_type(name: str) -> pa.DataType:
+    if name in TEXT_COLUMNS:
+        return pa.string()
+    if name == ROW_COLUMN:
+        return pa.int64()
+    return pa.float64()
+
+
+def table_schema(columns) -> pa.Schema:
+    """Arrow schema of a feature_vectors table: strings for text columns, int64 row links, float64 otherwise."""
+    return pa.schema([(name, _column_type(name)) for name in columns])
+
+
+class LatentTableBuffer:
+    """
+    Rows of a feature_vectors table, kept column by column until they are written.
+
+    Numeric columns, the leading feature elements and the full float32 vectors live in
+    preallocated numpy arrays that double when full, with NaN for missing values, so
+    appending a row costs the same at frame 10 and frame 100000. A row without a timestamp
+    gets the time it was appended. The DataFrame is only built by ``to_dataframe``.
+
+    ``first_row`` is the position of the buffer's first row among all rows written for the
+    UUID, so each row's ``vector_row`` is its row in the UUID's vector array.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self.size = 0
+        self.first_row = 0
+        self.text = {name: [] for name in TEXT_COLUMNS}
+        self.numeric = np.full((capacity, len(NUMERIC_COLUMNS)), np.nan, dtype=np.float64)
+        self.features = np.full((capacity, 0), np.nan, dtype=np.float32)
+        self.vectors = np.full((capacity, 0), np.nan, dtype=np.float32)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def empty(self) -> bool:
+        return self.size == 0
+
+    def append(self, message: LatentSpaceEvent, vector: np.ndarray):
+        if self.size == len(self.numeric):
+            self._grow(2 * len(self.numeric), self.vectors.shape[1])
+        if len(vector) > self.vectors.shape[1]:
+            self._grow(len(self.numeric), len(vector))
+        width = min(len(vector), MAX_FEATURE_COLUMNS)
+
+        row = self.size
+        for name in TEXT_COLUMNS:
+            self.text[name].append(getattr(message, name, None))
+        for column, name in enumerate(NUMERIC_COLUMNS):
+            value = getattr(message, name, None)
+            if value is None and name == "timestamp":
+                value = time.time()
+            self.numeric[row, column] = np.nan if value is None else value
+        self.features[row, :width] = vector[:width]
+        self.vectors[row, : len(vector)] = vector
+        self.size += 1
+
+    def _grow(self, capacity: int, width: int):
+        numeric = np.full((capacity, len(NUMERIC_COLUMNS)), np.nan, dtype=np.float64)
+        numeric[: self.size] = self.numeric[: self.size]
+        vectors = np.full((capacity, width), np.nan, dtype=np.float32)
+        vectors[: self.size, : self.vectors.shape[1]] = self.vectors[: self.size]
+        features = np.full((capacity, min(width, MAX_FEATURE_COLUMNS)), np.nan, dtype=np.float32)
+        features[: self.size, : self.features.shape[1]] = self.features[: self.size]
+        self.numeric = numeric
+        self.vectors = vectors
+        self.features = features
+
+    def vector_array(self, width: int = None) -> np.ndarray:
+        """The buffered vectors as a (rows, width) float32 array, NaN padded or truncated to width."""
+        vectors = self.vectors[: self.size]
+        if width is None or width == vectors.shape[1]:
+            return vectors.copy()
+        resized = np.full((self.size, width), np.nan, dtype=np.float32)
+        common = min(width, vectors.shape[1])
+        resized[:, :common] = vectors[:, :common]
+        return resized
+
+    def to_dataframe(self) -> pd.DataFrame:
+        columns = {name: values for name, values in self.text.items()}
+        for column, name in enumerate(NUMERIC_COLUMNS):
+            columns[name] = self.numeric[: self.size, column]
+        columns[ROW_COLUMN] = np.arange(self.first_row, self.first_row + self.size, dtype=np.int64)
+        for i in range(self.features.shape[1]):
+            columns[f"feature_{i}"] = self.features[: self.size, i].astype(np.float64)
+        return pd.DataFrame(columns)
+
+    def clear(self):
+        """Drop the buffered rows once written, the next row continuing the UUID's row count."""
+        self.first_row += self.size
+        self.size = 0
+        for values in self.text.values():
+            values.clear()
+        self.numeric[:] = np.nan
+        self.features = np.full((len(self.numeric), 0), np.nan, dtype=np.float32)
+        self.vectors = np.full((len(self.numeric), 0), np.nan, dtype=np.float32)
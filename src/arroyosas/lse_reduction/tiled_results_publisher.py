@@ -2,18 +2,20 @@ import asyncio
 import logging
 import os
 import re
+import threading
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import numpy as np
-import pandas as pd
 import pytz
 from arroyopy.publisher import Publisher
 from tiled.client import from_uri
 
 from arroyosas.schemas import SASStop
+from arroyosas.tiled.spool import OP_APPEND, OP_ROWS, OP_TABLE, SpoolEntry, TiledSpool, ensure_container, write_rows
 
 from .schemas import LatentSpaceEvent
+from .table_buffer import ROW_COLUMN, LatentTableBuffer, table_schema
 
 logger = logging.getLogger("arroyo_reduction.tiled_results_publisher")
 
@@ -26,12 +28,153 @@ RESULTS_TILED_API_KEY = os.getenv("RESULTS_TILED_API_KEY", "")
 CALIFORNIA_TZ = pytz.timezone("US/Pacific")
 # Regex pattern to extract UUID from tiled_url
 UUID_PATTERN = r"([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})"
+# Key of the full-width vector array next to each UUID's feature_vectors table
+VECTOR_ARRAY_KEY = "feature_vector_array"
+
+
+class TiledNodeIndex:
+    """
+    Local record of the Tiled nodes below the day container, keyed by path tuples such as
+    ``(experiment, uuid)``. Nodes the publisher created are added directly; other paths are
+    looked up in Tiled once, including when they are missing. Everything is forgotten every
+    ``refresh_s`` seconds so that nodes written by other clients are eventually seen.
+    """
+
+    def __init__(self, refresh_s: float = 300):
+        self.refresh_s = refresh_s
+        self.nodes = {}
+        self.refreshed = time.monotonic()
+
+    def refresh_if_due(self):
+        if time.monotonic() - self.refreshed >= self.refresh_s:
+            logger.debug(f"Refreshing Tiled node index ({len(self.nodes)} entries)")
+            self.clear()
+
+    def clear(self):
+        self.nodes = {}
+        self.refreshed = time.monotonic()
+
+    def child(self, parent, path: tuple):
+        """The node at path (its last element being its key in parent), or None if it does not exist."""
+        if path not in self.nodes:
+            key = path[-1]
+            self.nodes[path] = parent[key] if key in parent else None
+        return self.nodes[path]
+
+    def contains(self, parent, path: tuple) -> bool:
+        """Whether path exists, without fetching the node itself."""
+        if path not in self.nodes:
+            self.nodes[path] = True if path[-1] in parent else None
+        return self.nodes[path] is not None
+
+    def add(self, path: tuple, node=True):
+        self.nodes[path] = node
+
+
+class DayContainerCache:
+    """
+    The Year/Month/Day containers below the root container, cached by path tuple such as
+    ``("2025", "06", "01")`` so that each is looked up, or created, once. The cache keeps
+    the ``keep_days`` most recent days.
+
+    ``next_day_due`` says when to resolve the next day's containers ahead of time: within
+    ``prefetch_s`` seconds of midnight, and at most once every ``retry_s`` seconds while
+    resolving them fails.
+    """
+
+    def __init__(self, root_container, tz=CALIFORNIA_TZ, prefetch_s: float = 600, retry_s: float = 60, keep_days=3):
+        self.root_container = root_container
+        self.tz = tz
+        self.prefetch_s = prefetch_s
+        self.retry_s = retry_s
+        self.keep_days = keep_days
+        self.nodes = {}
+        self.attempted = {}
+        # Held while resolving, so a prefetch and the rollover never both create a container
+        self._lock = threading.RLock()
+
+    def day_key(self, when=None) -> tuple:
+        """The path of the day container of when (a datetime or date), by default today."""
+        when = when or datetime.now(self.tz)
+        return (str(when.year), f"{when.month:02d}", f"{when.day:02d}")
+
+    def get(self, key: tuple):
+        """The container at key, a year, month or day path, creating missing containers on the way."""
+        with self._lock:
+            if key in self.nodes:
+                return self.nodes[key]
+            parent = self.root_container if len(key) == 1 else self.get(key[:-1])
+            name = key[-1]
+            level = ("year", "month", "day")[len(key) - 1]
+            if name not in parent:
+                logger.info(f"Creating {level} container: {name}")
+                parent.create_container(name)
+            else:
+                logger.info(f"Using existing {level} container: {name}")
+            self.nodes[key] = parent[name]
+            days = sorted(path for path in self.nodes if len(path) == 3)
+            for path in days[: -self.keep_days]:
+                del self.nodes[path]
+            return self.nodes[key]
+
+    def next_day_due(self, now: datetime = None) -> tuple:
+        """The path of tomorrow's day container if it should be resolved now, else None."""
+        now = now or datetime.now(self.tz)
+        tomorrow = now.date() + timedelta(days=1)
+        key = self.day_key(tomorrow)
+        if key in self.nodes:
+            return None
+        midnight = self.tz.localize(datetime.combine(tomorrow, datetime.min.time()))
+        if (midnight - now).total_seconds() > self.prefetch_s:
+            return None
+        if time.monotonic() - self.attempted.get(key, -self.retry_s) < self.retry_s:
+            return None
+        self.attempted[key] = time.monotonic()
+        return key
 
 
 class TiledResultsPublisher(Publisher):
-    """Publisher that saves latent space vectors to a Tiled server."""
-
-    def __init__(self, tiled_uri=None, tiled_api_key=None, root_segments=None, tiled_prefix=None):
+    """
+    Publisher that saves latent space vectors to a Tiled server.
+
+    By default a UUID's vectors are written as one table when the UUID changes, on the
+    flush signal or at SASStop. With ``stream_rows`` set, the ``feature_vectors`` table is
+    created as an appendable table on the first write and a partition is appended every
+    ``stream_rows`` rows or ``stream_interval_s`` seconds, so the run is visible and
+    durable while it is acquired and only the unwritten rows are held in memory.
+
+    The table only keeps the first 20 vector elements as ``feature_{i}`` columns. Full
+    vectors go to a 2D float32 ``feature_vector_array`` node in the UUID container, one row
+    per frame, created on the first write and extended by every later one. The table's
+    ``vector_row`` column is the row of each frame's vector in that array.
+
+    The experiment, UUID and table nodes are tracked in a local TiledNodeIndex, so
+    publishing a vector normally makes no request to Tiled; the index is refreshed every
+    ``index_refresh_s`` seconds.
+
+    Vectors go to the day container of the day their UUID started. Day containers are
+    resolved through a DayContainerCache, which creates the next day's containers in the
+    background during the last ``day_prefetch_s`` seconds before midnight. The publisher
+    moves to the new day at the first UUID that has nothing written to the previous one.
+
+    With ``spool_path`` set, vectors keep being buffered while Tiled is unreachable and
+    writes that fail are kept in a TiledSpool at that path, then replayed in order,
+    ``replay_rate`` per second, once Tiled is back.
+    """
+
+    def __init__(
+        self,
+        tiled_uri=None,
+        tiled_api_key=None,
+        root_segments=None,
+        tiled_prefix=None,
+        stream_rows: int = None,
+        stream_interval_s: float = 10,
+        index_refresh_s: float = 300,
+        spool_path: str = None,
+        replay_rate: float = 20,
+        day_prefetch_s: float = 600,
+    ):
         super().__init__()
         self.tiled_uri = tiled_uri or RESULTS_TILED_URI
         self.tiled_api_key = tiled_api_key or RESULTS_TILED_API_KEY
@@ -45,9 +188,15 @@ class TiledResultsPublisher(Publisher):
         self.year_container = None
         self.month_container = None
         self.day_container = None
-
-        # Dictionary to store DataFrames by UUID
-        self.uuid_dataframes = {}
+        # Keys of the day container below root_container, the start of spooled paths
+        self.day_path: tuple = ()
+        # Year/Month/Day containers by path, set up with root_container
+        self.day_cache: DayContainerCache = None
+        self.day_prefetch_s = day_prefetch_s
+        self._prefetch_task: asyncio.Task = None
+
+        # Columnar row buffers by UUID, turned into DataFrames when written
+        self.uuid_buffers: dict[str, LatentTableBuffer] = {}
         # Set to track UUIDs that already exist in Tiled
         self.existing_uuids = set()
         # Default table name if no UUID is available
@@ -58,6 +207,19 @@ class TiledResultsPublisher(Publisher):
         # Track current experiment name (will be set from message)
         self.current_experiment_name = "default_experiment"
 
+        # Streaming mode: (appendable table, its columns) by UUID, and when each was last appended to
+        self.stream_rows = stream_rows
+        self.stream_interval_s = stream_interval_s
+        self.streaming_tables = {}
+        self.last_append = {}
+
+        # Experiment, UUID and feature_vectors nodes below the day container
+        self.node_index = TiledNodeIndex(index_refresh_s)
+
+        # Writes made while Tiled was unreachable, and the UUIDs whose appendable table was spooled
+        self.spool = TiledSpool(spool_path, replay_rate=replay_rate) if spool_path else None
+        self.spooled_streams = set()
+
         logger.info("Initialized publisher with UUID-based table grouping")
 
     async def start(self):
@@ -159,35 +321,8 @@ class TiledResultsPublisher(Publisher):
             # REMOVED: Create or navigate to USER container
 
             # CHANGED: Replace single daily_run container with Year/Month/Day hierarchy
-            # Get current date components
-            now = datetime.now(CALIFORNIA_TZ)
-            year_str = str(now.year)
-            month_str = f"{now.month:02d}"
-            day_str = f"{now.day:02d}"
-
-            # Create Year container
-            if year_str not in self.root_container:
-                logger.info(f"Creating year container: {year_str}")
-                self.root_container.create_container(year_str)
-            else:
-                logger.info(f"Using existing year container: {year_str}")
-            self.year_container = self.root_container[year_str]
-
-            # Create Month container
-            if month_str not in self.year_container:
-                logger.info(f"Creating month container: {month_str}")
-                self.year_container.create_container(month_str)
-            else:
-                logger.info(f"Using existing month container: {month_str}")
-            self.month_container = self.year_container[month_str]
-
-            # Create Day container
-            if day_str not in self.month_container:
-                logger.info(f"Creating day container: {day_str}")
-                self.month_container.create_container(day_str)
-            else:
-                logger.info(f"Using existing day container: {day_str}")
-            self.day_container = self.month_container[day_str]
+            self.day_cache = DayContainerCache(self.root_container, prefetch_s=self.day_prefetch_s)
+            self._use_day(self.day_cache.day_key())
 
         except Exception as e:
             logger.error(f"Error setting up containers: {e}")
@@ -196,6 +331,53 @@ class TiledResultsPublisher(Publisher):
             logger.error(traceback.format_exc())
             raise
 
+    def _use_day(self, key: tuple):
+        """Write to the day container at key, resolving it (and its year and month) through the day cache."""
+        year_container = self.day_cache.get(key[:1])
+        month_container = self.day_cache.get(key[:2])
+        self.day_container = self.day_cache.get(key)
+        self.year_container = year_container
+        self.month_container = month_container
+        self.day_path = key
+
+    def _roll_day_sync(self):
+        """Move to today's day container once the current UUID has nothing written to the previous day."""
+        if self.day_cache is None:
+            return
+        key = self.day_cache.day_key()
+        if key == self.day_path or self._uuid_started(self.current_uuid):
+            return
+        try:
+            self._use_day(key)
+        except Exception as e:
+            logger.warning(f"Could not move to day container {'/'.join(key)}, staying in {'/'.join(self.day_path)}: {e}")
+            return
+        # Node paths are relative to the day container
+        self.node_index.clear()
+        logger.info(f"Day rolled over, writing to {'/'.join(key)}")
+
+    def _uuid_started(self, uuid) -> bool:
+        """Whether some of the UUID's vectors have been written (or spooled) already."""
+        if uuid is None:
+            return False
+        buffer = self.uuid_buffers.get(uuid)
+        return (buffer is not None and buffer.first_row > 0) or uuid in self.streaming_tables or uuid in self.spooled_streams
+
+    def _prefetch_next_day(self):
+        """Resolve tomorrow's day container in the background when midnight is near."""
+        if self.day_cache is None or (self._prefetch_task is not None and not self._prefetch_task.done()):
+            return
+        key = self.day_cache.next_day_due()
+        if key is not None:
+            self._prefetch_task = asyncio.create_task(self._prefetch_day(key))
+
+    async def _prefetch_day(self, key: tuple):
+        try:
+            await asyncio.to_thread(self.day_cache.get, key)
+            logger.info(f"Prepared day container {'/'.join(key)}")
+        except Exception as e:
+            logger.warning(f"Could not prepare day container {'/'.join(key)}: {e}")
+
     def _get_experiment_container(self, experiment_name=None):
         """Get or create the experiment container based on experiment name"""
         try:
@@ -203,11 +385,14 @@ class TiledResultsPublisher(Publisher):
             exp_name = experiment_name or self.current_experiment_name or "default_experiment"
 
             # Check if experiment container exists in day container (CHANGED from daily_container)
-            if exp_name not in self.day_container:
+            container = self.node_index.child(self.day_container, (exp_name,))
+            if container is None:
                 logger.info(f"Creating experiment container: {exp_name}")
                 self.day_container.create_container(exp_name)
+                container = self.day_container[exp_name]
+                self.node_index.add((exp_name,), container)
 
-            return self.day_container[exp_name]
+            return container
         except Exception as e:
             logger.error(f"Error getting experiment container: {e}")
             import traceback
@@ -225,8 +410,8 @@ class TiledResultsPublisher(Publisher):
                 logger.info("Received flush signal - writing pending data")
                 if (
                     self.current_uuid
-                    and self.current_uuid in self.uuid_dataframes
-                    and not self.uuid_dataframes[self.current_uuid].empty
+                    and self.current_uuid in self.uuid_buffers
+                    and not self.uuid_buffers[self.current_uuid].empty
                 ):
                     await self.write_table_to_tiled(self.current_uuid)
                     logger.info(f"Flushed data for UUID {self.current_uuid}")
@@ -238,10 +423,12 @@ class TiledResultsPublisher(Publisher):
             await self.stop()
             return
 
-        if not isinstance(message, LatentSpaceEvent):
+        if not isinstance(message, LatentSpaceEvent) or message.reprojected:
+            # Re-projected points repeat vectors already written
             return
 
         try:
+            self._prefetch_next_day()
             # Run the entire publish operation in a separate thread
             uuid_to_write = await asyncio.to_thread(self._publish_sync, message)
 
@@ -249,11 +436,52 @@ class TiledResultsPublisher(Publisher):
             if uuid_to_write:
                 await self.write_table_to_tiled(uuid_to_write)
 
+            if self._append_due(self.current_uuid):
+                await self.write_table_to_tiled(self.current_uuid)
+
         except Exception as e:
             logger.error(f"Error publishing to Tiled: {e}")
             import traceback
 
             logger.error(traceback.format_exc())
+        finally:
+            if self.spool is not None:
+                self.spool.start_replay(self._apply_spooled)
+
+    def _append_due(self, uuid) -> bool:
+        """Whether the buffered rows of a UUID should be appended to its table now (streaming mode)."""
+        if not self.stream_rows or uuid not in self.uuid_buffers:
+            return False
+        buffered = len(self.uuid_buffers[uuid])
+        if buffered >= self.stream_rows:
+            return True
+        if uuid not in self.last_append:
+            # The interval starts with the first buffered row
+            self.last_append[uuid] = time.monotonic()
+        return buffered > 0 and time.monotonic() - self.last_append[uuid] >= self.stream_interval_s
+
+    def _has_feature_vectors(self, experiment_container, uuid) -> bool:
+        """Whether a feature_vectors table this publisher is not appending to already exists for the UUID."""
+        if uuid in self.streaming_tables or uuid in self.spooled_streams:
+            return False
+        exp_name = self.current_experiment_name or "default_experiment"
+        if self.spool is not None and self.spool.blocks(self._uuid_path(uuid)):
+            # The spooled writes of a UUID include its table, unless it is still being appended to
+            return not self.stream_rows
+        try:
+            uuid_container = self.node_index.child(experiment_container, (exp_name, uuid))
+            if uuid_container is None:
+                return False
+            return self.node_index.contains(uuid_container, (exp_name, uuid, "feature_vectors"))
+        except Exception as e:
+            if self.spool is None:
+                raise
+            logger.warning(f"Could not look up {uuid} in Tiled, keeping its vectors: {e}")
+            return False
+
+    def _uuid_path(self, uuid) -> tuple:
+        """Path of a UUID container below root_container."""
+        return (*self.day_path, self.current_experiment_name or "default_experiment", uuid)
 
     def _publish_sync(self, message):
         """Synchronous implementation of publish() to be run in a thread."""
@@ -262,6 +490,8 @@ class TiledResultsPublisher(Publisher):
             if self.day_container is None:
                 logger.error("Day container not initialized, cannot publish")
                 return None
+            self._roll_day_sync()
+            self.node_index.refresh_if_due()
 
             # Format vector and metadata
             vector = np.array(message.feature_vector, dtype=np.float32)
@@ -278,25 +508,19 @@ class TiledResultsPublisher(Publisher):
                 # Get experiment container
                 experiment_container = self._get_experiment_container(experiment_name)
 
-                # NEW: Check if UUID container exists (not UUID/feature_vectors table)
-                if uuid in experiment_container:
-                    uuid_container = experiment_container[uuid]
-                    # Check if feature_vectors table exists inside UUID container
-                    if "feature_vectors" in uuid_container:
-                        logger.debug(f"Skipping vector for existing UUID: {uuid}")
-                        return None
+                # NEW: Check if UUID container exists with a feature_vectors table inside
+                if self._has_feature_vectors(experiment_container, uuid):
+                    logger.debug(f"Skipping vector for existing UUID: {uuid}")
+                    return None
 
                 # Check if this is a new UUID
                 uuid_to_write = None
 
-                if self.current_uuid is not None and uuid != self.current_uuid and self.current_uuid in self.uuid_dataframes:
+                if self.current_uuid is not None and uuid != self.current_uuid and self.current_uuid in self.uuid_buffers:
                     # We have a new UUID, so write the data for the previous UUID
-                    if not self.uuid_dataframes[self.current_uuid].empty:
+                    if not self.uuid_buffers[self.current_uuid].empty:
                         # Check if the previous UUID's feature_vectors already exists
-                        prev_uuid_container = experiment_container.get(self.current_uuid)
-                        should_write = True
-                        if prev_uuid_container and "feature_vectors" in prev_uuid_container:
-                            should_write = False
+                        should_write = not self._has_feature_vectors(experiment_container, self.current_uuid)
 
                         if should_write:
                             logger.info(f"New UUID detected, marking previous UUID for writing: {self.current_uuid}")
@@ -306,27 +530,11 @@ class TiledResultsPublisher(Publisher):
                 self.current_uuid = uuid
 
                 # Initialize tracking for this UUID if needed
-                if uuid not in self.uuid_dataframes:
-                    self.uuid_dataframes[uuid] = pd.DataFrame()
-
-                # Create a record with metadata and the vector
-                record = {
-                    "tiled_url": tiled_url,
-                    "autoencoder_model": getattr(message, "autoencoder_model", None),
-                    "dimred_model": getattr(message, "dimred_model", None),
-                    "timestamp": getattr(message, "timestamp", time.time()),
-                    "total_processing_time": getattr(message, "total_processing_time", None),
-                    "autoencoder_time": getattr(message, "autoencoder_time", None),
-                    "dimred_time": getattr(message, "dimred_time", None),
-                }
-
-                # Add vector elements as columns (limit to first 20 to keep it manageable)
-                for i, val in enumerate(vector[:20]):
-                    record[f"feature_{i}"] = float(val)
-
-                # Append to DataFrame for this UUID
-                new_row = pd.DataFrame([record])
-                self.uuid_dataframes[uuid] = pd.concat([self.uuid_dataframes[uuid], new_row], ignore_index=True)
+                if uuid not in self.uuid_buffers:
+                    self.uuid_buffers[uuid] = LatentTableBuffer()
+
+                # Metadata columns plus the first 20 vector elements as feature_{i} columns
+                self.uuid_buffers[uuid].append(message, vector)
 
                 logger.debug(f"Added vector to table '{uuid}'")
 
@@ -359,22 +567,20 @@ class TiledResultsPublisher(Publisher):
             experiment_container = self._get_experiment_container(self.current_experiment_name)
 
             # NEW: Check if UUID container exists, and if feature_vectors table exists inside it
-            if table_key in experiment_container:
-                uuid_container = experiment_container[table_key]
-                if "feature_vectors" in uuid_container:
-                    logger.info(f"Skipping write for existing UUID: {table_key} (feature_vectors already exists)")
-                    return
+            if self._has_feature_vectors(experiment_container, table_key):
+                logger.info(f"Skipping write for existing UUID: {table_key} (feature_vectors already exists)")
+                return
 
-            # Get the DataFrame for this UUID
-            df = self.uuid_dataframes.get(table_key)
-            if df is None:
+            # Get the buffered rows for this UUID
+            buffer = self.uuid_buffers.get(table_key)
+            if buffer is None:
                 logger.warning(f"No DataFrame found for {table_key}")
                 return
+            df = buffer.to_dataframe()
 
-            # Log DataFrame info for debugging (CHANGED: use current date instead of user)
-            now = datetime.now(CALIFORNIA_TZ)
+            # Log DataFrame info for debugging (CHANGED: use the day container instead of user)
             logger.info(
-                f"Writing {len(df)} vectors to new table '{table_key}/feature_vectors' in {now.year}/{now.month:02d}/{now.day:02d}/{self.current_experiment_name}"
+                f"Writing {len(df)} vectors to new table '{table_key}/feature_vectors' in {'/'.join(self.day_path)}/{self.current_experiment_name}"
             )
 
             # Check if DataFrame is empty
@@ -382,26 +588,43 @@ class TiledResultsPublisher(Publisher):
                 logger.warning(f"DataFrame for {table_key} is empty, nothing to write")
                 return
 
-            # NEW: Create UUID container if it doesn't exist
-            if table_key not in experiment_container:
-                logger.info(f"Creating UUID container: {table_key}")
-                experiment_container.create_container(table_key)
-
-            uuid_container = experiment_container[table_key]
+            if self.spool is not None and self.spool.blocks(self._uuid_path(table_key)):
+                # Earlier writes of this UUID are waiting in the spool, these go after them
+                self._spool_rows(table_key, buffer, df)
+                return
 
-            # Write the DataFrame as "feature_vectors" inside the UUID container
+            exp_name = self.current_experiment_name or "default_experiment"
+            # Write the full vectors, then the DataFrame as "feature_vectors" inside the UUID container.
+            # A failed table write keeps the rows buffered and rewrites the same array rows next time.
             try:
-                uuid_container.write_dataframe(df, key="feature_vectors")
+                # NEW: Create UUID container if it doesn't exist
+                uuid_container = self.node_index.child(experiment_container, (exp_name, table_key))
+                if uuid_container is None:
+                    logger.info(f"Creating UUID container: {table_key}")
+                    experiment_container.create_container(table_key)
+                    uuid_container = experiment_container[table_key]
+                    self.node_index.add((exp_name, table_key), uuid_container)
+
+                self._write_vectors(uuid_container, table_key, buffer)
+                if self.stream_rows:
+                    self._append_partition(uuid_container, table_key, df)
+                else:
+                    uuid_container.write_dataframe(df, key="feature_vectors")
+                    self.node_index.add((exp_name, table_key, "feature_vectors"))
 
                 logger.info(f"Successfully wrote {len(df)} vectors to '{table_key}/feature_vectors'")
 
                 # Add this UUID to our set of existing UUIDs
                 self.existing_uuids.add(table_key)
 
-                # Clear the DataFrame for this UUID
-                self.uuid_dataframes[table_key] = pd.DataFrame()
+                # Clear the buffered rows for this UUID
+                buffer.clear()
 
             except Exception as e:
+                if self.spool is not None:
+                    logger.warning(f"Could not write {table_key} to Tiled, spooling {len(df)} rows: {e}")
+                    self._spool_rows(table_key, buffer, df)
+                    return
                 logger.error(f"Error writing DataFrame for {table_key}: {e}")
                 import traceback
 
@@ -413,6 +636,78 @@ class TiledResultsPublisher(Publisher):
 
             logger.error(traceback.format_exc())
 
+    def _write_vectors(self, uuid_container, table_key, buffer):
+        """Write the buffered vectors at their rows of the UUID's vector array, creating it on the first write."""
+        exp_name = self.current_experiment_name or "default_experiment"
+        path = (exp_name, table_key, VECTOR_ARRAY_KEY)
+        array = self.node_index.child(uuid_container, path)
+        if array is None:
+            array = uuid_container.write_array(
+                buffer.vector_array(),
+                key=VECTOR_ARRAY_KEY,
+                metadata={"table": "feature_vectors", "row_column": ROW_COLUMN},
+            )
+            self.node_index.add(path, array)
+            logger.info(f"Created vector array '{table_key}/{VECTOR_ARRAY_KEY}' with {len(buffer)} rows")
+            return
+        width = array.shape[1]
+        if buffer.vectors.shape[1] > width:
+            logger.warning(
+                f"Vectors for {table_key} have {buffer.vectors.shape[1]} elements, "
+                f"truncating to the {width} of '{VECTOR_ARRAY_KEY}'"
+            )
+        array.patch(buffer.vector_array(width), offset=(buffer.first_row,), extend=True)
+
+    def _spool_rows(self, table_key, buffer, df):
+        """Spool the buffered vectors and table rows of a UUID, then clear them as if written."""
+        uuid_path = self._uuid_path(table_key)
+        self.spool.append(OP_ROWS, (*uuid_path, VECTOR_ARRAY_KEY), buffer.vector_array(), offset=buffer.first_row)
+        if self.stream_rows:
+            entry = self.streaming_tables.get(table_key)
+            if entry is not None:
+                df = df.reindex(columns=entry[1])
+            self.spool.append(OP_APPEND, (*uuid_path, "feature_vectors"), df)
+            self.spooled_streams.add(table_key)
+            self.last_append[table_key] = time.monotonic()
+        else:
+            self.spool.append(OP_TABLE, (*uuid_path, "feature_vectors"), df)
+        self.existing_uuids.add(table_key)
+        buffer.clear()
+        logger.info(f"Spooled {len(df)} vectors for '{table_key}', {len(self.spool)} writes pending")
+
+    def _apply_spooled(self, entry: SpoolEntry):
+        """Replay a spooled write below root_container."""
+        parent = ensure_container(self.root_container, entry.path[:-1])
+        key = entry.path[-1]
+        if entry.op == OP_ROWS:
+            write_rows(parent, key, entry.payload, entry.offset)
+        elif entry.op == OP_TABLE:
+            if key not in parent:
+                parent.write_dataframe(entry.payload, key=key)
+        elif entry.op == OP_APPEND:
+            if key in parent:
+                table = parent[key]
+            else:
+                table = parent.create_appendable_table(table_schema(list(entry.payload.columns)), key=key)
+            table.append_partition(0, entry.payload)
+
+    def _append_partition(self, uuid_container, table_key, df):
+        """Append rows to the UUID's appendable table, creating it with the columns of the first rows."""
+        entry = self.streaming_tables.get(table_key)
+        if entry is None and table_key in self.spooled_streams and "feature_vectors" in uuid_container:
+            # Created when the spool was replayed
+            table = uuid_container["feature_vectors"]
+            entry = self.streaming_tables[table_key] = (table, list(table.columns))
+        if entry is None:
+            columns = list(df.columns)
+            table = uuid_container.create_appendable_table(table_schema(columns), key="feature_vectors")
+            entry = self.streaming_tables[table_key] = (table, columns)
+            logger.info(f"Created appendable table '{table_key}/feature_vectors'")
+        table, columns = entry
+        # Later rows are written with the table's columns, e.g. a wider vector keeps its first columns
+        table.append_partition(0, df.reindex(columns=columns))
+        self.last_append[table_key] = time.monotonic()
+
     async def stop(self):
         """Write any remaining data for new UUIDs before stopping."""
         try:
@@ -446,15 +741,13 @@ class TiledResultsPublisher(Publisher):
             # Check if the current UUID needs writing
             if (
                 self.current_uuid is not None
-                and self.current_uuid in self.uuid_dataframes
-                and not self.uuid_dataframes[self.current_uuid].empty
+                and self.current_uuid in self.uuid_buffers
+                and not self.uuid_buffers[self.current_uuid].empty
             ):
                 # Check if UUID container and feature_vectors table already exist
-                if self.current_uuid in experiment_container:
-                    uuid_container = experiment_container[self.current_uuid]
-                    if "feature_vectors" in uuid_container:
-                        logger.info(f"UUID {self.current_uuid} already has feature_vectors, skipping write")
-                        return None
+                if self._has_feature_vectors(experiment_container, self.current_uuid):
+                    logger.info(f"UUID {self.current_uuid} already has feature_vectors, skipping write")
+                    return None
 
                 return self.current_uuid
 
@@ -467,10 +760,27 @@ class TiledResultsPublisher(Publisher):
             return None
 
 
-def tiled_results_publisher_factory(tiled_uri=None, tiled_api_key=None, root_segments=None, tiled_prefix=None):
+def tiled_results_publisher_factory(
+    tiled_uri=None,
+    tiled_api_key=None,
+    root_segments=None,
+    tiled_prefix=None,
+    stream_rows=None,
+    stream_interval_s=10,
+    index_refresh_s=300,
+    spool_path=None,
+    replay_rate=20,
+    day_prefetch_s=600,
+):
     return TiledResultsPublisher(
         tiled_uri=tiled_uri,
         root_segments=root_segments,
         tiled_prefix=tiled_prefix,
         tiled_api_key=None,
+        stream_rows=stream_rows,
+        stream_interval_s=stream_interval_s,
+        index_refresh_s=index_refresh_s,
+        spool_path=spool_path,
+        replay_rate=replay_rate,
+        day_prefetch_s=day_prefetch_s,
     )
@@ -1,21 +1,75 @@
+import asyncio
 import json
 import logging
 import time
 
 import aiosqlite
+import numpy as np
 from arroyopy.publisher import Publisher
 
+from arroyosas.schemas import SASStop
+
 from .schemas import LatentSpaceEvent
 
 logger = logging.getLogger("arroyo_reduction.vector_save")
 
+# Columns written by save_vector, in INSERT order
+VECTOR_COLUMNS = (
+    "tiled_url",
+    "feature_vector",
+    "dim",
+    "autoencoder_model",
+    "dimred_model",
+    "experiment_name",
+    "timestamp",
+    "total_processing_time",
+    "autoencoder_time",
+    "dimred_time",
+)
+INDEXED_COLUMNS = ("tiled_url", "experiment_name", "timestamp")
+
+
+def encode_vector(feature_vector) -> tuple[bytes, int]:
+    """A feature vector as a little-endian float32 BLOB and its dimension."""
+    vector = np.asarray(feature_vector, dtype="<f4").reshape(-1)
+    return vector.tobytes(), len(vector)
+
+
+def decode_vector(value, dim: int = None) -> np.ndarray:
+    """Read a stored feature vector, either a float32 BLOB or the JSON text of older databases."""
+    if isinstance(value, str):
+        return np.asarray(json.loads(value), dtype=np.float32)
+    vector = np.frombuffer(value, dtype="<f4")
+    if dim is not None and len(vector) != dim:
+        raise ValueError(f"Stored vector has {len(vector)} elements, expected {dim}")
+    return vector
+
 
 class VectorSavePublisher(Publisher):
-    def __init__(self, db_path="vector_results.db"):
+    """
+    Saves latent space vectors to a SQLite ``vectors`` table, also read by the
+    db_replay mode of unified_sim_cli.
+
+    The database runs in WAL mode and rows are buffered and inserted with one
+    ``executemany`` and one commit every ``flush_rows`` rows or ``flush_interval_ms``
+    milliseconds, and at SASStop, rather than one fsync per frame. Flushes run one at a
+    time, rows of a failed transaction stay buffered and are inserted by the next flush.
+    SASStop closes the database, the next row opens it again. Vectors are stored
+    as float32 BLOBs with their length in ``dim``; databases created with JSON text
+    vectors get the ``dim`` column added and keep their old rows readable with
+    ``decode_vector``.
+    """
+
+    def __init__(self, db_path="vector_results.db", flush_rows: int = 256, flush_interval_ms: float = 1000):
         super().__init__()
         self.db_path = db_path
+        self.flush_rows = flush_rows
+        self.flush_interval_ms = flush_interval_ms
         self._db_initialized = False
         self.db: aiosqlite.Connection = None
+        self.pending_rows: list[tuple] = []
+        self._flush_timer: asyncio.Task = None
+        self._flush_lock = asyncio.Lock()
         # Database will be initialized lazily in start()
 
     async def start(self):
@@ -26,22 +80,33 @@ class VectorSavePublisher(Publisher):
         if not self._db_initialized:
             if self.db is None:
                 self.db = await aiosqlite.connect(self.db_path)
+            await self.db.execute("PRAGMA journal_mode=WAL")
+            # With WAL, NORMAL only syncs at checkpoints and cannot corrupt the database
+            await self.db.execute("PRAGMA synchronous=NORMAL")
             await self.db.execute(
                 """
                 CREATE TABLE IF NOT EXISTS vectors (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     tiled_url TEXT NOT NULL,
-                    feature_vector TEXT NOT NULL,
+                    feature_vector BLOB NOT NULL,
                     autoencoder_model TEXT,
                     dimred_model TEXT,
                     experiment_name TEXT,
                     timestamp REAL,
                     total_processing_time REAL,
                     autoencoder_time REAL,
-                    dimred_time REAL
+                    dimred_time REAL,
+                    dim INTEGER
                 )
             """
             )
+            async with self.db.execute("PRAGMA table_info(vectors)") as cursor:
+                columns = {row[1] for row in await cursor.fetchall()}
+            if "dim" not in columns:
+                logger.info(f"Adding dim column to the vectors table of {self.db_path}")
+                await self.db.execute("ALTER TABLE vectors ADD COLUMN dim INTEGER")
+            for column in INDEXED_COLUMNS:
+                await self.db.execute(f"CREATE INDEX IF NOT EXISTS idx_vectors_{column} ON vectors ({column})")
             await self.db.commit()
             self._db_initialized = True
 
@@ -57,15 +122,14 @@ class VectorSavePublisher(Publisher):
         autoencoder_time: float = None,
         dimred_time: float = None,
     ):
+        """Buffer a row, inserting the buffered rows once there are flush_rows of them."""
         await self._init_db()
-        # Convert numpy array to JSON string for storage
-        vector_str = json.dumps(feature_vector)
-
-        await self.db.execute(
-            "INSERT INTO vectors (tiled_url, feature_vector, autoencoder_model, dimred_model, experiment_name, timestamp, total_processing_time, autoencoder_time, dimred_time) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        vector_blob, dim = encode_vector(feature_vector)
+        self.pending_rows.append(
             (
                 tiled_url,
-                vector_str,
+                vector_blob,
+                dim,
                 autoencoder_model,
                 dimred_model,
                 experiment_name,
@@ -73,12 +137,79 @@ class VectorSavePublisher(Publisher):
                 total_processing_time,
                 autoencoder_time,
                 dimred_time,
-            ),
+            )
         )
-        await self.db.commit()
+        if len(self.pending_rows) >= self.flush_rows:
+            await self.flush()
+        elif self._flush_timer is None:
+            self._flush_timer = asyncio.create_task(self._flush_after_wait())
+
+    async def _flush_after_wait(self) -> None:
+        await asyncio.sleep(self.flush_interval_ms / 1000)
+        # Cleared before flushing so that a full buffer arriving meanwhile does not cancel this flush
+        self._flush_timer = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing vectors to {self.db_path}: {e}")
+
+    async def flush(self) -> None:
+        """Insert the buffered rows in one transaction, keeping them buffered if it fails."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        async with self._flush_lock:
+            await self._flush_pending()
+
+    async def _flush_pending(self) -> None:
+        # Called under _flush_lock, a rollback must not discard the insert of another flush
+        rows = self.pending_rows
+        self.pending_rows = []
+        if not rows:
+            return
+        placeholders = ", ".join("?" for _ in VECTOR_COLUMNS)
+        try:
+            await self._init_db()
+            await self.db.executemany(
+                f"INSERT INTO vectors ({', '.join(VECTOR_COLUMNS)}) VALUES ({placeholders})",
+                rows,
+            )
+            await self.db.commit()
+        except Exception:
+            # Keep the rows for the next flush, ahead of the ones buffered meanwhile
+            self.pending_rows = rows + self.pending_rows
+            if self.db is not None:
+                try:
+                    await self.db.rollback()
+                except Exception as e:
+                    logger.error(f"Error rolling back vectors in {self.db_path}: {e}")
+            raise
+        logger.debug(f"Saved {len(rows)} vectors to {self.db_path}")
+
+    async def stop(self) -> None:
+        """Insert any buffered rows and close the database, it is opened again by the next run."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        async with self._flush_lock:
+            try:
+                await self._flush_pending()
+            except Exception as e:
+                logger.error(f"Error flushing vectors to {self.db_path}: {e}")
+            if self.db is not None:
+                try:
+                    await self.db.close()
+                except Exception as e:
+                    logger.error(f"Error closing {self.db_path}: {e}")
+                self.db = None
+                self._db_initialized = False
 
     async def publish(self, message: LatentSpaceEvent) -> None:
-        if not isinstance(message, LatentSpaceEvent):
+        if isinstance(message, SASStop):
+            await self.stop()
+            return None
+        if not isinstance(message, LatentSpaceEvent) or message.reprojected:
+            # Re-projected points repeat vectors already saved
             return None
 
         tiled_url = message.tiled_url
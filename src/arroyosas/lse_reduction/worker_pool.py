@@ -0,0 +1,256 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+from arroyosas.schemas import RawFrameEvent
+
+from .inference import InferenceConfig
+from .reducer import Reducer
+
+logger = logging.getLogger("arroyo_reduction.worker_pool")
+
+# Result queue messages that are not task results
+READY = "ready"
+MODEL_SWAP = "model_swap"
+# Reducer attributes the operator reads, mirrored from the workers' replies
+MIRRORED_STATE = ("autoencoder_model_name", "dimred_model_name", "experiment_name")
+
+
+def build_worker_reducer(redis_host: str, redis_port: int, reducer_kwargs: dict) -> Reducer:
+    """Default worker reducer: a LatentSpaceReducer with its own Redis connection and models."""
+    from .redis_model_store import RedisModelStore
+    from .reducer import LatentSpaceReducer
+
+    reducer_kwargs = dict(reducer_kwargs)
+    inference = reducer_kwargs.pop("inference", None)
+    reducer_kwargs["inference_config"] = InferenceConfig(**inference) if inference else InferenceConfig()
+    return LatentSpaceReducer(RedisModelStore(host=redis_host, port=redis_port), **reducer_kwargs)
+
+
+def _worker_main(index: int, reducer_factory, factory_args: tuple, tasks, results):
+    """Worker process loop: run reducer methods for the parent until it sends None."""
+    try:
+        reducer = reducer_factory(*factory_args)
+    except Exception as e:
+        logger.error(f"LSE worker {index} could not create its reducer: {e}")
+        results.put((READY, index, repr(e)))
+        return
+    reducer.on_model_swap = lambda model_type, model_id: results.put((MODEL_SWAP, (index, model_type, model_id), None))
+    results.put((READY, index, None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, method, args = task
+        try:
+            value = getattr(reducer, method)(*args)
+            state = {name: getattr(reducer, name, None) for name in MIRRORED_STATE}
+            results.put((task_id, (value, state), None))
+        except Exception as e:
+            logger.error(f"LSE worker {index} failed in {method}: {e}")
+            results.put((task_id, None, repr(e)))
+
+
+class WorkerPoolReducer(Reducer):
+    """
+    Runs a reducer in each of ``workers`` processes, every one loading its own models and
+    following ``model_updates`` on its own.
+
+    ``reduce`` and ``reduce_batch`` block the calling thread until a worker replies, and
+    are sent to the worker with the fewest outstanding tasks, so the operator keeps all
+    workers busy by calling them from several threads at once. Results come back in
+    completion order; putting them back in frame order is up to the operator.
+
+    ``start_run`` and ``reproject`` go to every worker, since each one only caches the
+    latents of the frames it reduced. ``on_model_swap`` is called once all workers have
+    swapped in the same model.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        redis_host: str = None,
+        redis_port: int = None,
+        reducer_kwargs: dict = None,
+        reducer_factory=build_worker_reducer,
+        factory_args: tuple = None,
+        mp_context: str = "spawn",
+        start_timeout: float = 600,
+    ):
+        self.workers = workers
+        self.max_concurrency = workers
+        self.is_loading_model = False
+        self.loading_model_type = None
+        self.autoencoder_model_name = None
+        self.dimred_model_name = None
+        self.experiment_name = None
+        self.on_model_swap = None
+
+        if factory_args is None:
+            reducer_kwargs = dict(reducer_kwargs or {})
+            inference = dict(reducer_kwargs.get("inference") or {})
+            if not inference.get("intra_op_threads"):
+                # Each worker gets its share of the cores instead of all of them
+                inference["intra_op_threads"] = max(1, (os.cpu_count() or 1) // workers)
+            reducer_kwargs["inference"] = inference
+            factory_args = (redis_host, redis_port, reducer_kwargs)
+
+        context = multiprocessing.get_context(mp_context)
+        self._results = context.Queue()
+        self._tasks = [context.Queue() for _ in range(workers)]
+        self._processes = [
+            context.Process(
+                target=_worker_main,
+                args=(index, reducer_factory, factory_args, self._tasks[index], self._results),
+                name=f"lse-worker-{index}",
+                daemon=True,
+            )
+            for index in range(workers)
+        ]
+        self._task_ids = itertools.count()
+        self._pending: dict[int, tuple[int, Future]] = {}
+        self._outstanding = [0] * workers
+        self._swapped: dict[tuple[str, str], set[int]] = {}
+        self._lock = threading.Lock()
+
+        for process in self._processes:
+            process.start()
+        self._wait_until_ready(start_timeout)
+        self._router = threading.Thread(target=self._route_results, name="lse-worker-results", daemon=True)
+        self._router.start()
+        logger.info(f"Started {workers} LSE worker processes")
+
+    def _wait_until_ready(self, timeout: float):
+        ready = set()
+        while len(ready) < self.workers:
+            try:
+                kind, index, error = self._results.get(timeout=timeout)
+            except queue.Empty:
+                self.close()
+                raise RuntimeError(f"Only {len(ready)} of {self.workers} LSE workers started within {timeout}s")
+            if kind != READY:
+                continue
+            if error is not None:
+                self.close()
+                raise RuntimeError(f"LSE worker {index} failed to start: {error}")
+            ready.add(index)
+
+    def _route_results(self):
+        """Resolve the futures of finished tasks, failing those of workers that died."""
+        while True:
+            try:
+                task_id, payload, error = self._results.get(timeout=1)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            except (EOFError, OSError):
+                return
+            if task_id is None:
+                return
+            if task_id == MODEL_SWAP:
+                self._worker_swapped(*payload)
+                continue
+            if task_id == READY:
+                continue
+            with self._lock:
+                worker, future = self._pending.pop(task_id, (None, None))
+                if worker is not None:
+                    self._outstanding[worker] -= 1
+            if future is None:
+                continue
+            if error is not None:
+                future.set_exception(RuntimeError(error))
+                continue
+            value, state = payload
+            for name, attribute in state.items():
+                setattr(self, name, attribute)
+            future.set_result(value)
+
+    def _check_workers(self):
+        for index, process in enumerate(self._processes):
+            if process.is_alive():
+                continue
+            with self._lock:
+                lost = [task_id for task_id, (worker, _) in self._pending.items() if worker == index]
+                futures = [self._pending.pop(task_id)[1] for task_id in lost]
+                self._outstanding[index] = 0
+            for future in futures:
+                future.set_exception(RuntimeError(f"LSE worker {index} exited with code {process.exitcode}"))
+
+    def _worker_swapped(self, index: int, model_type: str, model_id: str):
+        with self._lock:
+            swapped = self._swapped.setdefault((model_type, model_id), set())
+            swapped.add(index)
+            if len(swapped) < self.workers:
+                return
+            del self._swapped[(model_type, model_id)]
+        logger.info(f"All LSE workers swapped in {model_type} model {model_id}")
+        if self.on_model_swap is not None:
+            try:
+                self.on_model_swap(model_type, model_id)
+            except Exception as e:
+                logger.error(f"Error in model swap callback: {e}")
+
+    def _submit(self, worker: int, method: str, *args) -> Future:
+        future = Future()
+        with self._lock:
+            if worker is None:
+                live = [i for i, process in enumerate(self._processes) if process.is_alive()]
+                if not live:
+                    raise RuntimeError("No LSE worker is running")
+                worker = min(live, key=self._outstanding.__getitem__)
+            task_id = next(self._task_ids)
+            self._pending[task_id] = (worker, future)
+            self._outstanding[worker] += 1
+        self._tasks[worker].put((task_id, method, args))
+        return future
+
+    def reduce(self, message: RawFrameEvent) -> tuple[np.ndarray, dict]:
+        return self._submit(None, "reduce", message).result()
+
+    def reduce_batch(self, messages: list[RawFrameEvent]) -> tuple[list[np.ndarray], dict]:
+        return self._submit(None, "reduce_batch", messages).result()
+
+    def start_run(self):
+        for future in [self._submit(worker, "start_run") for worker in range(self.workers)]:
+            future.result()
+
+    def reproject(self) -> tuple[list[tuple[str, int]], np.ndarray, dict]:
+        """Re-project every worker's cached latents and concatenate them."""
+        futures = [self._submit(worker, "reproject") for worker in range(self.workers)]
+        keys, coords, timing_info = [], [], {}
+        for future in futures:
+            worker_keys, worker_coords, worker_timing = future.result()
+            if not worker_keys:
+                continue
+            keys.extend(worker_keys)
+            coords.append(np.asarray(worker_coords))
+            # Workers re-project in parallel, the slowest one is the batch time
+            dimred_time = max(timing_info.get("dimred_time", 0.0), worker_timing["dimred_time"])
+            timing_info = worker_timing | {"dimred_time": dimred_time, "batch_size": len(keys)}
+        if not keys:
+            return [], None, {}
+        return keys, np.concatenate(coords), timing_info
+
+    def close(self):
+        """Stop the workers, failing any task still waiting for one."""
+        for tasks, process in zip(self._tasks, self._processes):
+            if process.is_alive():
+                tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        with self._lock:
+            futures = [future for _, future in self._pending.values()]
+            self._pending.clear()
+        for future in futures:
+            future.set_exception(RuntimeError("LSE worker pool closed"))
+        self._results.put((None, None, None))
@@ -60,14 +60,14 @@ class OneDReductionOperator(Operator):
                 reduction_settings.pop("input_uri_mask")
                 masked_image = self.generate_masked_image(message.image.array, self.mask)
                 reduction_settings["masked_image"] = masked_image
-                reduction, _, _ = await asyncio.to_thread(pixel_roi_horizontal_cut, **reduction_settings)
-                #
-                serializable_reduction = SerializableNumpyArrayModel(array=reduction)
+                q_parallel, cut_average, _ = await asyncio.to_thread(pixel_roi_horizontal_cut, **reduction_settings)
+                # the intensity along q parallel and its q axis, not the errors
                 reduction_msg = SAS1DReduction(
-                    curve=serializable_reduction,  # just the qparrallel, not the cut_average or errors
+                    curve=SerializableNumpyArrayModel(array=cut_average),
                     curve_tiled_url="curve",
                     raw_frame=message.image,
                     raw_frame_tiled_url=message.tiled_url,
+                    q=SerializableNumpyArrayModel(array=q_parallel),
                 )
                 await self.publish(reduction_msg)
         except Exception as e:
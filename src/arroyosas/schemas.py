@@ -72,6 +72,7 @@ class LatentSpaceEvent(Event, SASMessage):
     tiled_url: str
     feature_vector: list[float]
     index: int
+    reprojected: bool = False  # Re-sent with a new dimred model's coordinates, a view update only
 
 
 class SASStop(Stop, SASMessage):
@@ -89,3 +90,4 @@ class SAS1DReduction(Event, SASMessage):
     curve_tiled_url: str
     raw_frame: SerializableNumpyArrayModel
     raw_frame_tiled_url: str
+    q: SerializableNumpyArrayModel = None  # q axis of the curve, when known
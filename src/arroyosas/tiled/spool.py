@@ -0,0 +1,261 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Callable
+
+import httpx
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, ConfigDict
+
+logger = logging.getLogger(__name__)
+
+# Spooled operations
+OP_CONTAINER = "container"  # create the container at path
+OP_ROWS = "rows"  # write rows of the array at path, starting at offset
+OP_TABLE = "table"  # write the DataFrame at path as a table
+OP_APPEND = "append"  # append the DataFrame to the appendable table at path
+DATAFRAME_OPS = (OP_TABLE, OP_APPEND)
+
+# HTTP statuses worth retrying, besides server errors
+RETRY_STATUSES = (408, 429)
+
+
+class SpoolEntry(BaseModel):
+    """One write that could not be made to Tiled, with its position in the spool."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    seq: int
+    op: str
+    path: tuple[str, ...]
+    offset: int | None = None
+    payload: np.ndarray | pd.DataFrame | None = None
+
+
+def encode_payload(op: str, payload) -> bytes:
+    if payload is None:
+        return None
+    buffer = io.BytesIO()
+    if op in DATAFRAME_OPS:
+        payload.to_parquet(buffer, index=False)
+    else:
+        np.save(buffer, np.asarray(payload), allow_pickle=False)
+    return buffer.getvalue()
+
+
+def decode_payload(op: str, data: bytes):
+    if data is None:
+        return None
+    if op in DATAFRAME_OPS:
+        return pd.read_parquet(io.BytesIO(data))
+    return np.load(io.BytesIO(data), allow_pickle=False)
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed write may succeed later: Tiled unreachable, timing out or failing on its side."""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status in RETRY_STATUSES
+    return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
+
+
+class TiledSpool:
+    """
+    On-disk queue of Tiled writes made while Tiled was unreachable.
+
+    Entries live in a SQLite file with increasing sequence numbers, so they survive a
+    restart and are replayed in the order they were spooled. Paths are tuples of keys
+    below the publisher's root container. Once a path has spooled entries, later writes
+    to it, above it or below it are spooled too (see ``blocks``), which keeps the writes
+    to each node in order while other nodes are written live.
+
+    ``replay`` drains the spool at most ``replay_rate`` entries per second, so catching
+    up after an outage does not crowd out the live writes. Entries Tiled rejects for good
+    (e.g. a 4xx response or a schema mismatch) are moved to the ``dead_letter`` table,
+    so they no longer hold up the entries behind them.
+    """
+
+    def __init__(self, path: str, replay_rate: float = 20, retry_s: float = 10):
+        self.path = path
+        self.replay_rate = replay_rate
+        self.retry_s = retry_s
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS spool (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                op TEXT NOT NULL,
+                path TEXT NOT NULL,
+                "offset" INTEGER,
+                payload BLOB,
+                created REAL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dead_letter (
+                seq INTEGER PRIMARY KEY,
+                op TEXT NOT NULL,
+                path TEXT NOT NULL,
+                "offset" INTEGER,
+                payload BLOB,
+                created REAL,
+                failed REAL,
+                error TEXT
+            )
+            """
+        )
+        self._conn.commit()
+        self._paths = Counter(tuple(json.loads(row[0])) for row in self._conn.execute("SELECT path FROM spool"))
+        self._replay_task: asyncio.Task = None
+        if self._paths:
+            logger.info(f"Spool {path} holds {len(self)} Tiled writes from a previous session")
+
+    def __len__(self):
+        with self._lock:
+            return sum(self._paths.values())
+
+    def append(self, op: str, path: tuple, payload=None, offset: int = None) -> int:
+        """Spool a write, returning its sequence number."""
+        path = tuple(path)
+        data = encode_payload(op, payload)
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO spool (op, path, "offset", payload, created) VALUES (?, ?, ?, ?, ?)',
+                (op, json.dumps(path), offset, data, time.time()),
+            )
+            self._conn.commit()
+            self._paths[path] += 1
+        logger.debug(f"Spooled {op} of {'/'.join(path)} as {cursor.lastrowid}")
+        return cursor.lastrowid
+
+    def blocks(self, path: tuple) -> bool:
+        """Whether path, a node above it or a node below it has spooled writes that must be made first."""
+        path = tuple(path)
+        with self._lock:
+            return any(spooled[: len(path)] == path or path[: len(spooled)] == spooled for spooled in self._paths)
+
+    def peek(self, limit: int) -> list[SpoolEntry]:
+        """The oldest entries, in sequence order."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT seq, op, path, "offset", payload FROM spool ORDER BY seq LIMIT ?', (limit,)
+            ).fetchall()
+        return [
+            SpoolEntry(seq=seq, op=op, path=tuple(json.loads(path)), offset=offset, payload=decode_payload(op, data))
+            for seq, op, path, offset, data in rows
+        ]
+
+    def remove(self, entry: SpoolEntry) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM spool WHERE seq = ?", (entry.seq,))
+            self._conn.commit()
+            self._paths[entry.path] -= 1
+            if self._paths[entry.path] <= 0:
+                del self._paths[entry.path]
+
+    def dead_letter(self, entry: SpoolEntry, error: Exception) -> None:
+        """Move an entry that cannot be written to the dead_letter table, with the error it failed with."""
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    'INSERT INTO dead_letter (seq, op, path, "offset", payload, created, failed, error) '
+                    'SELECT seq, op, path, "offset", payload, created, ?, ? FROM spool WHERE seq = ?',
+                    (time.time(), f"{type(error).__name__}: {error}", entry.seq),
+                )
+                self._conn.execute("DELETE FROM spool WHERE seq = ?", (entry.seq,))
+            self._paths[entry.path] -= 1
+            if self._paths[entry.path] <= 0:
+                del self._paths[entry.path]
+
+    def dead_letters(self) -> list[tuple[SpoolEntry, str]]:
+        """The dead-lettered entries and their errors, in sequence order."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT seq, op, path, "offset", payload, error FROM dead_letter ORDER BY seq'
+            ).fetchall()
+        return [
+            (
+                SpoolEntry(seq=seq, op=op, path=tuple(json.loads(path)), offset=offset, payload=decode_payload(op, data)),
+                error,
+            )
+            for seq, op, path, offset, data, error in rows
+        ]
+
+    def start_replay(self, apply: Callable[[SpoolEntry], None]) -> None:
+        """Start replaying in the background, unless the spool is empty or already replaying."""
+        if not len(self) or (self._replay_task is not None and not self._replay_task.done()):
+            return
+        self._replay_task = asyncio.create_task(self.replay(apply))
+
+    async def replay(self, apply: Callable[[SpoolEntry], None]) -> None:
+        """
+        Make the spooled writes with apply, in sequence order, until the spool is empty.
+        While apply fails with a transient error, e.g. Tiled is still down, it is retried
+        every ``retry_s`` seconds. Any other failure moves the entry to the dead letters.
+        """
+        logger.info(f"Replaying {len(self)} spooled Tiled writes")
+        while True:
+            entries = await asyncio.to_thread(self.peek, 1)
+            if not entries:
+                logger.info("Spooled Tiled writes replayed")
+                return
+            entry = entries[0]
+            try:
+                await asyncio.to_thread(apply, entry)
+            except Exception as e:
+                if not is_transient(e):
+                    logger.error(
+                        f"Spooled {entry.op} of {'/'.join(entry.path)} was rejected, moving it to the dead letters: {e}"
+                    )
+                    await asyncio.to_thread(self.dead_letter, entry, e)
+                    continue
+                logger.warning(f"Could not replay spooled {entry.op} of {'/'.join(entry.path)}, {len(self)} pending: {e}")
+                await asyncio.sleep(self.retry_s)
+                continue
+            await asyncio.to_thread(self.remove, entry)
+            await asyncio.sleep(1 / self.replay_rate)
+
+    def close(self) -> None:
+        if self._replay_task is not None:
+            self._replay_task.cancel()
+        with self._lock:
+            self._conn.close()
+
+
+def fill_value(dtype):
+    """The value of rows allocated but not yet written: NaN, or zero for non-float dtypes."""
+    return np.nan if np.issubdtype(np.dtype(dtype), np.floating) else 0
+
+
+def ensure_container(root, path: tuple):
+    """The container at path below root, creating missing containers on the way."""
+    container = root
+    for key in path:
+        container = container[key] if key in container else container.create_container(key)
+    return container
+
+
+def write_rows(parent, key: str, rows: np.ndarray, offset: int) -> None:
+    """Write rows of the array node parent[key] from offset, creating the node (NaN or zero before offset) if missing."""
+    if key in parent:
+        parent[key].patch(rows, offset=(offset,), extend=True)
+        return
+    if offset:
+        padded = np.full((offset + len(rows), *rows.shape[1:]), fill_value(rows.dtype), dtype=rows.dtype)
+        padded[offset:] = rows
+        rows = padded
+    parent.write_array(rows, key=key)
@@ -29,8 +29,11 @@ from ..schemas import (
     SASStop,
     SerializableNumpyArrayModel,
 )
+from .spool import OP_CONTAINER, OP_ROWS, SpoolEntry, TiledSpool, ensure_container, fill_value, write_rows
 
 RUNS_CONTAINER_NAME = "runs"
+ONE_D_REDUCTION_KEY = "one_d_reduction"
+DIM_REDUCTION_KEY = "dim_reduction"
 
 logger = logging.getLogger(__name__)
 
@@ -327,47 +330,290 @@ def unsent_frame_numbers(sent_frames: list, num_frames: int):
     return gaps + extra_numbers
 
 
+class TiledRowWriter:
+    """
+    Write-behind rows of a Tiled array node whose first axis grows by one row per message.
+
+    Rows are queued locally and ``flush`` appends all of them with a single
+    ``patch(..., extend=True)`` at the locally tracked row offset, instead of reading the
+    node's shape and patching one row per message. Rows that do not match the width of the
+    node are dropped.
+
+    The node is grown ``chunk_rows`` rows at a time: a patch that runs past ``capacity``
+    is padded with NaN up to the next multiple of chunk_rows, so the node's length stays
+    aligned with its chunks. Rows past ``rows_written`` are padding; rows are stored as
+    floats so padding can not be mistaken for data, and each flush that reaches Tiled
+    records ``rows_written`` in the node's ``rows`` metadata.
+
+    Without a spool, a failed patch keeps its rows queued for the next flush. With one,
+    they are spooled at their offset, as are all rows while the node (``path`` below the
+    spool's root) is not known to exist or has earlier spooled writes.
+    """
+
+    def __init__(
+        self,
+        array_client: ArrayClient,
+        row_shape: tuple,
+        dtype,
+        rows_written: int = 1,
+        path: tuple = None,
+        spool: TiledSpool = None,
+        chunk_rows: int = 1,
+        capacity: int = None,
+    ):
+        self.array_client = array_client
+        self.row_shape = tuple(row_shape)
+        self.dtype = row_dtype(dtype)
+        self.rows_written = rows_written
+        # Row count last recorded in the node's metadata, at creation
+        self.rows_recorded = rows_written
+        self.path = path
+        self.spool = spool
+        self.chunk_rows = chunk_rows
+        self.capacity = rows_written if capacity is None else capacity
+        self.pending: list[np.ndarray] = []
+
+    def add(self, row: np.ndarray) -> None:
+        row = np.asarray(row)
+        if row.shape != self.row_shape:
+            logger.warning(f"Dropping row of shape {row.shape}, the Tiled node has rows of shape {self.row_shape}")
+            return
+        self.pending.append(row)
+
+    def flush(self) -> int:
+        """Patch (or spool) the queued rows at the end of the node, returning how many were written."""
+        rows = self.pending
+        self.pending = []
+        if not rows:
+            return 0
+        array = np.stack(rows).astype(self.dtype, copy=False)
+        end = self.rows_written + len(rows)
+        capacity = self.capacity
+        if end > capacity:
+            capacity = -(-end // self.chunk_rows) * self.chunk_rows
+            padding = np.full((capacity - end, *self.row_shape), fill_value(self.dtype), dtype=self.dtype)
+            array = np.concatenate([array, padding])
+        patched = False
+        if self.spool is not None and (self.array_client is None or self.spool.blocks(self.path)):
+            self.spool.append(OP_ROWS, self.path, array, offset=self.rows_written)
+        else:
+            try:
+                self.array_client.patch(array, offset=(self.rows_written,), extend=True)
+                patched = True
+            except Exception as e:
+                if self.spool is None:
+                    self.pending = rows + self.pending
+                    raise
+                logger.warning(f"Spooling {len(rows)} rows of {'/'.join(self.path)}: {e}")
+                self.spool.append(OP_ROWS, self.path, array, offset=self.rows_written)
+        self.rows_written = end
+        self.capacity = capacity
+        if patched:
+            try:
+                self.write_row_count()
+            except Exception as e:
+                # The rows are written, the count is recorded again by the next flush or at SASStop
+                logger.warning(f"Could not record the row count of {'/'.join(self.path or ())}: {e}")
+        return len(rows)
+
+    def write_row_count(self) -> None:
+        """Record the number of rows written, as opposed to allocated, in the node's metadata."""
+        if self.rows_recorded == self.rows_written:
+            return
+        if self.array_client is None or (self.spool is not None and self.spool.blocks(self.path)):
+            return
+        self.array_client.update_metadata(metadata=row_metadata(self.rows_written, self.chunk_rows))
+        self.rows_recorded = self.rows_written
+
+
+class ProcessedRun:
+    """The Tiled run container of one run and the row writers of its array nodes, by key."""
+
+    def __init__(self, run_id: str, key: str, node: Container = None):
+        self.run_id = run_id
+        # Key of the run container below the publisher's root container
+        self.key = key
+        self.node = node
+        self.writers: dict[str, TiledRowWriter] = {}
+        self.stopped = False
+
+
 class TiledProcessedPublisher(Publisher):
-    run_node = None
-    one_d_array_node = None
-    dim_reduced_array_node = None
+    """
+    Writes the 1D reductions and latent vectors of each run to array nodes of its Tiled
+    run container, one row per frame.
 
-    def __init__(self, root_container: Container) -> None:
+    Nodes are kept per run, keyed by ``run_id``: a SASStart of a new run starts new nodes,
+    while a repeated SASStart of the current run keeps appending to its nodes.
+
+    Each node is created ``rows_per_chunk`` rows long, so Tiled chunks it ``rows_per_chunk``
+    rows deep, and grows a chunk at a time (see TiledRowWriter). The number of rows
+    written is kept in the node's ``rows`` metadata, updated with every flush. Later rows are
+    queued and patched in batches every ``flush_interval_s`` seconds and at SASStop, in a
+    worker thread, so Tiled requests do not hold up the operator.
+
+    With ``spool_path`` set, writes that fail because Tiled is unreachable (creating the
+    run container or a node, or patching rows) are kept in a TiledSpool at that path and
+    replayed in order, ``replay_rate`` per second, once Tiled is back.
+    """
+
+    def __init__(
+        self,
+        root_container: Container,
+        flush_interval_s: float = 1.0,
+        spool_path: str = None,
+        replay_rate: float = 20,
+        rows_per_chunk: int = 256,
+    ) -> None:
         super().__init__()
         self.root_container = root_container
+        self.flush_interval_s = flush_interval_s
+        self.rows_per_chunk = rows_per_chunk
+        self.spool = TiledSpool(spool_path, replay_rate=replay_rate) if spool_path else None
+        self.runs: dict[str, ProcessedRun] = {}
+        # The run that reductions and latent vectors are written to
+        self.run: ProcessedRun = None
+        self._flush_timer: asyncio.Task = None
+        self._flush_lock = asyncio.Lock()
 
     async def publish(self, message: Union[SASStart | SAS1DReduction | LatentSpaceEvent | SASStop]) -> None:
         try:
             if isinstance(message, SASStart):
-                self.run_node = await asyncio.to_thread(get_run_container, self.root_container, message)
+                await self.flush()
+                await self._start_run(message)
                 return
-            if self.run_node is None:
+            if self.run is None or (self.run.node is None and self.spool is None):
                 logger.error("No run node found. Probably started after start message.")
                 return
             elif isinstance(message, SASStop):
+                await self.flush()
+                await self._stop_run()
                 return
 
             if isinstance(message, SAS1DReduction):
-                if self.one_d_array_node is None:
-                    one_d_array_node = await asyncio.to_thread(create_one_d_node, self.run_node, message)
-                    self.one_d_array_node = one_d_array_node
-                else:
-                    await asyncio.to_thread(self.update_1d_nodes, message)
-
+                await self._add_row(ONE_D_REDUCTION_KEY, np.asarray(message.curve.array))
             elif isinstance(message, LatentSpaceEvent):  # Changed from 'if' to 'elif'
-                if self.dim_reduced_array_node is None:
-                    dim_reduced_array_node = await asyncio.to_thread(create_dim_reduction_node, self.run_node, message)
-                    self.dim_reduced_array_node = dim_reduced_array_node
-                else:
-                    await asyncio.to_thread(self.update_ls_nodes, message)
+                if message.reprojected:
+                    # The run's rows were written with the previous dimred model
+                    return
+                await self._add_row(DIM_REDUCTION_KEY, np.array(message.feature_vector))
+            self._schedule_flush()
         except Exception as e:
             logger.error(f"Error in publisher: {e}")
+        finally:
+            if self.spool is not None:
+                self.spool.start_replay(self._apply_spooled)
+
+    async def _start_run(self, message: SASStart) -> None:
+        # Stopped runs are done with; rows arriving after SASStop still go to the current run
+        self.runs = {run_id: run for run_id, run in self.runs.items() if not run.stopped or run_id == message.run_id}
+        run = self.runs.get(message.run_id)
+        if run is None:
+            run = ProcessedRun(message.run_id, message.run_name + "_" + message.run_id)
+            run.node = await self._open_run(run, message)
+            self.runs[message.run_id] = run
+        else:
+            logger.info(f"Run {run.key} started again, appending to its nodes")
+        run.stopped = False
+        self.run = run
+
+    async def _stop_run(self) -> None:
+        self.run.stopped = True
+        for writer in self.run.writers.values():
+            try:
+                await asyncio.to_thread(writer.write_row_count)
+            except Exception as e:
+                logger.warning(f"Could not record the row count of {'/'.join(writer.path)}: {e}")
 
-    def update_1d_nodes(self, message: SAS1DReduction) -> None:
-        patch_tiled_frame(self.one_d_array_node, message.curve.array)
+    async def _open_run(self, run: ProcessedRun, message: SASStart) -> Container:
+        """The run container, or None when its creation was spooled."""
+        if self.spool is None:
+            return await asyncio.to_thread(get_run_container, self.root_container, message)
+        if not self.spool.blocks((run.key,)):
+            try:
+                return await asyncio.to_thread(get_run_container, self.root_container, message)
+            except Exception as e:
+                logger.warning(f"Spooling creation of run container {run.key}: {e}")
+        self.spool.append(OP_CONTAINER, (run.key,))
+        return None
+
+    async def _add_row(self, key: str, row: np.ndarray) -> None:
+        writer = self.run.writers.get(key)
+        if writer is None:
+            self.run.writers[key] = await self._create_node(key, row)
+        else:
+            writer.add(row)
+
+    async def _create_node(self, key: str, first_row: np.ndarray) -> TiledRowWriter:
+        """Create (or spool) a node of the current run holding first_row, returning its row writer."""
+        path = (self.run.key, key)
+        rows = allocate_rows(first_row, self.rows_per_chunk)
+        node = None
+        if self.spool is None:
+            node = await asyncio.to_thread(create_row_node, self.run.node, key, rows)
+        elif self.run.node is not None and not self.spool.blocks(path):
+            try:
+                node = await asyncio.to_thread(create_row_node, self.run.node, key, rows)
+            except Exception as e:
+                logger.warning(f"Spooling creation of {'/'.join(path)}: {e}")
+        if node is None:
+            self.spool.append(OP_ROWS, path, rows, offset=0)
+        return TiledRowWriter(
+            node,
+            first_row.shape,
+            rows.dtype,
+            path=path,
+            spool=self.spool,
+            chunk_rows=self.rows_per_chunk,
+            capacity=len(rows),
+        )
 
-    def update_ls_nodes(self, message: LatentSpaceEvent) -> None:
-        patch_tiled_frame(self.dim_reduced_array_node, np.array(message.feature_vector))
+    def _writers(self) -> list[TiledRowWriter]:
+        return [writer for run in self.runs.values() for writer in run.writers.values()]
+
+    def _schedule_flush(self) -> None:
+        if self._flush_timer is None and any(writer.pending for writer in self._writers()):
+            self._flush_timer = asyncio.create_task(self._flush_after_wait())
+
+    async def _flush_after_wait(self) -> None:
+        await asyncio.sleep(self.flush_interval_s)
+        # Cleared before flushing so that rows queued meanwhile schedule the next flush
+        self._flush_timer = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Patch every queued row into Tiled."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        # Flushes run one at a time so each patch starts where the previous one ended
+        async with self._flush_lock:
+            for writer in self._writers():
+                try:
+                    written = await asyncio.to_thread(self._flush_writer, writer)
+                    logger.debug(f"Patched {written} rows into Tiled")
+                except Exception as e:
+                    logger.error(f"Error patching {len(writer.pending)} rows into Tiled: {e}")
+        if self.spool is not None:
+            self.spool.start_replay(self._apply_spooled)
+
+    def _flush_writer(self, writer: TiledRowWriter) -> int:
+        if writer.array_client is None and writer.pending and not self.spool.blocks(writer.path):
+            # The spooled creation of the node has been replayed
+            try:
+                writer.array_client = self.root_container[writer.path]
+            except Exception as e:
+                logger.debug(f"Node {'/'.join(writer.path)} not available yet: {e}")
+        return writer.flush()
+
+    def _apply_spooled(self, entry: SpoolEntry) -> None:
+        if entry.op == OP_CONTAINER:
+            ensure_container(self.root_container, entry.path)
+        elif entry.op == OP_ROWS:
+            parent = ensure_container(self.root_container, entry.path[:-1])
+            write_rows(parent, entry.path[-1], entry.payload, entry.offset)
+        else:
+            logger.error(f"Dropping spooled {entry.op} of {'/'.join(entry.path)}, not written by this publisher")
 
     def get_run_path(self, message):
         return message.run_id
@@ -380,25 +626,57 @@ class TiledProcessedPublisher(Publisher):
         return cls(root_container)
 
 
-def create_tiled_processed_publisher(uri: str, root_segments: list, api_key: str = None) -> TiledProcessedPublisher:
+def create_tiled_processed_publisher(
+    uri: str,
+    root_segments: list,
+    api_key: str = None,
+    flush_interval_s: float = 1.0,
+    spool_path: str = None,
+    replay_rate: float = 20,
+    rows_per_chunk: int = 256,
+) -> TiledProcessedPublisher:
     import os
 
     if api_key is None:
         api_key = os.environ.get("TILED_LIVE_API_KEY")
     client = from_uri(uri, api_key=api_key)
     root_container = get_runs_container(client, root_segments)
-    return TiledProcessedPublisher(root_container)
+    return TiledProcessedPublisher(
+        root_container,
+        flush_interval_s=flush_interval_s,
+        spool_path=spool_path,
+        replay_rate=replay_rate,
+        rows_per_chunk=rows_per_chunk,
+    )
+
+
+def row_metadata(rows: int, chunk_rows: int) -> dict:
+    return {"rows": rows, "chunk_rows": chunk_rows}
+
 
+def row_dtype(dtype) -> np.dtype:
+    """The dtype rows are stored as: floats as they are, anything else as float64 so padding is NaN."""
+    dtype = np.dtype(dtype)
+    return dtype if np.issubdtype(dtype, np.floating) else np.dtype(np.float64)
 
-def create_one_d_node(run_node: Container, message: SAS1DReduction) -> None:
-    one_d_array_node = run_node.write_array(message.curve.array[np.newaxis, :], key="one_d_reduction")
-    return one_d_array_node
 
+def allocate_rows(first_row: np.ndarray, chunk_rows: int) -> np.ndarray:
+    """The first chunk of a row node: first_row followed by chunk_rows - 1 rows of NaN padding."""
+    first_row = np.asarray(first_row)
+    dtype = row_dtype(first_row.dtype)
+    rows = np.full((max(chunk_rows, 1), *first_row.shape), fill_value(dtype), dtype=dtype)
+    rows[0] = first_row
+    return rows
 
-def create_dim_reduction_node(run_node: Container, message: LatentSpaceEvent) -> None:  # Changed parameter type
-    arr = np.array(message.feature_vector)
-    dim_reduction_node = run_node.write_array(arr[np.newaxis, :], key="dim_reduction")
-    return dim_reduction_node
+
+def create_row_node(run_node: Container, key: str, rows: np.ndarray) -> ArrayClient:
+    """
+    Create the array node run_node[key] from its first chunk of rows (see allocate_rows).
+
+    Tiled chunks a node by the shape it is created with, so the length of rows sets how
+    many rows each chunk of the node holds.
+    """
+    return run_node.write_array(rows, key=key, metadata=row_metadata(1, len(rows)))
 
 
 def get_runs_container(client: Container, root_segments: list) -> Container:
@@ -450,6 +728,12 @@ def create_array_node(run_container: Container, key: str, array: np.ndarray) ->
     return run_container.write_array(array, key=key)
 
 
+def writer_for_node(array_client: ArrayClient) -> TiledRowWriter:
+    """A TiledRowWriter for an existing node, reading its shape once."""
+    shape = array_client.shape
+    return TiledRowWriter(array_client, shape[1:], array_client.dtype, rows_written=shape[0])
+
+
 def patch_tiled_frame(array_client: ArrayClient, array: np.ndarray) -> None:
     shape = array_client.shape
     offset = (shape[0],)
@@ -1,32 +1,79 @@
 import asyncio
+import io
 import json
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Union
+from urllib.parse import parse_qs, urlparse
 
 import msgpack
 import numpy as np
 import websockets
 from arroyopy.publisher import Publisher
+from PIL import Image
 
 from .schemas import SAS1DReduction, SASStart, SASStop
 
 logger = logging.getLogger(__name__)
 
+# Little-endian typed arrays the browser can view directly
+CURVE_DTYPES = {"float16": "<f2", "float32": "<f4"}
+FLOAT16_MAX = float(np.finfo(np.float16).max)
+
+# Preview frame encodings, png and webp are both lossless
+IMAGE_FORMATS = ("raw", "png", "webp")
+# Each level halves the preview in both directions
+MAX_PREVIEW_LEVEL = 4
+
 
 class OneDWSPublisher(Publisher):
     """
     A publisher class for sending XPSResult messages over a web sockets.
 
+    The current run (start message, the last ``history_size`` curves and the latest
+    preview frame) is kept in memory so that clients connecting mid-run receive it
+    as a single snapshot instead of waiting for the next frame.
+
+    Curves are sent as ``curve_dtype`` typed arrays. The q axis is only included in
+    the first frame of a run and whenever the geometry changes.
+
+    Preview frames are encoded as ``image_format`` (raw uint8, or lossless png/webp) on a
+    dedicated pool of ``encode_workers`` threads, once per requested level. Clients ask
+    for a downsampled preview with ``/viz?level=N``. When all workers are busy compressing
+    earlier previews, the frame is sent with its curve but without a preview rather than
+    queued. Raw previews are not compressed and always sent.
     """
 
     websocket_server = None
     connected_clients = set()
     current_start_message = None
 
-    def __init__(self, host: str = "localhost", port: int = 8001):
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 8001,
+        history_size: int = 100,
+        curve_dtype: str = "float32",
+        image_format: str = "raw",
+        encode_workers: int = 2,
+    ):
         super().__init__()
+        if curve_dtype not in CURVE_DTYPES:
+            raise ValueError(f"Unsupported curve_dtype {curve_dtype}, expected one of {list(CURVE_DTYPES)}")
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image_format {image_format}, expected one of {list(IMAGE_FORMATS)}")
         self.host = host
         self.port = port
+        self.curve_dtype = curve_dtype
+        self.image_format = image_format
+        self.encode_workers = encode_workers
+        self.encode_executor = ThreadPoolExecutor(max_workers=encode_workers, thread_name_prefix="preview_encode")
+        self.frames_in_flight = 0
+        self.client_levels = {}
+        self.current_q: np.ndarray = None
+        self.recent_curves = deque(maxlen=history_size)
+        self.latest_frame: SAS1DReduction = None
 
     async def start(
         self,
@@ -37,18 +84,76 @@ class OneDWSPublisher(Publisher):
             self.host,
             self.port,
         )
+        self.websocket_server = server
         logger.info(f"Websocket server started at ws://{self.host}:{self.port}")
-        await server.wait_closed()
+        try:
+            await server.wait_closed()
+        finally:
+            self.encode_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def stop(self):
+        """Close the server, the preview encoders are shut down once it has closed."""
+        if self.websocket_server is not None:
+            self.websocket_server.close()
+            await self.websocket_server.wait_closed()
 
     async def publish(self, message: SAS1DReduction) -> None:
-        if self.connected_clients:  # Only send if there are clients connected
-            asyncio.gather(*(self.publish_ws(client, message) for client in self.connected_clients))
+        self.update_history(message)
+        include_q = self.geometry_changed(message)
+        if not self.connected_clients:  # Only send if there are clients connected
+            return
+        if isinstance(message, SAS1DReduction):
+            asyncio.gather(self.publish_frame(message, include_q))
+            return
+        asyncio.gather(*(self.publish_ws(client, message, include_q) for client in self.connected_clients))
+
+    async def encode_frame(self, message: SAS1DReduction, include_q: bool, level: int) -> bytes:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.encode_executor,
+            pack_images,
+            message,
+            self.curve_dtype,
+            include_q,
+            self.image_format,
+            level,
+        )
+
+    async def publish_frame(self, message: SAS1DReduction, include_q: bool) -> None:
+        """Encode the frame once per requested level and send it to the clients that asked for that level."""
+        clients = list(self.connected_clients)
+        if self.image_format != "raw" and self.frames_in_flight >= self.encode_workers:
+            await self.publish_curve(message, include_q, clients)
+            return
+        self.frames_in_flight += 1
+        try:
+            levels = sorted({self.client_levels.get(client, 0) for client in clients})
+            bundles = await asyncio.gather(*(self.encode_frame(message, include_q, level) for level in levels))
+            by_level = dict(zip(levels, bundles))
+            await asyncio.gather(
+                *(client.send(by_level[self.client_levels.get(client, 0)]) for client in clients),
+                return_exceptions=True,
+            )
+        except Exception as e:
+            logger.error(f"Error publishing frame: {e}")
+        finally:
+            self.frames_in_flight -= 1
+
+    async def publish_curve(self, message: SAS1DReduction, include_q: bool, clients: list) -> None:
+        """Send the frame's curve without a preview, packed on the event loop as there is no image to encode."""
+        logger.debug("Preview encoders busy, sending curve without preview")
+        try:
+            bundle = pack_images(message, self.curve_dtype, include_q, self.image_format, include_preview=False)
+            await asyncio.gather(*(client.send(bundle) for client in clients), return_exceptions=True)
+        except Exception as e:
+            logger.error(f"Error publishing curve: {e}")
 
     async def publish_ws(
         self,
         #  client: websockets.client.ClientConnection,
         client,
         message: Union[SAS1DReduction | SASStart | SASStop],
+        include_q: bool = False,
     ) -> None:
         if isinstance(message, SASStop):
             logger.info(f"WS Sending Stop {message}")
@@ -63,33 +168,139 @@ class OneDWSPublisher(Publisher):
             return
 
         # send image data separately to client memory issues
-        image_bundle = await asyncio.to_thread(pack_images, message)
+        image_bundle = await self.encode_frame(message, include_q, self.client_levels.get(client, 0))
 
         await client.send(image_bundle)
 
+    def update_history(self, message: Union[SAS1DReduction | SASStart | SASStop]) -> None:
+        if isinstance(message, SASStart):
+            self.current_start_message = message
+            self.recent_curves.clear()
+            self.latest_frame = None
+        elif isinstance(message, SASStop):
+            # The curves stay available so a late client can still see the finished run
+            self.current_start_message = None
+        elif isinstance(message, SAS1DReduction):
+            self.recent_curves.append(message)
+            if message.raw_frame is not None:
+                self.latest_frame = message
+
+    def geometry_changed(self, message) -> bool:
+        """Track the q axis, returning True when it differs from the one clients already have."""
+        if isinstance(message, SASStart):
+            self.current_q = None
+            return False
+        if not isinstance(message, SAS1DReduction) or message.q is None:
+            return False
+        q = message.q.array
+        if self.current_q is not None and np.array_equal(q, self.current_q):
+            return False
+        self.current_q = q
+        return True
+
+    def snapshot(self, level: int = 0, preview: dict = None) -> bytes:
+        return pack_snapshot(
+            self.current_start_message,
+            list(self.recent_curves),
+            None,
+            self.curve_dtype,
+            self.current_q,
+            self.image_format,
+            level,
+            preview=preview,
+        )
+
+    async def encode_snapshot_preview(self, level: int) -> dict:
+        """The latest preview for a new client, encoded on the preview encoders rather than the event loop."""
+        latest_frame = self.latest_frame
+        if latest_frame is None:
+            return None
+        loop = asyncio.get_running_loop()
+        preview = await loop.run_in_executor(
+            self.encode_executor, image_bundle, latest_frame, self.curve_dtype, False, self.image_format, level
+        )
+        # A run started while encoding has no preview yet
+        return preview if self.latest_frame is not None else None
+
     async def websocket_handler(self, websocket):
         logger.info(f"New connection from {websocket.remote_address}")
-        if websocket.request.path != "/viz":
+        url = urlparse(websocket.request.path)
+        if url.path != "/viz":
             logger.info(f"Invalid path: {websocket.request.path}, we only support /viz")
             return
+        level = parse_preview_level(url.query)
+        preview = await self.encode_snapshot_preview(level)
+        # Packed before the client is registered, with no await in between, so the
+        # snapshot is followed by exactly the messages published after it
+        snapshot = self.snapshot(level, preview) if self.current_start_message or self.recent_curves else None
+        self.client_levels[websocket] = level
         self.connected_clients.add(websocket)
         try:
+            if snapshot is not None:
+                await websocket.send(snapshot)
             # Keep the connection open and do nothing until the client disconnects
             await websocket.wait_closed()
         finally:
             # Remove the client when it disconnects
             self.connected_clients.remove(websocket)
+            self.client_levels.pop(websocket, None)
             logger.info("Client disconnected")
 
     @classmethod
     def from_settings(cls, settings: dict) -> "OneDWSPublisher":
-        return cls(settings.host, settings.port)
+        return cls(
+            settings.host,
+            settings.port,
+            history_size=settings.get("history_size", 100),
+            curve_dtype=settings.get("curve_dtype", "float32"),
+            image_format=settings.get("image_format", "raw"),
+            encode_workers=settings.get("encode_workers", 2),
+        )
+
+
+def parse_preview_level(query: str) -> int:
+    """Read the requested preview level from a query string, clamped to the supported range."""
+    try:
+        level = int(parse_qs(query).get("level", ["0"])[0])
+    except ValueError:
+        return 0
+    return min(max(level, 0), MAX_PREVIEW_LEVEL)
+
+
+def downsample(image: np.ndarray, level: int) -> np.ndarray:
+    """Block-average an image by 2**level in both directions, cropping any remainder."""
+    if level <= 0:
+        return image
+    factor = 2**level
+    height = image.shape[0] // factor * factor
+    width = image.shape[1] // factor * factor
+    if height == 0 or width == 0:
+        return image
+    blocks = image[:height, :width].reshape(height // factor, factor, width // factor, factor)
+    return blocks.mean(axis=(1, 3))
+
+
+def encode_preview(image_uint8: np.ndarray, image_format: str) -> bytes:
+    """Losslessly compress a uint8 preview, Pillow releases the GIL while encoding."""
+    buffer = io.BytesIO()
+    if image_format == "webp":
+        Image.fromarray(image_uint8).save(buffer, format="WEBP", lossless=True, method=0)
+    else:
+        Image.fromarray(image_uint8).save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
 
 
 def convert_to_uint8(image: np.ndarray) -> bytes:
     """
     Convert an image to uint8, scaling image
     """
+    return scale_to_uint8(image).tobytes()
+
+
+def scale_to_uint8(image: np.ndarray) -> np.ndarray:
+    """
+    Log-stretch an image into a uint8 array
+    """
     # scaled = (image - image.min()) / (image.max() - image.min()) * 255
     # return scaled.astype(np.uint8).tobytes()
 
@@ -103,27 +314,106 @@ def convert_to_uint8(image: np.ndarray) -> bytes:
 
     # Convert to uint8 (range [0, 255])
     image_uint8 = (log_stretched_normalized * 255).astype(np.uint8)
-    return image_uint8.tobytes()
+    return image_uint8
 
 
-def pack_images(message: SAS1DReduction) -> bytes:
+def encode_curve(curve: np.ndarray, curve_dtype: str = "float32") -> tuple[bytes, str]:
+    """
+    Encode a 1D curve as a little-endian typed array.
+    float16 tops out at 65504, curves that would overflow are sent as float32 instead.
+    Returns the bytes and the dtype actually used.
+    """
+    if curve_dtype == "float16":
+        finite = curve[np.isfinite(curve)]
+        if finite.size and np.abs(finite).max() > FLOAT16_MAX:
+            curve_dtype = "float32"
+    return np.asarray(curve, dtype=CURVE_DTYPES[curve_dtype]).tobytes(), curve_dtype
+
+
+def image_bundle(
+    message: SAS1DReduction,
+    curve_dtype: str = "float32",
+    include_q: bool = False,
+    image_format: str = "raw",
+    level: int = 0,
+    include_preview: bool = True,
+) -> dict:
+    """The frame's curve and, with include_preview, its preview image; clients only draw a preview if raw_frame is present."""
+    curve, curve_dtype = encode_curve(message.curve.array, curve_dtype)
+    bundle = {
+        "curve": curve,
+        "curve_dtype": curve_dtype,
+        "raw_frame_tiled_url": message.raw_frame_tiled_url,
+        "curve_tiled_url": message.curve_tiled_url,
+    }
+    if include_preview and message.raw_frame is not None:
+        preview = scale_to_uint8(downsample(message.raw_frame.array, level))
+        bundle.update(
+            {
+                "raw_frame": preview.tobytes() if image_format == "raw" else encode_preview(preview, image_format),
+                "image_format": image_format,
+                "level": level,
+                "width": preview.shape[0],
+                "height": preview.shape[1],
+                "data_type": message.raw_frame.array.dtype.name,
+            }
+        )
+    if include_q and message.q is not None:
+        # q is always float32, float16 does not resolve neighbouring q bins
+        bundle["q"] = np.asarray(message.q.array, dtype="<f4").tobytes()
+    return bundle
+
+
+def pack_images(
+    message: SAS1DReduction,
+    curve_dtype: str = "float32",
+    include_q: bool = False,
+    image_format: str = "raw",
+    level: int = 0,
+    include_preview: bool = True,
+) -> bytes:
     """
     Pack all the images into a single msgpack message
     """
     try:
+        return msgpack.packb(image_bundle(message, curve_dtype, include_q, image_format, level, include_preview))
+    except Exception as e:
+        logger.error(f"Error packing images: {e}")
+        raise e
+
+
+def pack_snapshot(
+    start: SASStart,
+    curves: list[SAS1DReduction],
+    latest_frame: SAS1DReduction,
+    curve_dtype: str = "float32",
+    q: np.ndarray = None,
+    image_format: str = "raw",
+    level: int = 0,
+    preview: dict = None,
+) -> bytes:
+    """
+    Pack the state of the current run into a single msgpack message for a newly connected client.
+    Curves are oldest first, each with its own dtype in ``curve_dtypes``. ``preview`` is an
+    already encoded image_bundle, used instead of encoding ``latest_frame``.
+    """
+    try:
+        encoded = [encode_curve(c.curve.array, curve_dtype) for c in curves]
+        if preview is None and latest_frame is not None:
+            preview = image_bundle(latest_frame, curve_dtype, False, image_format, level)
         return msgpack.packb(
             {
-                "raw_frame": convert_to_uint8(message.raw_frame.array),
-                "curve": convert_to_uint8(message.curve.array),
-                "raw_frame_tiled_url": message.raw_frame_tiled_url,
-                "curve_tiled_url": message.curve_tiled_url,
-                "width": message.raw_frame.array.shape[0],
-                "height": message.raw_frame.array.shape[1],
-                "data_type": message.raw_frame.array.dtype.name,
+                "msg_type": "snapshot",
+                "start": start.model_dump() if start else None,
+                "curves": [curve for curve, _ in encoded],
+                "curve_dtypes": [dtype for _, dtype in encoded],
+                "curve_tiled_urls": [c.curve_tiled_url for c in curves],
+                "q": np.asarray(q, dtype="<f4").tobytes() if q is not None else None,
+                "preview": preview,
             }
         )
     except Exception as e:
-        logger.error(f"Error packing images: {e}")
+        logger.error(f"Error packing snapshot: {e}")
         raise e
 
 
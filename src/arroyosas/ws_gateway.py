@@ -0,0 +1,359 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Union
+from urllib.parse import parse_qs, urlparse
+
+import msgpack
+import numpy as np
+import websockets
+from arroyopy.publisher import Publisher
+from pydantic import BaseModel
+
+from .lse_reduction import schemas as lse_schemas
+from .lse_reduction.publisher import LatentNameDictionary, latent_batch
+from .schemas import LatentSpaceEvent, RawFrameEvent, SAS1DReduction, SASStart, SASStop
+from .websockets import CURVE_DTYPES, IMAGE_FORMATS, encode_curve, encode_preview, scale_to_uint8
+
+logger = logging.getLogger(__name__)
+
+TOPIC_RUN = "run"
+TOPIC_VIZ = "viz"
+TOPIC_CURVES = "curves"
+TOPIC_LATENT = "latent"
+# "Try again later", sent to clients whose send queue overflowed
+CLOSE_OVERFLOW = 1013
+
+
+class TopicConfig(BaseModel):
+    """
+    Per-topic settings for the gateway.
+
+    compress: negotiate permessage-deflate for connections that only subscribe to compressed topics
+    history: number of encoded messages replayed to a client that subscribes mid-run
+    lossy: messages may be dropped for a client whose send queue is full
+    """
+
+    compress: bool
+    history: int
+    lossy: bool
+
+
+DEFAULT_TOPICS = {
+    TOPIC_RUN: TopicConfig(compress=True, history=2, lossy=False),
+    TOPIC_VIZ: TopicConfig(compress=False, history=1, lossy=True),
+    TOPIC_CURVES: TopicConfig(compress=False, history=100, lossy=True),
+    TOPIC_LATENT: TopicConfig(compress=True, history=1000, lossy=False),
+}
+
+
+class GatewayClient:
+    """
+    A connected websocket, its topic subscriptions and its outgoing queue of (topic, payload),
+    holding at most max_backlog messages.
+    """
+
+    def __init__(self, websocket, topics: set[str], max_backlog: int = 5000):
+        self.websocket = websocket
+        self.topics = topics
+        self.queue = asyncio.Queue(maxsize=max_backlog)
+        self.dropped = 0
+        self.overflowed = False
+
+    def offer(self, topic: str, payload) -> bool:
+        """Queue a payload of a topic, returning False if the queue is full."""
+        try:
+            self.queue.put_nowait((topic, payload))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def drop_topics(self, topics: set[str]) -> None:
+        """Remove the queued messages of topics the client no longer subscribes to."""
+        kept = []
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            if item[0] not in topics:
+                kept.append(item)
+        for item in kept:
+            self.queue.put_nowait(item)
+
+    async def send_loop(self):
+        while True:
+            _, payload = await self.queue.get()
+            await self.websocket.send(payload)
+
+
+class WSGatewayPublisher(Publisher):
+    """
+    A single websocket server multiplexing all result channels by topic:
+
+    - ``run``: SASStart / SASStop as JSON text
+    - ``viz``: the latest raw frame preview as msgpack
+    - ``curves``: 1D reductions as msgpack typed arrays, the q axis only when the geometry changes
+    - ``latent``: batched latent space points, same encoding as the LSEWSResultPublisher binary protocol
+
+    Clients choose topics with the query string, e.g. ``ws://host:port/?topics=viz,curves``
+    (all topics when omitted), and can change them later by sending
+    ``{"subscribe": [...]}`` or ``{"unsubscribe": [...]}``; unsubscribing also drops the
+    messages of those topics still queued to the client.
+
+    Every message is encoded once and queued to each subscriber. Lossy topics are dropped
+    for clients whose queue already holds ``max_queue`` messages, so a slow browser can
+    not stall the operator or the other clients. A client whose queue reaches
+    ``max_backlog`` messages (including the history replayed on subscribe) would miss a
+    message of a lossless topic, so it is disconnected with close code 1013 instead; it
+    gets a fresh snapshot when it reconnects.
+
+    permessage-deflate is negotiated per connection during the handshake, so a connection
+    is compressed only when all of its requested topics have ``compress`` set. Clients
+    that want compressed latent points and uncompressed frames open two connections.
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 8020,
+        compressed_topics: list[str] = None,
+        max_queue: int = 100,
+        max_backlog: int = 5000,
+        latent_batch_max_events: int = 256,
+        latent_batch_interval_ms: float = 100,
+        curve_dtype: str = "float32",
+        image_format: str = "raw",
+    ):
+        super().__init__()
+        if curve_dtype not in CURVE_DTYPES:
+            raise ValueError(f"Unsupported curve_dtype {curve_dtype}, expected one of {list(CURVE_DTYPES)}")
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image_format {image_format}, expected one of {list(IMAGE_FORMATS)}")
+        self.curve_dtype = curve_dtype
+        self.image_format = image_format
+        self.current_q: np.ndarray = None
+        self.host = host
+        self.port = port
+        self.max_queue = max_queue
+        self.max_backlog = max_backlog
+        self.latent_batch_max_events = latent_batch_max_events
+        self.latent_batch_interval_ms = latent_batch_interval_ms
+
+        self.topics = {name: config.model_copy() for name, config in DEFAULT_TOPICS.items()}
+        if compressed_topics is not None:
+            for name, config in self.topics.items():
+                config.compress = name in compressed_topics
+
+        self.clients: set[GatewayClient] = set()
+        self.history = {name: deque(maxlen=config.history) for name, config in self.topics.items()}
+        self.pending_latent: list = []
+        self.pending_names: dict[str, int] = {}
+        self.name_dictionary = LatentNameDictionary()
+
+    async def start(self):
+        server = await websockets.serve(
+            self.websocket_handler,
+            self.host,
+            self.port,
+            process_request=self.process_request,
+        )
+        logger.info(f"Websocket gateway started at ws://{self.host}:{self.port}")
+        flush_task = asyncio.create_task(self._flush_loop())
+        try:
+            await server.wait_closed()
+        finally:
+            flush_task.cancel()
+
+    def parse_topics(self, path: str) -> set[str]:
+        query = parse_qs(urlparse(path).query)
+        requested = {t for value in query.get("topics", []) for t in value.split(",") if t}
+        if not requested:
+            return set(self.topics)
+        return requested & set(self.topics)
+
+    def process_request(self, connection, request):
+        """Disable permessage-deflate for connections asking for an uncompressed topic."""
+        topics = self.parse_topics(request.path)
+        if not all(self.topics[topic].compress for topic in topics):
+            connection.protocol.available_extensions = []
+        return None
+
+    async def publish(self, message: Union[SASStart | SASStop | SAS1DReduction | RawFrameEvent | LatentSpaceEvent]) -> None:
+        try:
+            if isinstance(message, SASStart):
+                await self.flush_latent()
+                for history in self.history.values():
+                    history.clear()
+                self.current_q = None
+                self.broadcast(TOPIC_RUN, message.model_dump_json())
+            elif isinstance(message, SASStop):
+                await self.flush_latent()
+                self.broadcast(TOPIC_RUN, message.model_dump_json())
+            elif isinstance(message, SAS1DReduction):
+                if message.raw_frame is not None:
+                    frame = await asyncio.to_thread(
+                        pack_viz_frame, message.raw_frame.array, message.raw_frame_tiled_url, self.image_format
+                    )
+                    self.broadcast(TOPIC_VIZ, frame)
+                include_q = message.q is not None and (
+                    self.current_q is None or not np.array_equal(message.q.array, self.current_q)
+                )
+                if include_q:
+                    self.current_q = message.q.array
+                self.broadcast(TOPIC_CURVES, pack_curve(message, self.curve_dtype, include_q))
+            elif isinstance(message, RawFrameEvent):
+                frame = await asyncio.to_thread(pack_viz_frame, message.image.array, message.tiled_url, self.image_format)
+                self.broadcast(TOPIC_VIZ, frame)
+            elif isinstance(message, (LatentSpaceEvent, lse_schemas.LatentSpaceEvent)):
+                await self._queue_latent(message)
+        except Exception as e:
+            logger.error(f"Error in websocket gateway publish: {e}")
+
+    def broadcast(self, topic: str, payload: Union[bytes | str]) -> None:
+        """Queue an already encoded payload to every subscriber of the topic."""
+        self.history[topic].append(payload)
+        lossy = self.topics[topic].lossy
+        for client in list(self.clients):
+            if topic not in client.topics:
+                continue
+            if lossy and client.queue.qsize() >= self.max_queue:
+                client.dropped += 1
+                logger.debug(f"Dropping {topic} message for slow client, {client.dropped} dropped so far")
+                continue
+            if not client.offer(topic, payload):
+                if lossy:
+                    client.dropped += 1
+                else:
+                    self.disconnect_overflowed(client)
+
+    def disconnect_overflowed(self, client: GatewayClient) -> None:
+        """Stop queueing to a client that fell too far behind and close its connection."""
+        if client.overflowed:
+            return
+        client.overflowed = True
+        self.clients.discard(client)
+        logger.warning(f"Gateway client queue full ({client.queue.qsize()} messages), disconnecting it")
+        asyncio.create_task(client.websocket.close(code=CLOSE_OVERFLOW, reason="send queue overflow"))
+
+    async def _queue_latent(self, message) -> None:
+        if message.tiled_url == "FLUSH_SIGNAL":
+            return
+        if self.pending_latent and len(message.feature_vector) != len(self.pending_latent[0].feature_vector):
+            await self.flush_latent()
+        self.pending_names.update(self.name_dictionary.register([message]))
+        self.pending_latent.append(message)
+        if len(self.pending_latent) >= self.latent_batch_max_events:
+            await self.flush_latent()
+
+    async def flush_latent(self) -> None:
+        if not self.pending_latent:
+            return
+        events = self.pending_latent
+        new_names = self.pending_names
+        self.pending_latent = []
+        self.pending_names = {}
+        batch = latent_batch(events, self.name_dictionary, new_names)
+        payload = await asyncio.to_thread(msgpack.packb, batch, use_bin_type=True)
+        self.broadcast(TOPIC_LATENT, payload)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.latent_batch_interval_ms / 1000)
+            try:
+                await self.flush_latent()
+            except Exception as e:
+                logger.error(f"Error flushing latent batch: {e}")
+
+    def subscribe(self, client: GatewayClient, topics: set[str]) -> None:
+        """Add topics to a client, replaying the recent history of each new topic."""
+        for topic in sorted(topics - client.topics, key=list(self.topics).index):
+            replay = list(self.history[topic])
+            if topic == TOPIC_CURVES and self.current_q is not None:
+                # The replayed curves may not include the frame that carried q
+                replay.insert(0, pack_curve_axis(self.current_q))
+            if topic == TOPIC_LATENT and self.name_dictionary.ids:
+                # Replayed batches only carry names new at the time they were sent
+                replay.insert(0, pack_latent_dictionary(self.name_dictionary.ids))
+            if not all(client.offer(topic, payload) for payload in replay):
+                self.disconnect_overflowed(client)
+                return
+            client.topics.add(topic)
+
+    def handle_client_message(self, client: GatewayClient, raw) -> None:
+        try:
+            request = json.loads(raw)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring malformed gateway request: {raw!r}")
+            return
+        known = set(self.topics)
+        if "subscribe" in request and not client.overflowed:
+            self.subscribe(client, set(request["subscribe"]) & known)
+        if "unsubscribe" in request:
+            removed = client.topics & set(request["unsubscribe"])
+            client.topics -= removed
+            client.drop_topics(removed)
+
+    async def websocket_handler(self, websocket):
+        logger.info(f"New gateway connection from {websocket.remote_address}")
+        client = GatewayClient(websocket, set(), self.max_backlog)
+        self.subscribe(client, self.parse_topics(websocket.request.path))
+        if not client.overflowed:
+            self.clients.add(client)
+        sender = asyncio.create_task(client.send_loop())
+        try:
+            async for raw in websocket:
+                self.handle_client_message(client, raw)
+        finally:
+            self.clients.discard(client)
+            sender.cancel()
+            logger.info(f"Gateway client disconnected, {client.dropped} messages dropped")
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> "WSGatewayPublisher":
+        return cls(
+            settings.host,
+            settings.port,
+            compressed_topics=settings.get("compressed_topics"),
+            max_queue=settings.get("max_queue", 100),
+            max_backlog=settings.get("max_backlog", 5000),
+            latent_batch_max_events=settings.get("latent_batch_max_events", 256),
+            latent_batch_interval_ms=settings.get("latent_batch_interval_ms", 100),
+            curve_dtype=settings.get("curve_dtype", "float32"),
+            image_format=settings.get("image_format", "raw"),
+        )
+
+
+def pack_viz_frame(image: np.ndarray, tiled_url: str, image_format: str = "raw") -> bytes:
+    """Pack a raw frame preview as log-stretched uint8, optionally png/webp compressed."""
+    preview = scale_to_uint8(image)
+    return msgpack.packb(
+        {
+            "msg_type": "viz",
+            "raw_frame": preview.tobytes() if image_format == "raw" else encode_preview(preview, image_format),
+            "image_format": image_format,
+            "raw_frame_tiled_url": tiled_url,
+            "width": image.shape[0],
+            "height": image.shape[1],
+            "data_type": image.dtype.name,
+        }
+    )
+
+
+def pack_curve(message: SAS1DReduction, curve_dtype: str = "float32", include_q: bool = False) -> bytes:
+    curve, curve_dtype = encode_curve(message.curve.array, curve_dtype)
+    bundle = {
+        "msg_type": "curve",
+        "curve": curve,
+        "curve_dtype": curve_dtype,
+        "curve_tiled_url": message.curve_tiled_url,
+    }
+    if include_q:
+        bundle["q"] = np.asarray(message.q.array, dtype="<f4").tobytes()
+    return msgpack.packb(bundle)
+
+
+def pack_curve_axis(q: np.ndarray) -> bytes:
+    return msgpack.packb({"msg_type": "curve_axis", "q": np.asarray(q, dtype="<f4").tobytes()})
+
+
+def pack_latent_dictionary(ids: dict[str, int]) -> bytes:
+    return msgpack.packb({"msg_type": "latent_dictionary", "dictionary": ids}, use_bin_type=True)
@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Union
+
+import numpy as np
+import zarr
+from arroyopy.publisher import Publisher
+from zarr.codecs import BloscCodec
+
+from .lse_reduction import schemas as lse_schemas
+from .schemas import LatentSpaceEvent, RawFrameEvent, SAS1DReduction, SASStart, SASStop
+
+logger = logging.getLogger(__name__)
+
+FRAME_SOURCES = ("raw", "reduction")
+
+
+class ArchiveSeries:
+    """
+    Rows of one zarr array of a run group, appended along the first axis.
+
+    Rows are buffered until ``flush``, which appends them with one write. The array is
+    created on the first flush with the shape and dtype of the first row; rows of another
+    shape are dropped.
+    """
+
+    def __init__(self, name: str, chunk_rows: int, dtype=None, tile: int = None):
+        self.name = name
+        self.chunk_rows = chunk_rows
+        self.dtype = dtype
+        self.tile = tile
+        self.row_shape: tuple = None
+        self.pending: list[np.ndarray] = []
+        self.array: zarr.Array = None
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, row) -> bool:
+        """Buffer a row, returning whether it was accepted."""
+        row = np.asarray(row, dtype=self.dtype)
+        if self.row_shape is None:
+            self.row_shape = row.shape
+        elif row.shape != self.row_shape:
+            logger.warning(f"Dropping {self.name} row of shape {row.shape}, the archive has rows of shape {self.row_shape}")
+            return False
+        self.pending.append(row)
+        return True
+
+    @property
+    def full(self) -> bool:
+        return len(self.pending) >= self.chunk_rows
+
+    def chunks(self) -> tuple:
+        """A chunk holds chunk_rows rows, split into tile x tile blocks along the last two axes if tile is set."""
+        row_chunks = self.row_shape
+        if self.tile and len(row_chunks) >= 2:
+            row_chunks = (*row_chunks[:-2], *(min(self.tile, size) for size in row_chunks[-2:]))
+        return (self.chunk_rows, *row_chunks)
+
+    def flush(self, group: zarr.Group, compressors) -> int:
+        """Append the buffered rows to the array in group, returning how many were written."""
+        rows = self.pending
+        self.pending = []
+        if not rows:
+            return 0
+        data = np.stack(rows)
+        if self.array is None:
+            if self.name in group:
+                # Run archived again, e.g. after a restart
+                self.array = group[self.name]
+            else:
+                self.array = group.create_array(
+                    self.name,
+                    shape=(0, *self.row_shape),
+                    chunks=self.chunks(),
+                    dtype=data.dtype,
+                    compressors=compressors,
+                )
+        self.array.append(data, axis=0)
+        return len(rows)
+
+
+class ZarrArchivePublisher(Publisher):
+    """
+    Archives each run to a local zarr store, one group per run (``{run_name}_{run_id}``)
+    below ``root_path``, for post-run analysis and as a replay source independent of Tiled:
+
+    - ``frames`` (n, height, width) and ``frame_number`` (n,), from RawFrameEvents, or from
+      the raw frames of SAS1DReductions with ``frame_source="reduction"``
+    - ``curves`` (n, points) and ``q`` (points,), from SAS1DReductions
+    - ``latent`` (n, dim) float32 and ``latent_index`` (n,), with ``include_latent``
+
+    Frames are chunked ``frames_per_chunk`` frames deep, so appending fills whole chunks
+    and reading a pixel's time series touches n / frames_per_chunk chunks; ``frame_tile``
+    also splits each frame into tile x tile blocks for time series of small regions.
+    Curves and latent vectors are chunked ``rows_per_chunk`` rows deep. Chunks are Blosc
+    compressed with ``compression`` (e.g. "zstd", "lz4", or None for no compression).
+
+    Rows are buffered and appended in a worker thread once a chunk's worth is pending,
+    every ``flush_interval_s`` seconds and at SASStop.
+    """
+
+    def __init__(
+        self,
+        root_path: str = "archive",
+        include_frames: bool = True,
+        include_curves: bool = True,
+        include_latent: bool = False,
+        frame_source: str = "raw",
+        frames_per_chunk: int = 16,
+        frame_tile: int = None,
+        rows_per_chunk: int = 1024,
+        compression: str = "zstd",
+        compression_level: int = 3,
+        flush_interval_s: float = 2.0,
+    ):
+        super().__init__()
+        if frame_source not in FRAME_SOURCES:
+            raise ValueError(f"Unsupported frame_source {frame_source}, expected one of {list(FRAME_SOURCES)}")
+        self.root_path = root_path
+        self.include_frames = include_frames
+        self.include_curves = include_curves
+        self.include_latent = include_latent
+        self.frame_source = frame_source
+        self.frames_per_chunk = frames_per_chunk
+        self.frame_tile = frame_tile
+        self.rows_per_chunk = rows_per_chunk
+        self.compressors = (
+            [BloscCodec(cname=compression, clevel=compression_level, shuffle="bitshuffle")] if compression else None
+        )
+        self.flush_interval_s = flush_interval_s
+
+        self.group: zarr.Group = None
+        self.series: dict[str, ArchiveSeries] = {}
+        self.q: np.ndarray = None
+        self._flush_timer: asyncio.Task = None
+        self._flush_lock = asyncio.Lock()
+
+    async def publish(self, message: Union[SASStart | RawFrameEvent | SAS1DReduction | LatentSpaceEvent | SASStop]) -> None:
+        try:
+            if isinstance(message, SASStart):
+                await self.flush()
+                self.group = await asyncio.to_thread(self._open_run, message)
+                return
+            if self.group is None:
+                logger.debug("No archive run open, ignoring message received before start")
+                return
+            if isinstance(message, SASStop):
+                await self.flush()
+                self.group.attrs.update({"num_frames": message.num_frames, "stopped": time.time()})
+                return
+
+            if isinstance(message, RawFrameEvent):
+                if self.include_frames and self.frame_source == "raw":
+                    self._add_frame(message.image.array, message.frame_number)
+            elif isinstance(message, SAS1DReduction):
+                self._add_reduction(message)
+            elif isinstance(message, (LatentSpaceEvent, lse_schemas.LatentSpaceEvent)):
+                if self.include_latent and message.tiled_url != "FLUSH_SIGNAL" and not message.reprojected:
+                    if self.series["latent"].add(message.feature_vector):
+                        self.series["latent_index"].add(message.index)
+
+            if any(series.full for series in self.series.values()):
+                await self.flush()
+            elif self._flush_timer is None:
+                self._flush_timer = asyncio.create_task(self._flush_after_wait())
+        except Exception as e:
+            logger.error(f"Error in zarr archive publish: {e}")
+
+    def _open_run(self, message: SASStart) -> zarr.Group:
+        path = os.path.join(self.root_path, f"{message.run_name}_{message.run_id}.zarr")
+        group = zarr.open_group(path, mode="a")
+        group.attrs.update(
+            {
+                "run_name": message.run_name,
+                "run_id": message.run_id,
+                "tiled_url": message.tiled_url,
+                "width": message.width,
+                "height": message.height,
+                "data_type": message.data_type,
+                "started": time.time(),
+            }
+        )
+        frames, rows = self.frames_per_chunk, self.rows_per_chunk
+        self.series = {
+            "frames": ArchiveSeries("frames", frames, tile=self.frame_tile),
+            "frame_number": ArchiveSeries("frame_number", frames, dtype=np.int64),
+            "curves": ArchiveSeries("curves", rows),
+            "latent": ArchiveSeries("latent", rows, dtype=np.float32),
+            "latent_index": ArchiveSeries("latent_index", rows, dtype=np.int64),
+        }
+        self.q = None
+        logger.info(f"Archiving run to {path}")
+        return group
+
+    def _add_frame(self, image: np.ndarray, frame_number: int) -> None:
+        if self.series["frames"].add(image):
+            self.series["frame_number"].add(frame_number)
+
+    def _add_reduction(self, message: SAS1DReduction) -> None:
+        if self.include_frames and self.frame_source == "reduction" and message.raw_frame is not None:
+            self._add_frame(message.raw_frame.array, len(self.series["frame_number"]) + self._written("frame_number"))
+        if not self.include_curves:
+            return
+        self.series["curves"].add(message.curve.array)
+        if message.q is not None and self.q is None:
+            self.q = np.asarray(message.q.array)
+
+    def _written(self, name: str) -> int:
+        array = self.series[name].array
+        return 0 if array is None else array.shape[0]
+
+    async def _flush_after_wait(self) -> None:
+        await asyncio.sleep(self.flush_interval_s)
+        # Cleared before flushing so that rows buffered meanwhile schedule the next flush
+        self._flush_timer = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Append every buffered row to the run's arrays."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if self.group is None:
+            return
+        async with self._flush_lock:
+            try:
+                await asyncio.to_thread(self._flush_sync)
+            except Exception as e:
+                logger.error(f"Error writing zarr archive: {e}")
+
+    def _flush_sync(self) -> None:
+        for series in self.series.values():
+            series.flush(self.group, self.compressors)
+        if self.q is not None and "q" not in self.group:
+            self.group.create_array("q", data=self.q, compressors=None)